@@ -11,7 +11,7 @@ from models import db
 from routes_api import api_bp
 from routes_admin import admin_bp
 from routes_iptv import iptv_bp, xtream_bp
-from scheduler import init_scheduler
+from scheduler import init_scheduler, init_maintenance, resume_scan_runs
 
 
 def create_app(config_class=Config):
@@ -30,6 +30,23 @@ def create_app(config_class=Config):
     # ── Extensiones ────────────────────────────────────────────
     db.init_app(app)
 
+    # ── Caché DNS para todas las peticiones salientes ──────────
+    import dns_cache
+    dns_cache.install(
+        ttl=app.config.get('DNS_CACHE_TTL', 300),
+        negative_ttl=app.config.get('DNS_CACHE_NEGATIVE_TTL', 30),
+    )
+
+    # ── Circuit breaker por servidor (proxies + scanner) ───────
+    import circuit_breaker
+    circuit_breaker.install(
+        app,
+        fail_threshold=app.config.get('BREAKER_FAIL_THRESHOLD', 5),
+        open_seconds=app.config.get('BREAKER_OPEN_SECONDS', 60),
+        max_open_seconds=app.config.get('BREAKER_MAX_OPEN_SECONDS', 900),
+        sync_seconds=app.config.get('BREAKER_SYNC_SECONDS', 10),
+    )
+
     # ── Blueprints ─────────────────────────────────────────────
     from routes_auth import auth_bp
     app.register_blueprint(auth_bp)
@@ -65,12 +82,41 @@ def create_app(config_class=Config):
         db.create_all()
         _migrate_db()
         _fix_sqlite_pragmas()
+        import search
+        search.install(db)
+        import series_index
+        series_index.install()
+        import live_groups
+        live_groups.install()
+        import visibility
+        visibility.install()
+        import catalog_counters
+        catalog_counters.install(db)
+        import genres
+        genres.install(db)
+        import trending
+        trending.install(app)
+        import catalog_cache
+        catalog_cache.install(app)
+        import reco_matrix
+        reco_matrix.install(app)
+        import taste_profiles
+        taste_profiles.install(app)
         _ensure_superadmin(app)
 
-    # ── Scheduler (solo si no estamos en testing y AUTO_SCAN=1) ─
-    if not app.testing and app.config.get('AUTO_SCAN', 0):
+    # ── Scheduler (no en testing; los scans solo con AUTO_SCAN=1) ─
+    # Con BACKGROUND_WORKER=1 el scheduler y la reanudación de scans
+    # los lleva worker.py en su propio proceso.
+    in_process = not app.testing and not app.config.get('BACKGROUND_WORKER', 0)
+    if in_process:
+        init_maintenance(app)
+    if in_process and app.config.get('AUTO_SCAN', 0):
         init_scheduler(app)
 
+    # ── Reanudar scans VOD interrumpidos por un reinicio ───────
+    if in_process:
+        resume_scan_runs(app)
+
     # ── Rutas frontend ─────────────────────────────────────────
     @app.route('/')
     def index():
@@ -157,7 +203,7 @@ def _fix_sqlite_pragmas():
 
 
 def _migrate_db():
-    """Agrega columnas nuevas a tablas existentes sin perder datos (SQLite safe)."""
+    """Agrega columnas e índices nuevos a tablas existentes sin perder datos (SQLite safe)."""
     from sqlalchemy import text
     stmts = [
         # Columnas pre-existentes
@@ -193,6 +239,43 @@ def _migrate_db():
         # CanalCurado: origen de la lista
         'ALTER TABLE canales_curados ADD COLUMN fuente     TEXT',
         'ALTER TABLE canales_curados ADD COLUMN lista_id   INTEGER REFERENCES listas(id)',
+        'ALTER TABLE canales_curados ADD COLUMN ultima_verificacion DATETIME',
+        'ALTER TABLE canales_curados ADD COLUMN urls_vivas          INTEGER',
+        # Calidad de stream en el scan live (TTFB / throughput / puntuación)
+        'ALTER TABLE live_scan_reports ADD COLUMN ttfb_ms         INTEGER',
+        'ALTER TABLE live_scan_reports ADD COLUMN throughput_kbps INTEGER',
+        'ALTER TABLE live_scan_reports ADD COLUMN score           FLOAT',
+        # Series agrupadas materializadas (tabla series)
+        'ALTER TABLE contenidos ADD COLUMN serie_key VARCHAR(300)',
+        # Agrupado de canales en directo (live_groups.py)
+        'ALTER TABLE contenidos ADD COLUMN live_group_key VARCHAR(300)',
+        # Visibilidad desnormalizada (visibility.py); NULL hasta el primer sync
+        'ALTER TABLE contenidos ADD COLUMN visibility_scope VARCHAR(10)',
+        'ALTER TABLE contenidos ADD COLUMN owner_id INTEGER',
+        # Índices nuevos sobre tablas existentes (create_all no los añade)
+        'CREATE INDEX IF NOT EXISTS ix_contenidos_activo_fuente_verif '
+        'ON contenidos (activo, fuente, ultima_verificacion)',
+        'CREATE INDEX IF NOT EXISTS ix_live_scan_reports_contenido_ts '
+        'ON live_scan_reports (contenido_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS ix_live_scan_reports_timestamp '
+        'ON live_scan_reports (timestamp)',
+        'CREATE INDEX IF NOT EXISTS ix_contenidos_serie_ep '
+        'ON contenidos (serie_key, temporada, episodio)',
+        'DROP INDEX IF EXISTS ix_contenidos_serie_key',   # sustituido por ix_contenidos_serie_ep
+        'CREATE INDEX IF NOT EXISTS ix_contenidos_tipo_fecha ON contenidos (tipo, fecha_agregado)',
+        'CREATE INDEX IF NOT EXISTS ix_contenidos_fecha ON contenidos (fecha_agregado)',
+        'CREATE INDEX IF NOT EXISTS ix_contenidos_visible_tipo_fecha '
+        'ON contenidos (activo, visibility_scope, tipo, fecha_agregado)',
+        'CREATE INDEX IF NOT EXISTS ix_contenidos_visible_fecha '
+        'ON contenidos (activo, visibility_scope, fecha_agregado)',
+        'CREATE INDEX IF NOT EXISTS ix_contenidos_visible_live_group '
+        'ON contenidos (activo, visibility_scope, tipo, live_group_key)',
+        'DROP INDEX IF EXISTS ix_contenidos_tipo_live_group',   # sustituido por ix_contenidos_visible_live_group
+        'CREATE INDEX IF NOT EXISTS ix_contenidos_owner ON contenidos (owner_id)',
+        # Paginación por cursor: fecha_agregado sin NULL (el keyset no
+        # compara NULL). Fecha mínima: quedan al final como en ORDER BY … DESC
+        "UPDATE contenidos SET fecha_agregado = '1970-01-01 00:00:00.000000' "
+        'WHERE fecha_agregado IS NULL',
     ]
     with db.engine.connect() as conn:
         for stmt in stmts:
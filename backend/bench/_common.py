@@ -0,0 +1,146 @@
+"""
+Utilidades compartidas por los scripts de bench/: app Flask sobre una BD
+temporal, proveedor falso en subproceso y medición de recursos.
+"""
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def make_app(**env):
+    """
+    create_app() sobre una BD SQLite temporal (nunca toca instance/).
+    `env` permite sobreescribir variables de config (SCAN_TIMEOUT=…).
+    """
+    tmp = tempfile.mkdtemp(prefix='cinecadiz-bench-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    os.environ['AUTO_SCAN'] = '0'
+    # El proveedor falso escucha en 127.0.0.1: hay que permitirlo en los proxies
+    os.environ['PROXY_ALLOW_PRIVATE'] = '1'
+    for k, v in env.items():
+        os.environ[k] = str(v)
+    from app import create_app
+    return create_app()
+
+
+def start_provider(port: int = 0, **opts):
+    """
+    Lanza bench/fake_provider.py en un subproceso (así no compite por el GIL
+    con el código medido). Devuelve (proceso, base_url).
+    """
+    import socket
+    if not port:
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+    cmd = [sys.executable, os.path.join(os.path.dirname(__file__), 'fake_provider.py'),
+           '--port', str(port)]
+    for k, v in opts.items():
+        cmd += [f'--{k.replace("_", "-")}', str(v)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    proc.stdout.readline()        # espera al mensaje de arranque
+    return proc, f'http://127.0.0.1:{port}'
+
+
+def insert_contenidos(app, rows: list, chunk: int = 2000):
+    """
+    Inserta dicts {titulo, url_stream, tipo, …} con INSERT masivo de Core,
+    igual que la importación real (_do_bulk_insert).
+    """
+    from urllib.parse import urlparse
+    from models import db, Contenido
+    import live_groups
+    with app.app_context():
+        for i in range(0, len(rows), chunk):
+            batch = []
+            for r in rows[i:i + chunk]:
+                url = r['url_stream']
+                batch.append({
+                    'titulo':     r.get('titulo', url.rsplit('/', 1)[-1]),
+                    'tipo':       r.get('tipo', 'pelicula'),
+                    'url_stream': url,
+                    'url_hash':   hashlib.md5(url.encode()).hexdigest(),
+                    'fuente':     'm3u',
+                    'servidor':   urlparse(url).netloc,
+                    'activo':     True,
+                    'live_group_key': live_groups.key_for(
+                        r.get('titulo', ''), r.get('tipo', 'pelicula'), r.get('temporada')),
+                    **{k: v for k, v in r.items() if k not in ('titulo', 'tipo', 'url_stream')},
+                })
+            db.session.execute(Contenido.__table__.insert(), batch)
+            db.session.commit()
+
+
+def expand_mix(mix: dict, total: int) -> list:
+    """Reparte `total` URLs según los pesos de `mix` → lista de comportamientos."""
+    weight = sum(mix.values())
+    kinds = []
+    for kind, w in mix.items():
+        kinds += [kind] * round(total * w / weight)
+    while len(kinds) < total:
+        kinds.append(next(iter(mix)))
+    return kinds[:total]
+
+
+class ResourceMonitor:
+    """Muestrea hilos vivos y RSS del proceso mientras se ejecuta el bloque."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak_threads = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._t0 = time.monotonic()
+        self._r0 = resource.getrusage(resource.RUSAGE_SELF)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        r1 = resource.getrusage(resource.RUSAGE_SELF)
+        self.wall_s   = time.monotonic() - self._t0
+        self.cpu_user = r1.ru_utime - self._r0.ru_utime
+        self.cpu_sys  = r1.ru_stime - self._r0.ru_stime
+        self.max_rss_mb = r1.ru_maxrss / 1024    # Linux: KB
+        return False
+
+    def summary(self) -> dict:
+        return {
+            'wall_s':       round(self.wall_s, 1),
+            'cpu_user_s':   round(self.cpu_user, 1),
+            'cpu_sys_s':    round(self.cpu_sys, 1),
+            'cpu_pct':      round((self.cpu_user + self.cpu_sys) / self.wall_s * 100, 1) if self.wall_s else 0,
+            'max_rss_mb':   round(self.max_rss_mb, 1),
+            'peak_threads': self.peak_threads,
+        }
+
+
+def percentile(values: list, p: float):
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))]
+
+
+def print_report(title: str, data: dict):
+    print(f'\n── {title} ' + '─' * max(0, 56 - len(title)))
+    width = max(len(k) for k in data) if data else 0
+    for k, v in data.items():
+        print(f'  {k:<{width}}  {v}')
@@ -0,0 +1,96 @@
+"""
+Benchmark de los endpoints de listado del catálogo.
+
+Rellena una BD temporal con N películas y M canales live (varias URLs de
+backup por canal, como una lista IPTV real) y mide con el cliente de
+pruebas de Flask, sin red ni gunicorn de por medio:
+  - /api/contenido?limit=100 (varias páginas y ordenaciones)
+  - /api/live-agrupados (completa, la más pesada; paginada y compacta)
+La caché de respuestas (catalog_cache) se desactiva para medir el coste
+real de consulta + serialización.
+
+Ejemplos (desde backend/):
+  python bench/bench_api.py
+  python bench/bench_api.py --items 50000 --live 20000 --rounds 30
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _common import make_app, insert_contenidos, percentile, print_report
+
+
+def _seed(app, items: int, live: int, urls_per_channel: int):
+    rows = []
+    for i in range(items):
+        rows.append({
+            'titulo': f'Película {i}', 'tipo': 'pelicula',
+            'url_stream': f'http://vod{i % 50}.example/movie/{i}.mp4',
+            'año': 1980 + i % 45, 'genero': 'Acción, Drama',
+            'group_title': f'VOD {i % 30}',
+            'imagen': f'http://img.example/{i}.jpg',
+            'descripcion': 'Sinopsis ' * 40,
+        })
+    for i in range(live):
+        urls = [f'http://live{(i + k) % 40}.example/ch/{i}/{k}.m3u8'
+                for k in range(urls_per_channel)]
+        rows.append({
+            'titulo': f'Canal {i // 3} {("HD", "FHD", "SD")[i % 3]}', 'tipo': 'live',
+            'url_stream': urls[0], 'live_urls_json': json.dumps(urls),
+            'group_title': f'TV {i % 25}', 'imagen': f'http://img.example/c{i}.png',
+        })
+    insert_contenidos(app, rows)
+
+
+def _measure(client, path: str, rounds: int) -> dict:
+    times, size = [], 0
+    client.get(path)                      # calentamiento
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        r = client.get(path)
+        times.append((time.perf_counter() - t0) * 1000)
+        size = len(r.data)
+        assert r.status_code == 200, (path, r.status_code)
+    return {
+        'p50_ms': round(percentile(times, 50), 1),
+        'p95_ms': round(percentile(times, 95), 1),
+        'kb':     round(size / 1024, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark de los listados del catálogo')
+    ap.add_argument('--items', type=int, default=20000, help='películas')
+    ap.add_argument('--live', type=int, default=5000, help='canales live')
+    ap.add_argument('--live-urls', type=int, default=3, help='URLs por canal live')
+    ap.add_argument('--rounds', type=int, default=20)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    app = make_app(CATALOG_CACHE_TTL=0)
+    t0 = time.monotonic()
+    _seed(app, args.items, args.live, args.live_urls)
+    print(f'BD: {args.items} películas + {args.live} canales live '
+          f'({time.monotonic() - t0:.1f}s de inserción)')
+
+    client = app.test_client()
+    paths = [
+        '/api/contenido?limit=100',
+        '/api/contenido?limit=100&page=50',
+        '/api/contenido?limit=100&sort=title_asc',
+        '/api/contenido?limit=100&tipo=live',
+        '/api/live-agrupados',
+        '/api/live-agrupados?page=1&limit=50',
+        '/api/live-agrupados?limit=50&page=20&compact=1',
+    ]
+    for path in paths:
+        print_report(path, _measure(client, path, args.rounds))
+
+
+if __name__ == '__main__':
+    main()
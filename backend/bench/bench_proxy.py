@@ -0,0 +1,167 @@
+"""
+Benchmark de /api/stream-proxy y /api/hls-proxy contra el proveedor falso.
+
+Arranca la app (servidor werkzeug con hilos, en este proceso) o usa una ya
+levantada con --app-url (p. ej. gunicorn con la config de producción, que
+es lo que da números representativos). N clientes concurrentes simulan
+zapping: piden un canal, leen --read-kb y cierran.
+
+  stream → GET /api/stream-proxy?url=<proveedor>/ok/<n>.ts
+  hls    → GET /api/hls-proxy?url=<proveedor>/hls/<n>/index.m3u8
+           + primer segmento a través de la URL reescrita por el proxy
+
+Muestra peticiones/s, TTFB p50/p95/p99 a través del proxy, tasa de
+errores, MB/s servidos y CPU/RSS/hilos del proceso.
+
+Ejemplos (desde backend/):
+  python bench/bench_proxy.py --clients 50 --duration 20
+  python bench/bench_proxy.py --target hls --clients 200 --app-url http://127.0.0.1:8000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import quote
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _common import make_app, start_provider, ResourceMonitor, percentile, print_report
+
+
+def _serve_app(app):
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    srv = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f'http://127.0.0.1:{srv.server_port}'
+
+
+def _one_stream(sess, app_url, base, read_bytes):
+    n = random.randint(1, 10_000)
+    url = f'{app_url}/api/stream-proxy?url={quote(f"{base}/ok/{n}.ts", safe="")}'
+    t0 = time.monotonic()
+    with sess.get(url, stream=True, timeout=(5, 30)) as r:
+        if r.status_code != 200:
+            return None, 0, f'http_{r.status_code}'
+        ttfb, got = None, 0
+        for chunk in r.iter_content(16384):
+            if ttfb is None:
+                ttfb = time.monotonic() - t0
+            got += len(chunk)
+            if got >= read_bytes:
+                break
+    return ttfb, got, None
+
+
+def _one_hls(sess, app_url, base, read_bytes):
+    n = random.randint(1, 10_000)
+    url = f'{app_url}/api/hls-proxy?url={quote(f"{base}/hls/{n}/index.m3u8", safe="")}'
+    t0 = time.monotonic()
+    r = sess.get(url, timeout=(5, 30))
+    if r.status_code != 200:
+        return None, 0, f'manifest_{r.status_code}'
+    seg = next((l for l in r.text.splitlines() if l and not l.startswith('#')), None)
+    if not seg:
+        return None, 0, 'manifest_vacio'
+    got = len(r.content)
+    with sess.get(seg, stream=True, timeout=(5, 30)) as rs:
+        if rs.status_code != 200:
+            return None, got, f'segment_{rs.status_code}'
+        ttfb = None
+        for chunk in rs.iter_content(16384):
+            if ttfb is None:
+                ttfb = time.monotonic() - t0
+            got += len(chunk)
+            if got >= read_bytes:
+                break
+    return ttfb, got, None
+
+
+def run_load(app_url, base, target, clients, duration, read_bytes) -> dict:
+    fn = {'stream': _one_stream, 'hls': _one_hls}[target]
+    ttfbs, errors = [], Counter()
+    totals = {'ok': 0, 'bytes': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        sess = requests.Session()
+        while time.monotonic() < deadline:
+            try:
+                ttfb, got, err = fn(sess, app_url, base, read_bytes)
+            except Exception as e:
+                ttfb, got, err = None, 0, type(e).__name__
+            with lock:
+                totals['bytes'] += got
+                if err:
+                    errors[err] += 1
+                else:
+                    totals['ok'] += 1
+                    ttfbs.append(ttfb)
+
+    with ResourceMonitor() as mon:
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    done = totals['ok'] + sum(errors.values())
+    ms = lambda v: round(v * 1000) if v is not None else None
+    return {
+        'objetivo':     target,
+        'clientes':     clients,
+        'peticiones':   done,
+        'req_per_s':    round(done / mon.wall_s, 1) if mon.wall_s else 0,
+        'ttfb_p50_ms':  ms(percentile(ttfbs, 50)),
+        'ttfb_p95_ms':  ms(percentile(ttfbs, 95)),
+        'ttfb_p99_ms':  ms(percentile(ttfbs, 99)),
+        'error_rate':   f'{sum(errors.values()) / done:.2%}' if done else '—',
+        'errores':      dict(errors),
+        'mb_per_s':     round(totals['bytes'] / mon.wall_s / 1e6, 2) if mon.wall_s else 0,
+        **mon.summary(),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark de los proxies de stream')
+    ap.add_argument('--target', choices=('stream', 'hls', 'both'), default='both')
+    ap.add_argument('--clients', type=int, default=50)
+    ap.add_argument('--duration', type=float, default=20, help='segundos por objetivo')
+    ap.add_argument('--read-kb', type=int, default=512, help='KB leídos por petición')
+    ap.add_argument('--app-url', default='', help='app ya arrancada (PROXY_ALLOW_PRIVATE=1)')
+    ap.add_argument('--provider', default='', help='proveedor falso ya arrancado')
+    ap.add_argument('--kbps', type=int, default=4000, help='bitrate del proveedor falso')
+    args = ap.parse_args()
+
+    proc = None
+    base = args.provider.rstrip('/')
+    if not base:
+        proc, base = start_provider(kbps=args.kbps)
+
+    srv = None
+    app_url = args.app_url.rstrip('/')
+    if not app_url:
+        srv, app_url = _serve_app(make_app())
+    print(f'App: {app_url} · proveedor: {base}')
+
+    try:
+        targets = ('stream', 'hls') if args.target == 'both' else (args.target,)
+        for target in targets:
+            print_report(f'Proxy {target}', run_load(
+                app_url, base, target, args.clients, args.duration, args.read_kb * 1024))
+    finally:
+        if srv:
+            srv.shutdown()
+        if proc:
+            proc.terminate()
+
+
+if __name__ == '__main__':
+    main()
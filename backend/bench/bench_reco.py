@@ -0,0 +1,115 @@
+"""
+Benchmark de /api/recomendaciones.
+
+Rellena una BD temporal con N películas/series repartidas en G géneros
+(1-3 por título, enlazados con genres.py) y un historial de reproducción
+para una sesión (con su perfil de gustos), y mide:
+  - la construcción de la matriz contenido × género (reco_matrix)
+  - rank() solo (puntuar todo el catálogo)
+  - /api/recomendaciones con la matriz y con el pool SQL (sin NumPy)
+Cada ejecución usa un tamaño de catálogo: para comparar, lanzar varias.
+
+Ejemplos (desde backend/):
+  python bench/bench_reco.py --items 50000
+  python bench/bench_reco.py --items 200000 --rounds 30
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _common import make_app, insert_contenidos, percentile, print_report
+
+_GENEROS = [f'Género {i}' for i in range(60)]
+
+
+def _seed(app, items: int, n_genres: int, watched: int):
+    rows = []
+    for i in range(items):
+        gs = [_GENEROS[(i * k + k) % n_genres] for k in range(1, 2 + i % 3)]
+        serie = i % 4 == 0
+        rows.append({
+            'titulo': f'Serie {i // 10} S01E{i % 10 + 1:02d}' if serie else f'Película {i}',
+            'tipo': 'serie' if serie else 'pelicula',
+            'temporada': 1 if serie else None,
+            'url_stream': f'http://vod{i % 50}.example/v/{i}.mp4',
+            'genero': ', '.join(dict.fromkeys(gs)),
+            'imagen': f'http://img.example/{i}.jpg' if i % 5 else None,
+        })
+    insert_contenidos(app, rows)
+    import genres
+    import taste_profiles
+    from models import db, Contenido, WatchHistory
+    with app.app_context():
+        genres.link_since(0)
+        genres.refresh_counts()
+        for c in Contenido.query.order_by(Contenido.id).limit(watched):
+            db.session.add(WatchHistory(session_key='bench', contenido_id=c.id,
+                                        genres_snapshot=c.genero))
+        db.session.commit()
+        taste_profiles.backfill()
+
+
+def _measure(fn, rounds: int) -> dict:
+    fn()                                  # calentamiento
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {
+        'p50_ms': round(percentile(times, 50), 1),
+        'p95_ms': round(percentile(times, 95), 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark de /api/recomendaciones')
+    ap.add_argument('--items', type=int, default=50000, help='películas + episodios')
+    ap.add_argument('--genres', type=int, default=40, help=f'géneros (max {len(_GENEROS)})')
+    ap.add_argument('--watched', type=int, default=30, help='reproducciones de la sesión')
+    ap.add_argument('--rounds', type=int, default=20)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    app = make_app(CATALOG_CACHE_TTL=0)
+    t0 = time.monotonic()
+    _seed(app, args.items, min(args.genres, len(_GENEROS)), args.watched)
+    print(f'BD: {args.items} contenidos, {args.genres} géneros '
+          f'({time.monotonic() - t0:.1f}s de inserción y enlaces)')
+
+    import reco_matrix
+    from models import Genero
+    if not reco_matrix.available():
+        print('NumPy no instalado: solo se mide el pool SQL')
+
+    with app.app_context():
+        if reco_matrix.available():
+            t0 = time.perf_counter()
+            reco_matrix._state = reco_matrix._build()
+            print(f'Matriz: {len(reco_matrix._state["ids"])} filas, '
+                  f'{len(reco_matrix._state["col_rows"])} enlaces, '
+                  f'{(time.perf_counter() - t0) * 1000:.0f} ms de construcción')
+            gids = [g for (g,) in Genero.query.with_entities(Genero.id).order_by(Genero.id).limit(8)]
+            weights = {g: 1.0 / (i + 1) for i, g in enumerate(gids)}
+            print_report('rank() (matriz)', _measure(
+                lambda: reco_matrix.rank(weights, n=200), args.rounds))
+
+    client = app.test_client()
+    path = '/api/recomendaciones?session_key=bench&limit=20'
+
+    def _get():
+        r = client.get(path)
+        assert r.status_code == 200, r.status_code
+
+    if reco_matrix.available():
+        print_report(f'{path} (matriz)', _measure(_get, args.rounds))
+    reco_matrix._enabled = False
+    print_report(f'{path} (pool SQL)', _measure(_get, args.rounds))
+
+
+if __name__ == '__main__':
+    main()
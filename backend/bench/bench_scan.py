@@ -0,0 +1,164 @@
+"""
+Benchmark del scanner contra el proveedor falso.
+
+Inserta N URLs VOD (y opcionalmente canales live) en una BD temporal con
+la mezcla de comportamientos indicada, ejecuta scan_dead_links() /
+scan_live_channels() y muestra:
+  - checks por minuto
+  - tasa de falsos caídos (URLs vivas marcadas como caídas) y de falsos
+    vivos, global y por comportamiento
+  - CPU, RSS máximo e hilos del proceso
+
+Ejemplos (desde backend/):
+  python bench/bench_scan.py --urls 10000
+  python bench/bench_scan.py --urls 100000 --workers 80 --timeout 8 \\
+      --mix ok=70,redirect=5,html=5,dead=10,ban=10
+  python bench/bench_scan.py --urls 0 --live 2000 --live-urls 3
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _common import (make_app, start_provider, insert_contenidos, expand_mix,
+                     ResourceMonitor, print_report)
+from fake_provider import EXPECTED_ALIVE, build_url, parse_mix
+
+DEFAULT_MIX = 'ok=55,slowconnect=5,stall=3,html=7,auth401=2,auth403=2,redirect=6,dead=10,ban=10'
+DEFAULT_LIVE_MIX = 'ok=50,hls=30,slowconnect=5,html=5,dead=10'
+
+
+def _error_rates(kinds_by_id: dict, alive_by_id: dict) -> dict:
+    """Falsos caídos / falsos vivos por comportamiento."""
+    per_kind = {}
+    false_dead = false_alive = exp_alive = exp_dead = 0
+    for cid, kind in kinds_by_id.items():
+        exp = EXPECTED_ALIVE[kind]
+        got = alive_by_id.get(cid)
+        k = per_kind.setdefault(kind, Counter())
+        k['total'] += 1
+        k['alive' if got else 'dead'] += 1
+        if exp is True:
+            exp_alive += 1
+            if not got:
+                false_dead += 1
+        elif exp is False:
+            exp_dead += 1
+            if got:
+                false_alive += 1
+    return {
+        'false_dead_rate':  f'{false_dead / exp_alive:.2%}' if exp_alive else '—',
+        'false_alive_rate': f'{false_alive / exp_dead:.2%}' if exp_dead else '—',
+        'por_comportamiento': {k: dict(v) for k, v in sorted(per_kind.items())},
+    }
+
+
+def bench_vod(app, base: str, n: int, mix: dict, workers: int) -> dict:
+    from models import Contenido
+    from link_checker import scan_dead_links
+
+    kinds = expand_mix(mix, n)
+    insert_contenidos(app, [
+        {'url_stream': build_url(base, kind, i), 'titulo': f'{kind} {i}', 'group_title': kind}
+        for i, kind in enumerate(kinds)
+    ])
+
+    with ResourceMonitor() as mon:
+        result = scan_dead_links(app, batch_size=0, max_workers=workers)
+
+    with app.app_context():
+        rows = Contenido.query.filter(Contenido.tipo != 'live').with_entities(
+            Contenido.id, Contenido.group_title, Contenido.activo).all()
+    kinds_by_id = {cid: kind for cid, kind, _ in rows}
+    alive_by_id = {cid: activo for cid, _, activo in rows}
+
+    return {
+        'urls':          n,
+        'workers':       workers,
+        'checked':       result['checked'],
+        'checks_per_min': round(result['checked'] / mon.wall_s * 60) if mon.wall_s else 0,
+        **_error_rates(kinds_by_id, alive_by_id),
+        **mon.summary(),
+    }
+
+
+def bench_live(app, base: str, n: int, urls_per_channel: int, mix: dict, workers: int) -> dict:
+    import json
+    from models import db, LiveScanReport
+    from link_checker import scan_live_channels
+
+    kinds = expand_mix(mix, n * urls_per_channel)
+    rows = []
+    for i in range(n):
+        urls = [build_url(base, kinds[i * urls_per_channel + j], 10_000_000 + i * 10 + j)
+                for j in range(urls_per_channel)]
+        rows.append({'url_stream': urls[0], 'titulo': f'Canal {i}', 'tipo': 'live',
+                     'live_urls_json': json.dumps(urls)})
+    insert_contenidos(app, rows)
+
+    with ResourceMonitor() as mon:
+        result = scan_live_channels(app, max_workers=workers)
+
+    # Resultado por URL a partir de los reportes
+    with app.app_context():
+        reps = db.session.query(LiveScanReport.url_probada, LiveScanReport.resultado).all()
+    kind_of = lambda u: u.split('/')[3]
+    kinds_by_url = {u: kind_of(u) for u, _ in reps}
+    alive_by_url = {u: ok for u, ok in reps}
+
+    probes = len(reps)
+    return {
+        'canales':       n,
+        'urls':          probes,
+        'workers':       workers,
+        'canales_caidos': result.get('failed'),
+        'probes_per_min': round(probes / mon.wall_s * 60) if mon.wall_s else 0,
+        **_error_rates(kinds_by_url, alive_by_url),
+        **mon.summary(),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark del scanner contra el proveedor falso')
+    ap.add_argument('--urls', type=int, default=10000, help='URLs VOD (0 = no probar VOD)')
+    ap.add_argument('--mix', default=DEFAULT_MIX, help='pesos por comportamiento')
+    ap.add_argument('--live', type=int, default=0, help='canales live a probar')
+    ap.add_argument('--live-urls', type=int, default=2, help='URLs por canal live')
+    ap.add_argument('--live-mix', default=DEFAULT_LIVE_MIX)
+    ap.add_argument('--workers', type=int, default=40)
+    ap.add_argument('--timeout', type=int, default=15, help='SCAN_TIMEOUT')
+    ap.add_argument('--provider', default='', help='URL de un proveedor falso ya arrancado')
+    ap.add_argument('--ban-limit', type=int, default=20)
+    ap.add_argument('--slow-delay', type=float, default=6.0)
+    ap.add_argument('--stall-secs', type=float, default=30.0)
+    ap.add_argument('-v', '--verbose', action='store_true', help='mostrar logs del scanner')
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    proc = None
+    base = args.provider.rstrip('/')
+    if not base:
+        proc, base = start_provider(ban_limit=args.ban_limit, slow_delay=args.slow_delay,
+                                    stall_secs=args.stall_secs)
+    app = make_app(SCAN_TIMEOUT=args.timeout)
+    print(f'Proveedor: {base} · timeout={args.timeout}s · workers={args.workers}')
+
+    try:
+        if args.urls:
+            t0 = time.monotonic()
+            print_report('Scan VOD', bench_vod(app, base, args.urls, parse_mix(args.mix), args.workers))
+            print(f'  (total con inserción: {time.monotonic() - t0:.1f}s)')
+        if args.live:
+            print_report('Scan live', bench_live(app, base, args.live, args.live_urls,
+                                                 parse_mix(args.live_mix), args.workers))
+    finally:
+        if proc:
+            proc.terminate()
+
+
+if __name__ == '__main__':
+    main()
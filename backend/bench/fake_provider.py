@@ -0,0 +1,296 @@
+"""
+Proveedor IPTV falso para pruebas de carga del scanner y de los proxies.
+
+Simula los comportamientos que vemos en proveedores reales, cada uno en
+su propio prefijo de ruta (el resto de la ruta es libre, p. ej. un id):
+
+  /ok/<id>.ts           200 video/mp2t, emite bytes TS a --kbps
+  /slowconnect/<id>.ts  espera --slow-delay s antes de responder, luego como /ok
+  /stall/<id>.ts        cabeceras + 188 bytes y después silencio (cuerpo colgado)
+  /html/<id>.ts         200 con página HTML de error (Content-Type video/mp2t)
+  /auth401/<id>.ts      401 (muro de autenticación)
+  /auth403/<id>.ts      403
+  /redirect/<id>.ts     302 → /cdn/<id>.ts (CDN), que se comporta como /ok
+  /dead/<id>.ts         404
+  /ban/<id>.ts          como /ok, pero si un cliente supera --ban-limit
+                        conexiones simultáneas se le banea --ban-secs
+                        (se le cierra la conexión sin respuesta)
+  /hls/<id>/master.m3u8 manifiesto maestro → index.m3u8
+  /hls/<id>/index.m3u8  playlist live con ventana deslizante de segmentos
+  /hls/<id>/seg<N>.ts   segmento de --seg-secs s a --kbps
+
+Uso:
+  python bench/fake_provider.py --port 8765
+  (o start_server() desde otro script)
+
+Solo para uso local — no es parte de la aplicación.
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Qué debería concluir un scanner correcto de cada comportamiento.
+# None → ambiguo, no cuenta para las tasas de error.
+EXPECTED_ALIVE = {
+    'ok':          True,
+    'slowconnect': True,
+    'redirect':    True,
+    'auth401':     True,    # el recurso existe (el scanner lo da por vivo)
+    'auth403':     True,
+    'hls':         True,
+    'ban':         True,    # stream válido; morir aquí es un falso negativo
+    'html':        False,
+    'dead':        False,
+    'stall':       None,
+}
+
+_TS_PACKET = b'\x47' + b'\x00' * 187     # paquete MPEG-TS vacío (sync byte 0x47)
+_HTML_PAGE = (b'<!DOCTYPE html><html><head><title>Error</title></head>'
+              b'<body>Account expired</body></html>')
+
+
+class ProviderState:
+    """Estado compartido entre hilos: conexiones activas y baneos por IP."""
+
+    def __init__(self, kbps=2000, slow_delay=6.0, stall_secs=60.0,
+                 ban_limit=20, ban_secs=30.0, seg_secs=4, body_secs=10.0):
+        self.kbps       = kbps
+        self.slow_delay = slow_delay
+        self.stall_secs = stall_secs
+        self.ban_limit  = ban_limit
+        self.ban_secs   = ban_secs
+        self.seg_secs   = seg_secs
+        self.body_secs  = body_secs    # duración máx. de un stream /ok
+        self.lock       = threading.Lock()
+        self.active: dict[str, int] = {}
+        self.banned: dict[str, float] = {}
+        self.requests   = 0
+        self.bans       = 0
+
+    def enter_ban_zone(self, ip: str) -> bool:
+        """Registra una conexión /ban/. False si la IP está (o queda) baneada."""
+        with self.lock:
+            now = time.monotonic()
+            if self.banned.get(ip, 0) > now:
+                return False
+            n = self.active.get(ip, 0) + 1
+            if n > self.ban_limit:
+                self.banned[ip] = now + self.ban_secs
+                self.bans += 1
+                return False
+            self.active[ip] = n
+            return True
+
+    def leave_ban_zone(self, ip: str):
+        with self.lock:
+            self.active[ip] = max(0, self.active.get(ip, 1) - 1)
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeIPTV/1.0'
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self) -> ProviderState:
+        return self.server.state
+
+    # ── Helpers ───────────────────────────────────────────────
+    def _stream_ts(self, seconds: float, total_bytes: int = None):
+        """Emite paquetes TS al ritmo de state.kbps durante `seconds`."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp2t')
+        if total_bytes is not None:
+            self.send_header('Content-Length', str(total_bytes))
+        else:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        bytes_per_s = max(1, self.state.kbps * 1000 // 8)
+        chunk = _TS_PACKET * 87            # ~16 KB
+        sent, t0 = 0, time.monotonic()
+        limit = total_bytes if total_bytes is not None else bytes_per_s * seconds
+        try:
+            while sent < limit:
+                n = min(len(chunk), limit - sent)
+                self.wfile.write(chunk[:n])
+                sent += n
+                # Ritmo constante: no adelantarse al bitrate simulado
+                ahead = sent / bytes_per_s - (time.monotonic() - t0)
+                if ahead > 0:
+                    time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def _simple(self, code: int, body: bytes = b'', ctype='text/plain', headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != 'HEAD' and body:
+            self.wfile.write(body)
+
+    # ── HLS ───────────────────────────────────────────────────
+    def _hls(self, parts: list):
+        seg = self.state.seg_secs
+        if len(parts) < 3:
+            return self._simple(404)
+        name = parts[2]
+        if name == 'master.m3u8':
+            body = (b'#EXTM3U\n'
+                    b'#EXT-X-STREAM-INF:BANDWIDTH=2000000,RESOLUTION=1280x720\n'
+                    b'index.m3u8\n')
+            return self._simple(200, body, 'application/vnd.apple.mpegurl')
+        if name == 'index.m3u8':
+            # Ventana deslizante de 4 segmentos según el reloj
+            seq = int(time.time() // seg)
+            lines = ['#EXTM3U', '#EXT-X-VERSION:3',
+                     f'#EXT-X-TARGETDURATION:{seg}',
+                     f'#EXT-X-MEDIA-SEQUENCE:{seq}']
+            for n in range(seq, seq + 4):
+                lines += [f'#EXTINF:{seg:.1f},', f'seg{n}.ts']
+            return self._simple(200, ('\n'.join(lines) + '\n').encode(),
+                                'application/vnd.apple.mpegurl')
+        if name.startswith('seg') and name.endswith('.ts'):
+            size = self.state.kbps * 1000 // 8 * seg
+            size -= size % 188
+            # Se sirve tan rápido como permita la red (como una CDN)
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp2t')
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(_TS_PACKET * (size // 188))
+            return
+        return self._simple(404)
+
+    # ── Dispatcher ────────────────────────────────────────────
+    def do_GET(self):
+        with self.state.lock:
+            self.state.requests += 1
+        path  = self.path.split('?')[0]
+        parts = [p for p in path.split('/') if p]
+        kind  = parts[0] if parts else ''
+        st    = self.state
+
+        if kind in ('ok', 'cdn'):
+            return self._stream_ts(st.body_secs)
+        if kind == 'slowconnect':
+            time.sleep(st.slow_delay)
+            return self._stream_ts(st.body_secs)
+        if kind == 'stall':
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp2t')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            try:
+                self.wfile.write(_TS_PACKET)
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            time.sleep(st.stall_secs)
+            self.close_connection = True
+            return
+        if kind == 'html':
+            return self._simple(200, _HTML_PAGE, 'video/mp2t')
+        if kind == 'auth401':
+            return self._simple(401, b'Unauthorized', headers={'WWW-Authenticate': 'Basic realm="iptv"'})
+        if kind == 'auth403':
+            return self._simple(403, b'Forbidden')
+        if kind == 'redirect':
+            rest = '/'.join(parts[1:])
+            return self._simple(302, headers={'Location': f'/cdn/{rest}'})
+        if kind == 'dead':
+            return self._simple(404, b'Not Found')
+        if kind == 'hls':
+            return self._hls(parts)
+        if kind == 'ban':
+            ip = self.client_address[0]
+            if not st.enter_ban_zone(ip):
+                # Baneado: cerrar sin respuesta, como hacen muchos paneles
+                self.close_connection = True
+                return
+            try:
+                return self._stream_ts(st.body_secs)
+            finally:
+                st.leave_ban_zone(ip)
+        return self._simple(404, b'Not Found')
+
+    do_HEAD = do_GET
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, addr, state: ProviderState):
+        super().__init__(addr, FakeProviderHandler)
+        self.state = state
+
+
+def start_server(host: str = '127.0.0.1', port: int = 0, **opts):
+    """
+    Arranca el proveedor en un hilo daemon.
+    Devuelve (server, base_url). server.shutdown() para pararlo.
+    """
+    srv = FakeProviderServer((host, port), ProviderState(**opts))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f'http://{host}:{srv.server_port}'
+
+
+def build_url(base: str, kind: str, n: int) -> str:
+    """URL de ejemplo para el comportamiento `kind` (n = identificador)."""
+    if kind == 'hls':
+        return f'{base}/hls/{n}/master.m3u8'
+    return f'{base}/{kind}/{n}.ts'
+
+
+def parse_mix(spec: str) -> dict:
+    """'ok=60,html=10,dead=10' → {'ok': 60, 'html': 10, 'dead': 10}"""
+    mix = {}
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        k, _, v = part.partition('=')
+        k = k.strip()
+        if k not in EXPECTED_ALIVE:
+            raise ValueError(f'Comportamiento desconocido: {k}')
+        mix[k] = int(v or 1)
+    return mix
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Proveedor IPTV falso para pruebas de carga')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--kbps', type=int, default=2000, help='bitrate simulado')
+    ap.add_argument('--slow-delay', type=float, default=6.0, help='segundos de /slowconnect')
+    ap.add_argument('--stall-secs', type=float, default=60.0, help='segundos colgado en /stall')
+    ap.add_argument('--ban-limit', type=int, default=20, help='conexiones simultáneas antes del baneo')
+    ap.add_argument('--ban-secs', type=float, default=30.0, help='duración del baneo')
+    ap.add_argument('--seg-secs', type=int, default=4, help='duración de segmento HLS')
+    args = ap.parse_args()
+
+    srv = FakeProviderServer((args.host, args.port), ProviderState(
+        kbps=args.kbps, slow_delay=args.slow_delay, stall_secs=args.stall_secs,
+        ban_limit=args.ban_limit, ban_secs=args.ban_secs, seg_secs=args.seg_secs,
+    ))
+    print(f'Proveedor falso en http://{args.host}:{srv.server_port} — Ctrl+C para salir', flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        st = srv.state
+        print(f'{st.requests} peticiones, {st.bans} baneos')
+
+
+if __name__ == '__main__':
+    main()
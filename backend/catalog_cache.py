@@ -0,0 +1,381 @@
+"""
+Caché de respuestas del catálogo.
+
+/api/generos, /api/anos, /api/stats, /api/live-categorias, /api/live-listas,
+/api/canales-curados y las primeras páginas de /api/contenido devuelven lo
+mismo a todos los visitantes y cada petición recorría la tabla de
+contenidos. Aquí se guarda el cuerpo JSON ya serializado:
+
+  clave        endpoint + query args normalizados (ordenados, sin vacíos)
+               + ámbito de visibilidad ('all', o 'u<id>'/'anon' para los
+               endpoints que filtran por las listas privadas del usuario)
+  caducidad    TTL por entrada y LRU acotada por memoria (bytes de cuerpo)
+  invalidación contador de generación del catálogo (tabla
+               catalog_generation). Imports, scans, purges y ediciones del
+               admin llaman a bump(); los endpoints públicos, a
+               bump_coalesced() (uno por ventana). Una entrada de otra
+               generación ya no sirve. Cada proceso relee el contador
+               como mucho cada `gen_check` segundos, así que un bump en
+               worker.py invalida también las cachés de los workers de
+               gunicorn.
+
+Las respuestas llevan X-Cache: HIT | MISS y stats() da la tasa de aciertos
+por endpoint para el panel admin.
+
+Respuestas condicionales (conditional): el ETag se deriva de la misma
+clave + generación, así que se puede contestar 304 a If-None-Match sin
+tocar la BD ni construir el cuerpo. Cache-Control por endpoint deja a los
+clientes y a nginx servir las vistas repetidas durante `max_age`.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+_MAX_ENTRIES = 4096
+
+_enabled   = True
+_ttl       = 120                 # segundos por entrada
+_max_bytes = 64 * 1024 * 1024    # tope de memoria de la LRU
+_gen_check = 2.0                 # segundos entre lecturas del contador en BD
+_max_page  = 3                   # páginas de /api/contenido que se cachean
+_public_bump = 60                # segundos mínimos entre bumps de endpoints públicos
+
+_lock  = threading.Lock()
+_cache: OrderedDict = OrderedDict()   # clave → (expira, generación, cuerpo)
+_bytes = 0
+_stats: dict = {}                     # endpoint → {hits, misses, stale, stores}
+_evictions = 0
+_not_modified: dict = {}              # endpoint → respuestas 304
+
+_generation = None       # última generación conocida
+_gen_read_at = 0.0       # monotonic de la última lectura en BD
+
+
+# ── Generación del catálogo ────────────────────────────────────
+
+def _read_generation():
+    from models import db, CatalogGeneration
+    return db.session.query(CatalogGeneration.generation).filter_by(id=1).scalar() or 0
+
+
+def generation() -> int:
+    """Generación actual (cacheada `gen_check` segundos). Requiere app_context."""
+    global _generation, _gen_read_at
+    now = time.monotonic()
+    if _generation is None or now - _gen_read_at >= _gen_check:
+        try:
+            gen = _read_generation()
+        except Exception as e:
+            logger.debug(f'[CatalogCache] No se pudo leer la generación: {e}')
+            gen = _generation or 0
+        _generation, _gen_read_at = gen, now
+    return _generation
+
+
+def bump(motivo: str = ''):
+    """
+    Incrementa la generación: todo lo cacheado (en este y en los demás
+    procesos) deja de servirse. Llamar dentro de app_context y DESPUÉS del
+    commit de los cambios; nunca rompe al llamante.
+    """
+    global _generation, _gen_read_at
+    from models import db, CatalogGeneration
+    from sqlalchemy import update
+    try:
+        values = {'generation': CatalogGeneration.generation + 1,
+                  'motivo': (motivo or '')[:60] or None, 'updated_at': datetime.utcnow()}
+        res = db.session.execute(
+            update(CatalogGeneration).where(CatalogGeneration.id == 1).values(**values))
+        if not res.rowcount:
+            db.session.add(CatalogGeneration(id=1, generation=1, motivo=values['motivo']))
+        db.session.commit()
+        _generation, _gen_read_at = _read_generation(), time.monotonic()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[CatalogCache] No se pudo incrementar la generación ({motivo}): {e}')
+        # Al menos este proceso deja de servir lo cacheado
+        clear()
+
+
+def bump_coalesced(motivo: str = ''):
+    """
+    bump() para cambios que puede provocar cualquier visitante (endpoints
+    públicos sin login): como mucho uno cada CATALOG_CACHE_PUBLIC_BUMP
+    segundos entre todos los procesos (UPDATE condicional sobre
+    updated_at), para que un bucle de peticiones no vacíe la caché. Lo que
+    llegue dentro de la ventana se ve al caducar las entradas (TTL) o con
+    el siguiente bump. Mismas condiciones que bump().
+    """
+    global _generation, _gen_read_at
+    from models import db, CatalogGeneration
+    from sqlalchemy import or_, update
+    now = datetime.utcnow()
+    try:
+        res = db.session.execute(
+            update(CatalogGeneration)
+            .where(CatalogGeneration.id == 1,
+                   or_(CatalogGeneration.updated_at.is_(None),
+                       CatalogGeneration.updated_at < now - timedelta(seconds=_public_bump)))
+            .values(generation=CatalogGeneration.generation + 1,
+                    motivo=(motivo or '')[:60] or None, updated_at=now))
+        db.session.commit()
+        if res.rowcount:
+            _generation, _gen_read_at = _read_generation(), time.monotonic()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[CatalogCache] No se pudo incrementar la generación ({motivo}): {e}')
+
+
+# ── LRU ────────────────────────────────────────────────────────
+
+def _endpoint_stats(endpoint: str) -> dict:
+    st = _stats.get(endpoint)
+    if st is None:
+        st = _stats[endpoint] = {'hits': 0, 'misses': 0, 'stale': 0, 'stores': 0}
+    return st
+
+
+def _drop(key):
+    global _bytes
+    entry = _cache.pop(key, None)
+    if entry is not None:
+        _bytes -= len(entry[2])
+
+
+def _get(key, endpoint: str, gen: int):
+    with _lock:
+        st = _endpoint_stats(endpoint)
+        entry = _cache.get(key)
+        if entry is None:
+            st['misses'] += 1
+            return None
+        expires, entry_gen, body = entry
+        if entry_gen != gen or time.monotonic() >= expires:
+            _drop(key)
+            st['stale'] += 1
+            st['misses'] += 1
+            return None
+        _cache.move_to_end(key)
+        st['hits'] += 1
+        return body
+
+
+def _put(key, endpoint: str, gen: int, body: bytes):
+    global _bytes, _evictions
+    if len(body) > _max_bytes // 8:
+        return            # una sola respuesta enorme no debe vaciar la caché
+    with _lock:
+        _drop(key)
+        _cache[key] = (time.monotonic() + _ttl, gen, body)
+        _bytes += len(body)
+        _endpoint_stats(endpoint)['stores'] += 1
+        while _cache and (_bytes > _max_bytes or len(_cache) > _MAX_ENTRIES):
+            old_key, (_, _, old_body) = _cache.popitem(last=False)
+            _bytes -= len(old_body)
+            _evictions += 1
+
+
+def memo(name: str, key: tuple, compute):
+    """
+    Valor calculado (JSON-serializable) ligado a la generación actual, en la
+    misma LRU: p. ej. el total de un listado paginado por cursor. Requiere
+    app_context.
+    """
+    import json
+    full_key = ('memo', name, key)
+    endpoint = f'memo:{name}'
+    gen = generation()
+    if _enabled:
+        body = _get(full_key, endpoint, gen)
+        if body is not None:
+            return json.loads(body)
+    value = compute()
+    if _enabled:
+        _put(full_key, endpoint, gen, json.dumps(value).encode())
+    return value
+
+
+def clear():
+    global _bytes
+    with _lock:
+        _cache.clear()
+        _bytes = 0
+
+
+def stats() -> dict:
+    with _lock:
+        endpoints = {}
+        hits = misses = 0
+        for endpoint, st in sorted(_stats.items()):
+            total = st['hits'] + st['misses']
+            endpoints[endpoint] = {**st, 'hit_rate': round(st['hits'] / total, 3) if total else 0.0}
+            hits += st['hits']
+            misses += st['misses']
+        return {
+            'enabled':    _enabled,
+            'generation': _generation,
+            'entries':    len(_cache),
+            'bytes':      _bytes,
+            'max_bytes':  _max_bytes,
+            'ttl':        _ttl,
+            'evictions':  _evictions,
+            'hits':       hits,
+            'misses':     misses,
+            'hit_rate':   round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'endpoints':  endpoints,
+            'not_modified': dict(sorted(_not_modified.items())),
+        }
+
+
+# ── Decorador de vistas ────────────────────────────────────────
+
+def _scope(per_user: bool) -> str:
+    if not per_user:
+        return 'all'
+    from flask import session
+    user_id = session.get('user_id')
+    return f'u{user_id}' if user_id else 'anon'
+
+
+def _request_key(per_user: bool) -> tuple:
+    from flask import request
+    # values = args + form: el player_api de Xtream acepta también POST
+    args = sorted(
+        (k, v.strip()) for k, v in request.values.items(multi=True) if v.strip()
+    )
+    view_args = tuple(sorted((request.view_args or {}).items()))
+    return (request.endpoint, view_args, tuple(args), _scope(per_user))
+
+
+def _pagination_mode() -> str:
+    """
+    'cursor' | 'page': la misma prueba que las vistas ('cursor' in
+    request.args). ?cursor= vacío no desaparece de la clave aunque
+    _request_key descarte los valores vacíos: la forma de la respuesta
+    ({items, has_more, next_cursor} o la paginada) depende de ello.
+    """
+    from flask import request
+    return 'cursor' if 'cursor' in request.args else 'page'
+
+
+def cached(per_user: bool = False, paged: bool = False):
+    """
+    Cachea la respuesta JSON (200) de una vista GET.
+    per_user → la clave incluye el usuario (vistas con _build_visible_query).
+    paged    → solo se cachean las páginas 1.._max_page (?page=N) y la
+               primera del modo cursor.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request, current_app
+            if not _enabled or request.method != 'GET':
+                return view(*args, **kwargs)
+            mode = _pagination_mode()
+            if paged:
+                # Modo cursor: solo la primera página (cursor vacío) es compartida
+                if mode == 'cursor':
+                    if request.args['cursor'].strip():
+                        return view(*args, **kwargs)
+                elif request.args.get('page', 1, type=int) > _max_page:
+                    return view(*args, **kwargs)
+
+            key = _request_key(per_user) + (mode,)
+            endpoint = request.endpoint or view.__name__
+            gen = generation()
+            body = _get(key, endpoint, gen)
+            if body is not None:
+                resp = current_app.response_class(body, mimetype='application/json')
+                resp.headers['X-Cache'] = 'HIT'
+                return resp
+
+            resp = current_app.make_response(view(*args, **kwargs))
+            if (resp.status_code == 200 and resp.mimetype == 'application/json'
+                    and not resp.direct_passthrough):
+                _put(key, endpoint, gen, resp.get_data())
+            resp.headers['X-Cache'] = 'MISS'
+            return resp
+        return wrapper
+    return decorator
+
+
+# ── ETag / Cache-Control ───────────────────────────────────────
+
+def etag(per_user: bool = False) -> str:
+    """ETag fuerte de la petición actual: clave normalizada + generación."""
+    import hashlib
+    gen = generation()
+    raw = repr((_request_key(per_user) + (_pagination_mode(),), gen)).encode()
+    return f'g{gen}-' + hashlib.sha1(raw).hexdigest()[:20]
+
+
+def _cache_headers(resp, tag: str, max_age: int, private: bool):
+    resp.set_etag(tag)
+    resp.headers['Cache-Control'] = f'{"private" if private else "public"}, max-age={max_age}'
+    if private:
+        resp.vary.add('Cookie')
+    return resp
+
+
+def not_modified(tag: str, max_age: int, private: bool = False):
+    """304 para `tag` si el cliente ya lo tiene (If-None-Match); si no, None."""
+    from flask import request, current_app
+    if not request.if_none_match.contains(tag):
+        return None
+    with _lock:
+        _not_modified[request.endpoint] = _not_modified.get(request.endpoint, 0) + 1
+    return _cache_headers(current_app.response_class(status=304), tag, max_age, private)
+
+
+def tag_response(resp, tag: str, max_age: int, private: bool = False):
+    """Añade ETag y Cache-Control a una respuesta 200."""
+    if resp.status_code == 200:
+        _cache_headers(resp, tag, max_age, private)
+    return resp
+
+
+def conditional(max_age: int, per_user: bool = False):
+    """
+    ETag + Cache-Control para una vista GET del catálogo. Con If-None-Match
+    igual al ETag actual devuelve 304 sin ejecutar la vista.
+    per_user → la respuesta depende de la sesión: ETag por usuario y
+    Cache-Control private (nginx no la comparte).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request, current_app
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            tag = etag(per_user)
+            resp = not_modified(tag, max_age, per_user)
+            if resp is not None:
+                return resp
+            resp = current_app.make_response(view(*args, **kwargs))
+            return tag_response(resp, tag, max_age, per_user)
+        return wrapper
+    return decorator
+
+
+def install(app):
+    """Configura la caché desde app.config y crea la fila de generación si falta."""
+    global _enabled, _ttl, _max_bytes, _gen_check, _max_page, _public_bump, _generation
+    from models import db, CatalogGeneration
+    _ttl       = app.config.get('CATALOG_CACHE_TTL', 120)
+    _enabled   = _ttl > 0
+    _max_bytes = app.config.get('CATALOG_CACHE_MAX_MB', 64) * 1024 * 1024
+    _gen_check = app.config.get('CATALOG_CACHE_GEN_CHECK', 2)
+    _max_page  = app.config.get('CATALOG_CACHE_MAX_PAGE', 3)
+    _public_bump = app.config.get('CATALOG_CACHE_PUBLIC_BUMP', 60)
+    # Otra app (otra BD) en el mismo proceso: nada de lo anterior vale
+    clear()
+    _generation = None
+    with app.app_context():
+        if CatalogGeneration.query.get(1) is None:
+            db.session.add(CatalogGeneration(id=1, generation=0))
+            db.session.commit()
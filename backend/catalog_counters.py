@@ -0,0 +1,171 @@
+"""
+Contadores del catálogo (tabla catalog_counters).
+
+/api/stats, el dashboard del admin, el resumen diario y los comandos
+/estado y /stats de Telegram hacían cada uno entre 5 y 12 COUNT(*) sobre
+contenidos; con varios admins y el bot consultando a la vez competían por
+E/S con los imports y los scans. Aquí se guarda el número de filas por
+(tipo, fuente, activo, lista_id):
+
+  SQLite   triggers AFTER INSERT / DELETE / UPDATE OF tipo, fuente,
+           activo, lista_id sobre contenidos. Corren en la misma
+           transacción que la escritura, así que imports (Core insert),
+           scans y toggles (UPDATE activo), purges y borrados de listas
+           quedan contados sin código extra en cada camino.
+  Otro     sin triggers: count() agrupa contenidos en una sola consulta
+           (GROUP BY) en vez de un COUNT por cifra.
+
+reconcile() recalcula la tabla desde contenidos (al crearla y
+periódicamente desde el scheduler) y registra la deriva si la hubiera.
+"""
+import logging
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# 'triggers' | None (GROUP BY en cada lectura)
+_backend = None
+
+_TABLE = 'catalog_counters'
+_KEY = ('tipo', 'fuente', 'activo', 'lista_id')
+
+
+def _key_values(row: str) -> str:
+    """Valores de la clave para new./old. (NULL → '' / 0, como en reconcile)."""
+    return (f"coalesce({row}.tipo, ''), coalesce({row}.fuente, ''), "
+            f"coalesce({row}.activo, 0), coalesce({row}.lista_id, 0)")
+
+
+def _key_match(row: str) -> str:
+    return (f"tipo = coalesce({row}.tipo, '') AND fuente = coalesce({row}.fuente, '') "
+            f"AND activo = coalesce({row}.activo, 0) AND lista_id = coalesce({row}.lista_id, 0)")
+
+
+def _incr(row: str) -> str:
+    cols = ', '.join(_KEY)
+    return (f"INSERT INTO {_TABLE} ({cols}, n) VALUES ({_key_values(row)}, 1) "
+            f"ON CONFLICT ({cols}) DO UPDATE SET n = n + 1;")
+
+
+def _decr(row: str) -> str:
+    return f"UPDATE {_TABLE} SET n = n - 1 WHERE {_key_match(row)};"
+
+
+# ── Instalación ────────────────────────────────────────────────
+
+def _install_sqlite(conn) -> bool:
+    try:
+        changed = ' OR '.join(f'old.{c} IS NOT new.{c}' for c in _KEY)
+        stmts = [
+            f"CREATE TRIGGER IF NOT EXISTS contenidos_cnt_ai AFTER INSERT ON contenidos BEGIN "
+            f"{_incr('new')} END",
+            f"CREATE TRIGGER IF NOT EXISTS contenidos_cnt_ad AFTER DELETE ON contenidos BEGIN "
+            f"{_decr('old')} END",
+            f"CREATE TRIGGER IF NOT EXISTS contenidos_cnt_au AFTER UPDATE OF {', '.join(_KEY)} "
+            f"ON contenidos WHEN {changed} BEGIN {_decr('old')} {_incr('new')} END",
+        ]
+        for stmt in stmts:
+            conn.execute(text(stmt))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f'[Counters] Triggers no disponibles, conteo con GROUP BY: {e}')
+        return False
+
+
+def install(db):
+    """
+    Crea los triggers (SQLite) y rellena la tabla la primera vez. Llamar
+    dentro de app_context tras create_all().
+    """
+    global _backend
+    from models import CatalogCounter, Contenido
+    _backend = None
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.connect() as conn:
+            if _install_sqlite(conn):
+                _backend = 'triggers'
+    if _backend and CatalogCounter.query.first() is None \
+            and db.session.query(Contenido.id).first() is not None:
+        logger.info('[Counters] Calculando los contadores del catálogo…')
+        reconcile()
+
+
+# ── Recalcular ─────────────────────────────────────────────────
+
+_GROUP_SQL = (
+    "SELECT coalesce(tipo, ''), coalesce(fuente, ''), coalesce(activo, 0), "
+    "coalesce(lista_id, 0), count(*) FROM contenidos GROUP BY 1, 2, 3, 4"
+)
+
+
+def _grouped(db) -> dict:
+    """{(tipo, fuente, activo, lista_id): n} contando contenidos (GROUP BY)."""
+    return {(t, f, int(a), l): n for t, f, a, l, n in db.session.execute(text(_GROUP_SQL))}
+
+
+def _stored(db) -> dict:
+    return {(t, f, a, l): n for t, f, a, l, n in db.session.execute(text(
+        f"SELECT {', '.join(_KEY)}, n FROM {_TABLE} WHERE n != 0"))}
+
+
+def reconcile() -> dict:
+    """
+    Rehace catalog_counters desde contenidos. El DELETE toma el bloqueo de
+    escritura antes del INSERT … SELECT, así que el recuento es coherente
+    con los triggers. Con triggers no debería haber deriva: si la hay se
+    registra. Llamar dentro de app_context.
+    """
+    from models import db
+    if _backend != 'triggers':
+        return {'backend': None}
+    cols = ', '.join(_KEY)
+    try:
+        before = _stored(db)
+        db.session.execute(text(f'DELETE FROM {_TABLE}'))
+        db.session.execute(text(f'INSERT INTO {_TABLE} ({cols}, n) {_GROUP_SQL}'))
+        after = _stored(db)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    drift = sum(abs(after.get(k, 0) - before.get(k, 0)) for k in set(after) | set(before))
+    if drift and before:
+        logger.warning(f'[Counters] Deriva corregida: {drift} filas de diferencia')
+    result = {'backend': _backend, 'keys': len(after), 'drift': drift,
+              'total': sum(after.values())}
+    logger.info(f'[Counters] Reconciliado: {result}')
+    return result
+
+
+# ── Lectura ────────────────────────────────────────────────────
+
+def snapshot() -> dict:
+    """
+    Todos los contadores en una consulta: {(tipo, fuente, activo, lista_id): n}.
+    Para varias cifras, leer una vez y pasar el resultado a count().
+    """
+    from models import db
+    return _stored(db) if _backend == 'triggers' else _grouped(db)
+
+
+def count(rows: dict = None, tipo: str = None, fuente: str = None,
+          activo: bool = None, lista_ids=None) -> int:
+    """Suma de contenidos que cumplen los filtros (None = cualquiera)."""
+    if rows is None:
+        rows = snapshot()
+    ids = set(lista_ids) if lista_ids is not None else None
+    total = 0
+    for (t, f, a, l), n in rows.items():
+        if tipo is not None and t != tipo:
+            continue
+        if fuente is not None and f != fuente:
+            continue
+        if activo is not None and bool(a) != activo:
+            continue
+        if ids is not None and l not in ids:
+            continue
+        total += n
+    return total
@@ -0,0 +1,305 @@
+"""
+Circuit breaker por servidor (host:puerto del stream).
+
+Cuando un proveedor cae, los clientes siguen pidiendo sus URLs a
+/api/stream-proxy y /api/hls-proxy y cada petición ocupa un hilo de
+gunicorn durante varios reintentos con timeouts de 8–20 s. Aquí se
+lleva la cuenta de fallos por servidor con tres estados:
+
+  closed     normal: se deja pasar todo
+  open       el servidor se da por caído: los proxies fallan al instante
+             (503) o saltan a una URL de backup; dura `open_seconds`,
+             que se duplica en cada reapertura hasta `max_open_seconds`
+  half_open  ha pasado el tiempo de apertura: se deja pasar UNA petición
+             de prueba; si va bien → closed, si falla → open otra vez
+
+Lo alimentan tres fuentes:
+  - los proxies (errores de conexión, 5xx, páginas de error)
+  - el scanner (resultados por servidor de cada lote)
+  - los reportes de usuarios (ChannelReport, con menos peso)
+
+El estado vive en memoria (consulta sin BD en el camino del proxy) y se
+sincroniza cada `sync_seconds` con la tabla server_breakers en un hilo
+aparte, para que todos los procesos de gunicorn y worker.py compartan
+lo que ve cada uno.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+_fail_threshold   = 5.0    # fallos consecutivos para abrir
+_open_seconds     = 60     # primera apertura
+_max_open_seconds = 900    # tope del backoff exponencial
+_sync_seconds     = 10
+_TRIAL_TIMEOUT    = 30     # s: si la petición de prueba no informa, se permite otra
+
+_lock = threading.Lock()
+# host → {estado, fallos, abierto_hasta, reaperturas, motivo, trial, dirty}
+_hosts: dict[str, dict] = {}
+
+_app = None
+_sync_running = threading.Lock()
+_last_sync = 0.0
+_last_pull = None          # datetime del último pull desde BD
+
+
+def host_of(url: str) -> str:
+    """Servidor de una URL, con el mismo formato que Contenido.servidor (netloc)."""
+    try:
+        return urlparse(url).netloc.lower()
+    except ValueError:
+        return ''
+
+
+def _entry(host: str) -> dict:
+    e = _hosts.get(host)
+    if e is None:
+        e = {'estado': 'closed', 'fallos': 0.0, 'abierto_hasta': 0.0,
+             'reaperturas': 0, 'motivo': None, 'trial': 0.0, 'dirty': False}
+        _hosts[host] = e
+    return e
+
+
+def _open(host: str, e: dict, motivo: str):
+    cooldown = min(_max_open_seconds, _open_seconds * (2 ** e['reaperturas']))
+    e.update(estado='open', abierto_hasta=time.time() + cooldown, trial=0.0,
+             motivo=motivo, dirty=True)
+    e['reaperturas'] += 1
+    logger.warning(f'[Breaker] {host} ABIERTO {cooldown}s ({motivo})')
+
+
+# ── Consulta ───────────────────────────────────────────────────
+
+def state(host: str) -> str:
+    """closed | open | half_open (sin cambiar el estado)."""
+    with _lock:
+        e = _hosts.get(host)
+        if e is None or e['estado'] == 'closed':
+            return 'closed'
+        if e['estado'] == 'open' and time.time() < e['abierto_hasta']:
+            return 'open'
+        return 'half_open'
+
+
+def is_open(host: str) -> bool:
+    return state(host) == 'open'
+
+
+def retry_after(host: str) -> int:
+    """Segundos que quedan de apertura (0 si no está abierto)."""
+    with _lock:
+        e = _hosts.get(host)
+        if not e or e['estado'] != 'open':
+            return 0
+        return max(0, int(e['abierto_hasta'] - time.time()))
+
+
+def allow(host: str) -> bool:
+    """
+    ¿Puede una petición ir a `host`? En half-open solo deja pasar una
+    petición de prueba a la vez; su resultado (record_success/failure)
+    decide si el breaker se cierra o vuelve a abrirse.
+    """
+    if not host:
+        return True
+    _maybe_sync()
+    now = time.time()
+    with _lock:
+        e = _hosts.get(host)
+        if e is None or e['estado'] == 'closed':
+            return True
+        if e['estado'] == 'open' and now < e['abierto_hasta']:
+            return False
+        # half-open: una única prueba en vuelo
+        if e['trial'] and now - e['trial'] < _TRIAL_TIMEOUT:
+            return False
+        e['estado'] = 'half_open'
+        e['trial'] = now
+        return True
+
+
+# ── Registro de resultados ─────────────────────────────────────
+
+def record_success(host: str):
+    if not host:
+        return
+    with _lock:
+        e = _hosts.get(host)
+        if e is None:
+            return
+        if e['estado'] != 'closed':
+            logger.info(f'[Breaker] {host} cerrado (vuelve a responder)')
+        if e['estado'] != 'closed' or e['fallos']:
+            e.update(estado='closed', fallos=0.0, reaperturas=0, trial=0.0,
+                     motivo=None, dirty=True)
+    _maybe_sync()
+
+
+def record_failure(host: str, motivo: str = 'proxy', weight: float = 1.0):
+    """Suma un fallo. `weight` < 1 para señales débiles (reportes de usuarios)."""
+    if not host:
+        return
+    with _lock:
+        e = _entry(host)
+        if e['estado'] == 'half_open':
+            _open(host, e, f'{motivo} (prueba fallida)')
+        elif e['estado'] == 'closed':
+            e['fallos'] += weight
+            e['motivo'] = motivo
+            e['dirty'] = True
+            if e['fallos'] >= _fail_threshold:
+                _open(host, e, motivo)
+        # open: ya está abierto, no se alarga
+    _maybe_sync()
+
+
+def record_batch(host: str, ok: int, failed: int, motivo: str = 'scan'):
+    """
+    Resultados agregados del scanner para un servidor. Cualquier URL viva
+    cierra el breaker. Si todas fallaron y son suficientes, se abre: una
+    URL caída suelta (404) no dice nada del servidor, cien seguidas sí.
+    """
+    if not host:
+        return
+    if ok:
+        record_success(host)
+    elif failed >= _fail_threshold:
+        with _lock:
+            e = _entry(host)
+            if e['estado'] != 'open' or time.time() >= e['abierto_hasta']:
+                _open(host, e, f'{motivo}: {failed} URLs caídas')
+        _maybe_sync()
+
+
+def reset(host: str):
+    """Cierra a mano el breaker de un servidor (panel admin)."""
+    with _lock:
+        e = _entry(host)
+        e.update(estado='closed', fallos=0.0, reaperturas=0, trial=0.0,
+                 abierto_hasta=0.0, motivo='reset manual', dirty=True)
+    _maybe_sync(force=True)
+
+
+def snapshot() -> list:
+    """Servidores con fallos o abiertos, para el panel admin."""
+    now = time.time()
+    with _lock:
+        out = []
+        for host, e in _hosts.items():
+            if e['estado'] == 'closed' and not e['fallos']:
+                continue
+            estado = e['estado']
+            if estado == 'open' and now >= e['abierto_hasta']:
+                estado = 'half_open'
+            out.append({
+                'servidor':    host,
+                'estado':      estado,
+                'fallos':      round(e['fallos'], 1),
+                'reaperturas': e['reaperturas'],
+                'retry_after': max(0, int(e['abierto_hasta'] - now)) if estado == 'open' else 0,
+                'motivo':      e['motivo'],
+            })
+    out.sort(key=lambda x: (x['estado'] != 'open', -x['fallos']))
+    return out
+
+
+# ── Sincronización con BD ──────────────────────────────────────
+
+def _maybe_sync(force: bool = False):
+    """Lanza sync() en un hilo si toca (nunca bloquea al llamante)."""
+    global _last_sync
+    if _app is None:
+        return
+    now = time.monotonic()
+    if not force and now - _last_sync < _sync_seconds:
+        return
+    if not _sync_running.acquire(blocking=False):
+        return
+    _last_sync = now
+
+    def _run():
+        try:
+            sync(_app)
+        except Exception as e:
+            logger.debug(f'[Breaker] sync falló: {e}')
+        finally:
+            _sync_running.release()
+
+    threading.Thread(target=_run, name='breaker-sync', daemon=True).start()
+
+
+def sync(app):
+    """
+    Escribe en server_breakers los cambios locales y adopta los que hayan
+    hecho otros procesos desde el último pull (si aquí no hay cambios
+    pendientes para ese servidor).
+    """
+    global _last_pull
+    from models import db, ServerBreaker
+
+    with _lock:
+        dirty = {h: dict(e) for h, e in _hosts.items() if e['dirty']}
+        for e in _hosts.values():
+            e['dirty'] = False
+
+    with app.app_context():
+        now = datetime.utcnow()
+        if dirty:
+            existing = {}
+            hosts = list(dirty)
+            for i in range(0, len(hosts), 900):
+                for row in ServerBreaker.query.filter(
+                        ServerBreaker.servidor.in_(hosts[i:i + 900])):
+                    existing[row.servidor] = row
+            for host, e in dirty.items():
+                row = existing.get(host)
+                if row is None:
+                    row = ServerBreaker(servidor=host)
+                    db.session.add(row)
+                # half_open es local (prueba en vuelo): en BD cuenta como open
+                row.estado      = 'closed' if e['estado'] == 'closed' else 'open'
+                row.fallos      = e['fallos']
+                row.reaperturas = e['reaperturas']
+                row.motivo      = (e['motivo'] or '')[:200] or None
+                row.abierto_hasta = (datetime.utcfromtimestamp(e['abierto_hasta'])
+                                     if e['abierto_hasta'] else None)
+                row.updated_at  = now
+            db.session.commit()
+
+        q = ServerBreaker.query
+        if _last_pull is not None:
+            q = q.filter(ServerBreaker.updated_at > _last_pull)
+        rows = q.all()
+        _last_pull = now
+
+        with _lock:
+            for row in rows:
+                if row.servidor in dirty:
+                    continue          # lo acabamos de escribir nosotros
+                e = _entry(row.servidor)
+                if e['dirty']:
+                    continue          # cambio local posterior: gana en el próximo push
+                e.update(
+                    estado=row.estado if row.estado == 'closed' else 'open',
+                    fallos=row.fallos or 0.0,
+                    reaperturas=row.reaperturas or 0,
+                    motivo=row.motivo,
+                    abierto_hasta=((row.abierto_hasta - datetime(1970, 1, 1)).total_seconds()
+                                   if row.abierto_hasta else 0.0),
+                    trial=0.0,
+                )
+
+
+def install(app, fail_threshold: float = 5, open_seconds: int = 60,
+            max_open_seconds: int = 900, sync_seconds: int = 10):
+    """Configura el breaker y activa la sincronización con BD para `app`."""
+    global _app, _fail_threshold, _open_seconds, _max_open_seconds, _sync_seconds
+    _fail_threshold   = float(fail_threshold)
+    _open_seconds     = open_seconds
+    _max_open_seconds = max_open_seconds
+    _sync_seconds     = sync_seconds
+    _app = app
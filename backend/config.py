@@ -39,6 +39,77 @@ class Config:
     # AUTO_SCAN=0 → no comprobar links automáticamente (recomendado para listas grandes)
     # AUTO_SCAN=1 → habilitar escaneo automático cada SCAN_INTERVAL_HOURS horas
     AUTO_SCAN = int(os.environ.get('AUTO_SCAN', 0))
+    # Días que un stream M3U debe seguir caído antes de que el purge semanal lo borre
+    PURGE_DEAD_DAYS = int(os.environ.get('PURGE_DEAD_DAYS', 7))
+    # Scan live: bytes leídos por URL (o primer segmento HLS) para medir el
+    # throughput, y ventana máxima de lectura en segundos.
+    LIVE_PROBE_KB     = int(os.environ.get('LIVE_PROBE_KB', 256))
+    LIVE_PROBE_WINDOW = float(os.environ.get('LIVE_PROBE_WINDOW', 4))
+    # Canales por lote del scan live y días de historial de LiveScanReport
+    LIVE_SCAN_BATCH_SIZE = int(os.environ.get('LIVE_SCAN_BATCH_SIZE', 500))
+    LIVE_REPORT_DAYS     = int(os.environ.get('LIVE_REPORT_DAYS', 7))
+    # Días de telemetría de scans (sondas/s, latencias, timeouts) — scan_metrics
+    SCAN_METRICS_DAYS    = int(os.environ.get('SCAN_METRICS_DAYS', 30))
+
+    # ── Worker de tareas en background ────────────────────────
+    # BACKGROUND_WORKER=0 → scans, imports y scheduler corren en hilos del
+    #   proceso web (gunicorn debe ir con --workers 1).
+    # BACKGROUND_WORKER=1 → el web solo encola; los ejecuta worker.py
+    #   (cinecadiz-worker.service) y gunicorn puede usar varios workers.
+    BACKGROUND_WORKER   = int(os.environ.get('BACKGROUND_WORKER', 0))
+    WORKER_POLL_SECONDS = float(os.environ.get('WORKER_POLL_SECONDS', 2))
+    WORKER_CONCURRENCY  = int(os.environ.get('WORKER_CONCURRENCY', 2))   # tareas de la cola a la vez
+    # Archivos M3U subidos pendientes de importar (compartido web ↔ worker)
+    UPLOAD_DIR = os.environ.get('UPLOAD_DIR', os.path.join(BASE_DIR, 'instance', 'uploads'))
+
+    # ── Circuit breaker por servidor (proxies + scanner) ──────
+    # Fallos consecutivos para abrir, segundos de la primera apertura
+    # (se duplican en cada reapertura hasta el máximo) y cada cuánto se
+    # sincroniza el estado entre procesos a través de la BD.
+    BREAKER_FAIL_THRESHOLD   = float(os.environ.get('BREAKER_FAIL_THRESHOLD', 5))
+    BREAKER_OPEN_SECONDS     = int(os.environ.get('BREAKER_OPEN_SECONDS', 60))
+    BREAKER_MAX_OPEN_SECONDS = int(os.environ.get('BREAKER_MAX_OPEN_SECONDS', 900))
+    BREAKER_SYNC_SECONDS     = int(os.environ.get('BREAKER_SYNC_SECONDS', 10))
+
+    # ── Caché de respuestas del catálogo (/api/generos, /api/contenido…) ──
+    # TTL por entrada, memoria máxima (MB) de la LRU, cada cuántos segundos
+    # se relee el contador de generación de la BD (invalidación entre
+    # procesos) y hasta qué página de /api/contenido se cachea.
+    CATALOG_CACHE_TTL       = int(os.environ.get('CATALOG_CACHE_TTL', 120))
+    CATALOG_CACHE_MAX_MB    = int(os.environ.get('CATALOG_CACHE_MAX_MB', 64))
+    CATALOG_CACHE_GEN_CHECK = float(os.environ.get('CATALOG_CACHE_GEN_CHECK', 2))
+    CATALOG_CACHE_MAX_PAGE  = int(os.environ.get('CATALOG_CACHE_MAX_PAGE', 3))
+    # Bumps desde endpoints públicos (add-url de canales live): uno cada N segundos
+    CATALOG_CACHE_PUBLIC_BUMP = int(os.environ.get('CATALOG_CACHE_PUBLIC_BUMP', 60))
+
+    # ── Tendencias (/api/trending, ver trending.py) ───────────
+    # Días de WatchHistory considerados, vida media (horas) del peso de una
+    # reproducción, filas por pool y cada cuántos minutos se recalcula.
+    TRENDING_WINDOW_DAYS      = int(os.environ.get('TRENDING_WINDOW_DAYS', 30))
+    TRENDING_HALF_LIFE_HOURS  = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 72))
+    TRENDING_POOL_SIZE        = int(os.environ.get('TRENDING_POOL_SIZE', 300))
+    TRENDING_REFRESH_MINUTES  = int(os.environ.get('TRENDING_REFRESH_MINUTES', 15))
+
+    # ── Recomendaciones (ver reco_matrix.py) ──────────────────
+    # Matriz contenido × género en memoria (requiere NumPy; 0 = pool SQL) y
+    # segundos mínimos entre reconstrucciones tras cambios en el catálogo.
+    RECO_MATRIX         = int(os.environ.get('RECO_MATRIX', 1))
+    RECO_MATRIX_REFRESH = int(os.environ.get('RECO_MATRIX_REFRESH', 300))
+
+    # ── Perfiles de gustos (ver taste_profiles.py) ────────────
+    # Factor por el que se multiplican los pesos en cada reproducción,
+    # perfiles en la LRU de cada proceso y segundos hasta releerlos.
+    TASTE_DECAY         = float(os.environ.get('TASTE_DECAY', 0.85))
+    TASTE_PROFILE_CACHE = int(os.environ.get('TASTE_PROFILE_CACHE', 10000))
+    TASTE_PROFILE_TTL   = int(os.environ.get('TASTE_PROFILE_TTL', 30))
+
+    # ── Caché DNS (scanner + proxies) ─────────────────────────
+    # Segundos que se reutiliza una resolución correcta / un fallo de DNS
+    DNS_CACHE_TTL          = int(os.environ.get('DNS_CACHE_TTL', 300))
+    DNS_CACHE_NEGATIVE_TTL = int(os.environ.get('DNS_CACHE_NEGATIVE_TTL', 30))
+    # Permite a los proxies acceder a IPs privadas/locales. SOLO para pruebas
+    # de carga con bench/fake_provider.py — nunca en producción (SSRF).
+    PROXY_ALLOW_PRIVATE = bool(int(os.environ.get('PROXY_ALLOW_PRIVATE', 0)))
 
     # ── Subida de archivos ────────────────────────────────────
     # Límite máximo de tamaño para archivos M3U subidos (50 MB)
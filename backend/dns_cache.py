@@ -0,0 +1,182 @@
+"""
+Caché DNS compartida por todo el proceso.
+
+Un scan de 80k URLs reparte las peticiones entre unos pocos cientos de
+hosts: sin caché cada probe vuelve a resolver el mismo nombre. Aquí se
+resuelve una vez por host y TTL, y el resultado lo usan:
+  - todas las peticiones salientes de `requests` (scanner, proxies, import),
+    vía install(), que envuelve urllib3.util.connection.create_connection
+  - _is_private() de routes_api, que comprueba las IPs resueltas (SSRF)
+    sin coste extra: la conexión posterior reutiliza la misma resolución.
+
+Thread-safe: un único lock para el diccionario y "single-flight" por host
+— si 40 workers piden el mismo host nuevo a la vez, solo uno hace la
+consulta DNS y el resto espera su resultado.
+"""
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MAX_ENTRIES = 4096
+
+_ttl          = 300    # segundos para resoluciones correctas
+_negative_ttl = 30     # segundos para fallos (NXDOMAIN, timeout DNS…)
+
+_lock     = threading.Lock()
+_cache: OrderedDict = OrderedDict()   # host → (expira, [(family, ip)] | None, error | None)
+_inflight: dict[str, threading.Event] = {}
+_stats = {'hits': 0, 'misses': 0, 'negative_hits': 0}
+
+_installed = False
+
+
+def _is_ip_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _lookup(host: str):
+    """Consulta DNS real. Devuelve lista de (family, ip) sin duplicados."""
+    infos = socket.getaddrinfo(host, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+    seen, addrs = set(), []
+    for family, _, _, _, sa in infos:
+        ip = sa[0]
+        if ip not in seen:
+            seen.add(ip)
+            addrs.append((family, ip))
+    return addrs
+
+
+def resolve(host: str) -> list:
+    """
+    Devuelve [(family, ip), …] para `host`, usando la caché.
+    Lanza socket.gaierror si el host no resuelve (también desde la caché
+    negativa, sin volver a consultar hasta que expire).
+    """
+    host = (host or '').strip('[]').lower()
+    if not host:
+        raise socket.gaierror(socket.EAI_NONAME, 'host vacío')
+    if _is_ip_literal(host):
+        ip = ipaddress.ip_address(host)
+        return [(socket.AF_INET6 if ip.version == 6 else socket.AF_INET, host)]
+
+    while True:
+        with _lock:
+            entry = _cache.get(host)
+            if entry and entry[0] > time.monotonic():
+                _cache.move_to_end(host)
+                if entry[2] is not None:
+                    _stats['negative_hits'] += 1
+                    raise entry[2]
+                _stats['hits'] += 1
+                return entry[1]
+            event = _inflight.get(host)
+            if event is None:
+                # Este hilo hace la consulta; los demás esperarán al evento
+                event = threading.Event()
+                _inflight[host] = event
+                _stats['misses'] += 1
+                break
+        event.wait(10)
+
+    addrs, error = None, None
+    try:
+        addrs = _lookup(host)
+        if not addrs:
+            raise socket.gaierror(socket.EAI_NONAME, f'{host}: sin direcciones')
+    except (socket.gaierror, socket.herror, UnicodeError) as e:
+        error = e if isinstance(e, socket.gaierror) else socket.gaierror(str(e))
+        addrs = None
+    finally:
+        with _lock:
+            ttl = _ttl if error is None else _negative_ttl
+            _cache[host] = (time.monotonic() + ttl, addrs, error)
+            _cache.move_to_end(host)
+            while len(_cache) > _MAX_ENTRIES:
+                _cache.popitem(last=False)
+            _inflight.pop(host, None).set()
+
+    if error is not None:
+        raise error
+    return addrs
+
+
+def resolve_ips(host: str) -> list:
+    """Solo las IPs (str) de resolve()."""
+    return [ip for _, ip in resolve(host)]
+
+
+def is_private_ip(ip: str) -> bool:
+    """True si la IP es local, privada, link-local, reservada o multicast."""
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return True
+    if addr.version == 6 and addr.ipv4_mapped:
+        addr = addr.ipv4_mapped
+    return (addr.is_private or addr.is_loopback or addr.is_link_local
+            or addr.is_reserved or addr.is_multicast or addr.is_unspecified)
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        total = _stats['hits'] + _stats['misses'] + _stats['negative_hits']
+        return {
+            **_stats,
+            'size':     len(_cache),
+            'hit_rate': round((_stats['hits'] + _stats['negative_hits']) / total, 3) if total else 0.0,
+            'ttl':      _ttl,
+            'negative_ttl': _negative_ttl,
+        }
+
+
+def install(ttl: int = 300, negative_ttl: int = 30):
+    """
+    Hace que urllib3 (y por tanto requests) resuelva a través de la caché.
+
+    Se sustituye create_connection por una versión que resuelve el host con
+    resolve() y conecta a las IPs en orden; el hostname original se sigue
+    usando para la cabecera Host y el SNI de TLS, así que HTTPS no cambia.
+    """
+    global _ttl, _negative_ttl, _installed
+    _ttl, _negative_ttl = ttl, negative_ttl
+    if _installed:
+        return
+    from urllib3.util import connection as _conn
+
+    _original = _conn.create_connection
+
+    def create_connection(address, *args, **kwargs):
+        host, port = address
+        if not host or _is_ip_literal(host.strip('[]')):
+            return _original(address, *args, **kwargs)
+
+        family = _conn.allowed_gai_family()
+        addrs = [ip for fam, ip in resolve(host)
+                 if family == socket.AF_UNSPEC or fam == family]
+        err = None
+        for ip in addrs:
+            try:
+                return _original((ip, port), *args, **kwargs)
+            except OSError as e:
+                err = e
+        if err is not None:
+            raise err
+        raise OSError(f'{host}: sin direcciones utilizables')
+
+    _conn.create_connection = create_connection
+    _installed = True
+    logger.info(f'[DNS] Caché instalada (ttl={ttl}s, negativa={negative_ttl}s)')
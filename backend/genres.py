@@ -0,0 +1,271 @@
+"""
+Géneros normalizados (tablas generos y contenido_generos).
+
+Contenido.genero es una cadena separada por comas: filtrar era
+genero ILIKE '%x%' OR group_title ILIKE '%x%' (recorrido completo), el menú
+de /api/generos limpiaba en Python todos los valores distintos y las
+recomendaciones partían la cadena de cada candidato. Aquí:
+
+  Genero           una fila por género; clave = nombre sin acentos ni
+                   mayúsculas, n_activos precalculado para el menú
+  ContenidoGenero  enlace (contenido_id, genero_id, pos) con índice por
+                   género; pos 0 = género principal
+
+Los enlaces se crean al insertar (imports M3U y RSS: link_since). Un
+trigger (SQLite) borra los enlaces de los contenidos borrados.
+refresh_counts() recalcula n_activos tras los imports y cada hora (los
+scans solo cambian qué géneros tienen algo activo). reconcile(), una vez
+al día, completa enlaces y limpia huérfanos.
+"""
+import logging
+import unicodedata
+from datetime import datetime
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+_BATCH = 5000   # contenidos por vuelta (keyset por id)
+_MAX_LEN = 100  # Genero.nombre / clave
+
+
+def clave(nombre: str) -> str:
+    """"Acción " → "accion": clave de comparación de un género."""
+    nfkd = unicodedata.normalize('NFKD', nombre or '')
+    return ''.join(ch for ch in nfkd if not unicodedata.combining(ch)).casefold().strip()
+
+
+def split(genero: str) -> list:
+    """Géneros de Contenido.genero en orden, sin vacíos ni repetidos (por clave)."""
+    out, seen = [], set()
+    for part in (genero or '').split(','):
+        nombre = part.strip()[:_MAX_LEN]
+        k = clave(nombre)
+        if k and k not in seen:
+            seen.add(k)
+            out.append(nombre)
+    return out
+
+
+# ── Enlaces ────────────────────────────────────────────────────
+
+def _insert_ignore(table):
+    """INSERT que ignora las filas ya existentes (clave única / PK)."""
+    from models import db
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing()
+    return table.insert().prefix_with('OR IGNORE')
+
+
+def _ensure(nombres: dict) -> dict:
+    """{clave: nombre} → {clave: genero_id}, creando los géneros que falten."""
+    from models import db, Genero
+    claves = list(nombres)
+    ids = {}
+    for i in range(0, len(claves), 900):
+        ids.update(db.session.query(Genero.clave, Genero.id)
+                   .filter(Genero.clave.in_(claves[i:i + 900])))
+    missing = [k for k in claves if k not in ids]
+    if missing:
+        now = datetime.utcnow()
+        db.session.execute(
+            _insert_ignore(Genero.__table__),
+            [{'clave': k, 'nombre': nombres[k], 'n_activos': 0, 'updated_at': now}
+             for k in missing],
+        )
+        for i in range(0, len(missing), 900):
+            ids.update(db.session.query(Genero.clave, Genero.id)
+                       .filter(Genero.clave.in_(missing[i:i + 900])))
+    return ids
+
+
+def link_rows(rows) -> int:
+    """
+    Enlaza [(contenido_id, genero)] con sus géneros (idempotente). No hace
+    commit. Devuelve los enlaces escritos.
+    """
+    from models import db, ContenidoGenero
+    parsed, nombres = [], {}
+    for cid, genero in rows:
+        gs = split(genero)
+        if gs:
+            parsed.append((cid, gs))
+            for nombre in gs:
+                nombres.setdefault(clave(nombre), nombre)
+    if not parsed:
+        return 0
+    ids = _ensure(nombres)
+    links = [{'contenido_id': cid, 'genero_id': ids[clave(nombre)], 'pos': pos}
+             for cid, gs in parsed for pos, nombre in enumerate(gs)]
+    stmt = _insert_ignore(ContenidoGenero.__table__)
+    for i in range(0, len(links), 5000):
+        db.session.execute(stmt, links[i:i + 5000])
+    return len(links)
+
+
+def link_since(last_id: int) -> int:
+    """
+    Enlaza los contenidos con id > last_id (lo recién insertado por un
+    import). Llamar dentro de app_context; hace commit. Nunca rompe al
+    llamante: reconcile() lo arregla.
+    """
+    from models import db, Contenido
+    total = 0
+    try:
+        while True:
+            rows = (
+                db.session.query(Contenido.id, Contenido.genero)
+                .filter(Contenido.id > last_id)
+                .order_by(Contenido.id)
+                .limit(_BATCH)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+            total += link_rows((r.id, r.genero) for r in rows if r.genero)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[Genres] No se pudieron enlazar los géneros: {e}')
+    return total
+
+
+def max_id() -> int:
+    """Último id de contenidos (para link_since tras un import)."""
+    from models import db, Contenido
+    from sqlalchemy import func
+    return db.session.query(func.max(Contenido.id)).scalar() or 0
+
+
+# ── Contadores y mantenimiento ─────────────────────────────────
+
+def refresh_counts():
+    """Recalcula Genero.n_activos (contenidos activos por género). Hace commit."""
+    from models import db
+    try:
+        db.session.execute(text(
+            "UPDATE generos SET n_activos = ("
+            " SELECT count(*) FROM contenido_generos cg"
+            " JOIN contenidos c ON c.id = cg.contenido_id"
+            " WHERE cg.genero_id = generos.id AND c.activo = 1)"
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[Genres] No se pudieron recalcular los contadores: {e}')
+
+
+def reconcile() -> dict:
+    """
+    Completa los enlaces que falten desde Contenido.genero (keyset por id;
+    los existentes se ignoran), borra los de contenidos que ya no existen y
+    recalcula los contadores. Llamar dentro de app_context.
+    """
+    from models import db
+    orphans = db.session.execute(text(
+        "DELETE FROM contenido_generos WHERE contenido_id NOT IN (SELECT id FROM contenidos)"
+    )).rowcount or 0
+    db.session.commit()
+    links = link_since(0)
+    refresh_counts()
+    result = {'links_checked': links, 'orphans': orphans}
+    logger.info(f'[Genres] Reconciliado: {result}')
+    return result
+
+
+def install(db):
+    """
+    Crea el trigger de borrado (SQLite) y, la primera vez, los enlaces.
+    Llamar dentro de app_context tras create_all().
+    """
+    from models import Genero, Contenido
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.connect() as conn:
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS contenidos_generos_ad AFTER DELETE ON contenidos "
+                "BEGIN DELETE FROM contenido_generos WHERE contenido_id = old.id; END"
+            ))
+            conn.commit()
+    if Genero.query.first() is not None:
+        return
+    if db.session.query(Contenido.id).filter(
+            Contenido.genero.isnot(None), Contenido.genero != '').first() is None:
+        return
+    logger.info('[Genres] Creando el índice de géneros del catálogo…')
+    try:
+        reconcile()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[Genres] No se pudo crear el índice de géneros: {e}')
+
+
+# ── Consulta ───────────────────────────────────────────────────
+
+def matching_ids(value: str) -> list:
+    """
+    Géneros que corresponden a `value` (menú o texto libre): el de misma
+    clave o, si no hay, los que la contienen (como el antiguo ILIKE).
+    """
+    from models import db, Genero
+    k = clave(value)
+    if not k:
+        return []
+    exact = db.session.query(Genero.id).filter(Genero.clave == k).scalar()
+    if exact is not None:
+        return [exact]
+    return [r[0] for r in db.session.query(Genero.id).filter(Genero.clave.contains(k))]
+
+
+def contenido_ids(genero_ids):
+    """Subconsulta de ids de contenidos con alguno de esos géneros."""
+    from models import db, ContenidoGenero
+    return (db.session.query(ContenidoGenero.contenido_id)
+            .filter(ContenidoGenero.genero_id.in_(list(genero_ids)))
+            .scalar_subquery())
+
+
+def filter_query(query, value: str):
+    """
+    Filtra `query` (sobre Contenido) por género con el índice de enlaces.
+    Si `value` no es ningún género (p. ej. un group_title del menú de
+    respaldo), vuelve al ILIKE sobre genero / group_title.
+    """
+    from models import Contenido
+    from sqlalchemy import or_
+    ids = matching_ids(value)
+    if ids:
+        return query.filter(Contenido.id.in_(contenido_ids(ids)))
+    return query.filter(or_(Contenido.genero.ilike(f'%{value}%'),
+                            Contenido.group_title.ilike(f'%{value}%')))
+
+
+def menu() -> list:
+    """Nombres de los géneros con contenido activo, ordenados."""
+    from models import db, Genero
+    return sorted((r[0] for r in db.session.query(Genero.nombre).filter(Genero.n_activos > 0)),
+                  key=str.lower)
+
+
+def genres_of(contenido_ids) -> dict:
+    """{contenido_id: [genero_id, …]} en orden (pos), para puntuar candidatos."""
+    from models import db, ContenidoGenero
+    ids = list(contenido_ids)
+    out: dict = {}
+    for i in range(0, len(ids), 900):
+        for cid, gid in (db.session.query(ContenidoGenero.contenido_id, ContenidoGenero.genero_id)
+                         .filter(ContenidoGenero.contenido_id.in_(ids[i:i + 900]))
+                         .order_by(ContenidoGenero.contenido_id, ContenidoGenero.pos)):
+            out.setdefault(cid, []).append(gid)
+    return out
+
+
+def names(genero_ids) -> list:
+    """Nombres de esos géneros, en el mismo orden."""
+    from models import db, Genero
+    ids = list(genero_ids)
+    if not ids:
+        return []
+    by_id = dict(db.session.query(Genero.id, Genero.nombre).filter(Genero.id.in_(ids)))
+    return [by_id[i] for i in ids if i in by_id]
@@ -10,6 +10,7 @@ Solo se verifican items fuente='m3u' (los RSS son páginas web, no streams).
 Con 40 workers y timeout=5s → ~500 links por minuto.
 """
 import logging
+import threading
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -81,20 +82,35 @@ def _is_real_stream(r) -> bool:
 
 
 def check_url(url: str, timeout: int = 5) -> bool:
+    """True si la URL devuelve un stream real (ver check_url_detailed)."""
+    return check_url_detailed(url, timeout)['alive']
+
+
+def check_url_detailed(url: str, timeout: int = 5) -> dict:
     """
-    True si la URL devuelve un stream real (no una página HTML de error).
+    Comprueba si la URL devuelve un stream real (no una página HTML de error).
 
     Estrategia:
       1. GET parcial (Range) con UA de VLC.
       2. Fallback con UA de navegador.
       Para cada intento: comprueba código HTTP Y contenido para
       descartar falsos positivos (servidores que devuelven 200 + HTML).
+
+    Devuelve {'alive', 'latency_ms', 'attempts', 'timeout', 'html'} —
+    attempts=2 si hizo falta el UA de navegador; timeout/html indican si
+    algún intento agotó el timeout o devolvió una página de error. Son los
+    datos de la telemetría del scan (scan_metrics).
     """
+    import time
     connect_t = min(timeout, 8)
     read_t    = max(timeout, 12)
+    out = {'alive': False, 'latency_ms': None, 'attempts': 0,
+           'timeout': False, 'html': False}
 
     for headers in (_HEADERS_VLC, _HEADERS_BROWSER):
+        out['attempts'] += 1
         try:
+            t0 = time.monotonic()
             r = requests.get(
                 url,
                 headers=headers,
@@ -102,6 +118,7 @@ def check_url(url: str, timeout: int = 5) -> bool:
                 allow_redirects=True,
                 timeout=(connect_t, read_t),
             )
+            latency = int((time.monotonic() - t0) * 1000)
 
             # Códigos de error definitivos
             if r.status_code >= 400 and r.status_code not in (401, 403, 405):
@@ -111,22 +128,27 @@ def check_url(url: str, timeout: int = 5) -> bool:
             # Auth requerida → el recurso existe
             if r.status_code in (401, 403, 405):
                 r.close()
-                return True
+                out.update(alive=True, latency_ms=latency)
+                return out
 
             # 2xx / 3xx → verificar que es stream real
             alive = _is_real_stream(r)
             r.close()
             if alive:
-                return True
-            # Si llegamos aquí con VLC-UA, intentamos con browser-UA
+                out.update(alive=True, latency_ms=latency)
+                return out
+            # Página de error con 200: si llegamos aquí con VLC-UA,
+            # intentamos con browser-UA
+            out['html'] = True
             continue
 
         except requests.exceptions.Timeout:
+            out['timeout'] = True
             continue
         except Exception:
             continue
 
-    return False
+    return out
 
 
 def check_url_with_latency(url: str, timeout: int = 5) -> tuple:
@@ -173,180 +195,667 @@ def check_url_with_latency(url: str, timeout: int = 5) -> tuple:
     return False, 0
 
 
-def scan_live_channels(app, max_workers: int = 20) -> dict:
+# ── Calidad de stream (TTFB + throughput) ──────────────────────
+# Throughput a partir del cual una URL puntúa el máximo (kbit/s ≈ 1080p)
+_TARGET_KBPS = 4000
+# TTFB a partir del cual una URL puntúa 0 en esa componente
+_MAX_TTFB_MS = 5000
+# Peso de la medición nueva en la puntuación móvil (EWMA)
+_SCORE_ALPHA = 0.5
+
+_HLS_TYPES = ('application/vnd.apple.mpegurl', 'application/x-mpegurl', 'audio/mpegurl')
+
+
+def _hls_next_uri(text: str, base_url: str):
+    """
+    Primera URI útil de un manifiesto HLS.
+    Devuelve (url_absoluta, es_variante) — es_variante=True si el manifiesto
+    es maestro y la URI apunta a otra playlist; None si no hay ninguna.
+    """
+    from urllib.parse import urljoin
+    is_master = '#EXT-X-STREAM-INF' in text
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            return urljoin(base_url, line), is_master
+    return None
+
+
+def _measure_body(r, sample_bytes: int, window: float, t_start: float) -> dict | None:
+    """
+    Lee hasta `sample_bytes` (o `window` segundos) del cuerpo de `r`.
+    Devuelve {'ttfb_ms', 'throughput_kbps'} o None si el cuerpo es HTML.
+    """
+    import time
+    t_first = None
+    received = 0
+    for chunk in r.iter_content(16384):
+        if not chunk:
+            continue
+        now = time.monotonic()
+        if t_first is None:
+            t_first = now
+            head = chunk[:64].lower()
+            if any(sig.lower() in head for sig in _HTML_SIGNATURES):
+                return None
+        received += len(chunk)
+        if received >= sample_bytes or now - t_first >= window:
+            break
+    if t_first is None:
+        return {'ttfb_ms': None, 'throughput_kbps': 0}
+    # Throughput efectivo desde la petición: incluye el arranque, que es
+    # lo que el usuario percibe al cambiar de canal
+    elapsed = max(time.monotonic() - t_start, 0.001)
+    return {
+        'ttfb_ms':         int((t_first - t_start) * 1000),
+        'throughput_kbps': int(received * 8 / 1000 / elapsed),
+    }
+
+
+def probe_stream_quality(url: str, timeout: int = 5,
+                         sample_bytes: int = 256 * 1024, window: float = 4.0) -> dict:
+    """
+    Comprueba una URL live y mide su calidad de servicio.
+
+    - latency_ms: tiempo hasta las cabeceras (igual que check_url_with_latency)
+    - ttfb_ms: tiempo hasta el primer byte de vídeo
+    - throughput_kbps: kbit/s sobre los primeros `sample_bytes` o `window` s
+    Para .m3u8 se sigue el manifiesto (maestro → variante) y se mide el
+    primer segmento, que es lo que realmente descarga el reproductor.
+
+    Devuelve {'alive', 'latency_ms', 'ttfb_ms', 'throughput_kbps'} más
+    'attempts', 'timeout' y 'html' como check_url_detailed().
+    """
+    import time
+    connect_t = min(timeout, 8)
+    read_t    = max(timeout, 12)
+    flags = {'attempts': 0, 'timeout': False, 'html': False}
+    dead = {'alive': False, 'latency_ms': 0, 'ttfb_ms': None, 'throughput_kbps': None}
+
+    for base_headers in (_HEADERS_VLC, _HEADERS_BROWSER):
+        # Sin Range: queremos medir un tramo real del stream, no 1 KB
+        headers = {k: v for k, v in base_headers.items() if k != 'Range'}
+        flags['attempts'] += 1
+        try:
+            t0 = time.monotonic()
+            r = requests.get(url, headers=headers, stream=True,
+                             allow_redirects=True, timeout=(connect_t, read_t))
+            latency = int((time.monotonic() - t0) * 1000)
+
+            if r.status_code >= 400 and r.status_code not in (401, 403, 405):
+                r.close()
+                continue
+            if r.status_code in (401, 403, 405):
+                # Existe pero no podemos medir el cuerpo
+                r.close()
+                return {'alive': True, 'latency_ms': latency,
+                        'ttfb_ms': None, 'throughput_kbps': None, **flags}
+
+            ct = r.headers.get('Content-Type', '').lower().split(';')[0].strip()
+            if ct in ('text/html', 'application/xhtml+xml'):
+                r.close()
+                flags['html'] = True
+                continue
+
+            is_hls = ct in _HLS_TYPES or '.m3u8' in url.lower().split('?')[0]
+            if not is_hls:
+                if ct == 'text/plain':
+                    r.close()
+                    flags['html'] = True
+                    continue
+                m = _measure_body(r, sample_bytes, window, t0)
+                r.close()
+                if m is None:
+                    continue
+                return {'alive': True, 'latency_ms': latency, **m, **flags}
+
+            # ── HLS: manifiesto → (variante) → primer segmento ──
+            text = r.content[:256 * 1024].decode('utf-8', errors='replace')
+            base = r.url
+            r.close()
+            if '#EXTM3U' not in text:
+                flags['html'] = True
+                continue
+            nxt = _hls_next_uri(text, base)
+            if nxt and nxt[1]:
+                rv = requests.get(nxt[0], headers=headers, timeout=(connect_t, read_t))
+                text, base = rv.text, rv.url
+                rv.close()
+                nxt = _hls_next_uri(text, base) if rv.ok else None
+            if not nxt:
+                # Manifiesto válido sin segmentos (aún): vivo pero sin medida
+                return {'alive': True, 'latency_ms': latency,
+                        'ttfb_ms': None, 'throughput_kbps': None, **flags}
+
+            t_seg = time.monotonic()
+            rs = requests.get(nxt[0], headers=headers, stream=True,
+                              allow_redirects=True, timeout=(connect_t, read_t))
+            if rs.status_code >= 400:
+                rs.close()
+                continue
+            m = _measure_body(rs, sample_bytes, window, t_seg)
+            rs.close()
+            if m is None:
+                continue
+            return {'alive': True, 'latency_ms': latency, **m, **flags}
+
+        except requests.exceptions.Timeout:
+            flags['timeout'] = True
+            continue
+        except Exception:
+            continue
+
+    return {**dead, **flags}
+
+
+def quality_score(probe: dict) -> float:
+    """
+    Puntuación 0–100 de una medición de probe_stream_quality().
+    40 % TTFB + 60 % throughput. Una URL viva sin medida (401/403,
+    manifiesto vacío) recibe 30 para quedar por detrás de las medidas.
+    """
+    if not probe.get('alive'):
+        return 0.0
+    ttfb, kbps = probe.get('ttfb_ms'), probe.get('throughput_kbps')
+    if ttfb is None and kbps is None:
+        return 30.0
+    ttfb_part = max(0.0, 1 - (ttfb or _MAX_TTFB_MS) / _MAX_TTFB_MS)
+    kbps_part = min(1.0, (kbps or 0) / _TARGET_KBPS)
+    return round(40 * ttfb_part + 60 * kbps_part, 1)
+
+
+def rolling_score(previous: float | None, current: float) -> float:
+    """Media móvil exponencial de la puntuación (suaviza picos puntuales)."""
+    if previous is None:
+        return current
+    return round(_SCORE_ALPHA * current + (1 - _SCORE_ALPHA) * previous, 1)
+
+
+def _rank_live_urls(urls: list, current_url: str, probes: dict, scores: dict) -> list:
+    """
+    Ordena las URLs de un canal por calidad: vivas por puntuación móvil
+    (desc), después las caídas. La URL activa actual se mantiene primera
+    si sigue viva y está a menos de un 15 % de la mejor — evita saltar de
+    servidor por diferencias de ruido entre escaneos.
+    """
+    alive = [u for u in urls if probes.get(u, {}).get('alive')]
+    dead  = [u for u in urls if u not in alive]
+    alive.sort(key=lambda u: scores.get(u, 0.0), reverse=True)   # estable
+    if (current_url in alive and alive[0] != current_url
+            and scores.get(current_url, 0.0) >= 0.85 * scores.get(alive[0], 0.0)):
+        alive.remove(current_url)
+        alive.insert(0, current_url)
+    return alive + dead
+
+
+_LIVE_BATCH = 500   # canales por lote en el scan live
+
+
+def _prev_scores(channel_ids: list, report_model=None, owner_col=None) -> dict:
+    """
+    Última puntuación móvil de cada (canal, url) de los canales dados.
+    Por defecto en LiveScanReport; `report_model`/`owner_col` permiten
+    usar otra tabla de reportes (p. ej. CuradoScanReport.canal_id).
+    """
+    from sqlalchemy import func
+    from models import db, LiveScanReport
+
+    if report_model is None:
+        report_model, owner_col = LiveScanReport, LiveScanReport.contenido_id
+
+    prev: dict = {}
+    for i in range(0, len(channel_ids), 900):
+        chunk = channel_ids[i:i + 900]
+        last_ids = (
+            db.session.query(func.max(report_model.id))
+            .filter(owner_col.in_(chunk))
+            .group_by(owner_col, report_model.url_probada)
+        )
+        for cid, url, score in (
+            db.session.query(owner_col, report_model.url_probada, report_model.score)
+            .filter(report_model.id.in_(last_ids))
+        ):
+            prev[(cid, url)] = score
+    return prev
+
+
+# ── Circuit breaker ────────────────────────────────────────────
+# Las URLs de servidores con el breaker abierto se comprueban al final
+# del lote y con un connect timeout corto: si el servidor sigue caído no
+# ocupan hilos del pool mientras se verifica el resto. Se siguen
+# comprobando (no se saltan) para que un servidor muerto de verdad acabe
+# marcado como tal y uno recuperado cierre su breaker.
+_BREAKER_TIMEOUT = 4
+
+
+def _breaker_order(items: list, url_of=lambda x: x) -> list:
+    """[(item, abierto)] con los servidores sanos primero."""
+    import circuit_breaker
+    open_hosts: dict[str, bool] = {}
+    tagged = []
+    for item in items:
+        host = circuit_breaker.host_of(url_of(item) or '')
+        if host not in open_hosts:
+            open_hosts[host] = circuit_breaker.is_open(host)
+        tagged.append((item, open_hosts[host]))
+    tagged.sort(key=lambda t: t[1])
+    return tagged
+
+
+def _breaker_feed(results, motivo: str):
+    """Agrega (url, ok) por servidor y alimenta el circuit breaker."""
+    import circuit_breaker
+    per_host: dict[str, list] = {}
+    for url, ok in results:
+        counts = per_host.setdefault(circuit_breaker.host_of(url or ''), [0, 0])
+        counts[0 if ok else 1] += 1
+    for host, (ok, failed) in per_host.items():
+        circuit_breaker.record_batch(host, ok, failed, motivo)
+
+
+def _probe_urls(pool, urls, timeout, sample, window, motivo: str = 'scan live',
+                telemetry: dict = None) -> dict:
+    """
+    Lanza probe_stream_quality() sobre `urls` en el pool → {url: probe}.
+    telemetry = {app, tipo, run_ref, workers} → guarda las métricas del lote
+    (ver scan_metrics).
+    """
+    import time
+    import scan_metrics
+    t0 = time.monotonic()
+    results: dict[str, dict] = {}
+    future_map = {
+        pool.submit(probe_stream_quality, url,
+                    min(timeout, _BREAKER_TIMEOUT) if is_open else timeout,
+                    sample, window): url
+        for url, is_open in _breaker_order(list(urls))
+    }
+    for future in as_completed(future_map):
+        url = future_map[future]
+        try:
+            results[url] = future.result()
+        except Exception:
+            results[url] = {'alive': False, 'latency_ms': 0,
+                            'ttfb_ms': None, 'throughput_kbps': None}
+    _breaker_feed(((u, p['alive']) for u, p in results.items()), motivo)
+    if telemetry:
+        total, per_host = scan_metrics.collect(results.items())
+        scan_metrics.record(telemetry['app'], telemetry['tipo'], telemetry['run_ref'],
+                            total, per_host, time.monotonic() - t0,
+                            workers=telemetry.get('workers'), timeout=timeout)
+    return results
+
+
+def scan_live_channels(app, max_workers: int = 20, batch_size: int = None) -> dict:
     """
     Escanea todos los canales en directo (tipo='live'):
-    - Mide latencia de cada URL del canal
-    - Failover: si la URL activa falla, avanza a la siguiente que funcione
-    - Deduplicación: elimina URLs duplicadas exactas; entre URLs con la misma
-      latencia conserva la más antigua (primera en la lista); entre URLs con
-      distinta latencia elimina la de peor calidad
+    - Mide latencia, TTFB y throughput de cada URL del canal
+      (ver probe_stream_quality) y actualiza su puntuación móvil
+    - Ordena live_urls_json por calidad: la mejor URL viva queda en el
+      índice 0 y pasa a ser la activa (con histéresis, ver _rank_live_urls)
+    - Deduplicación: elimina URLs duplicadas exactas y las caídas cuando
+      el canal tiene alguna otra viva
     - Registra LiveScanReport por cada URL comprobada
-    - Mantiene historial 7 días
+
+    Trabaja por lotes de `batch_size` canales (keyset por id): lee solo las
+    columnas necesarias, comprueba las URLs del lote y escribe canales y
+    reportes con un executemany y un commit por lote. La memoria no crece
+    con el número de canales. La retención del historial va aparte:
+    purge_live_scan_reports().
     """
     import json as _json
-    from datetime import timedelta
+    from sqlalchemy import update
     from models import db, Contenido, LiveScanConfig, LiveScanReport
 
     with app.app_context():
         timeout = app.config.get('SCAN_TIMEOUT', 5)
-        channels = (
-            Contenido.query
-            .filter_by(tipo='live', fuente='m3u')
-            .all()
-        )
+        sample  = app.config.get('LIVE_PROBE_KB', 256) * 1024
+        window  = app.config.get('LIVE_PROBE_WINDOW', 4)
+        batch_size = batch_size or app.config.get('LIVE_SCAN_BATCH_SIZE', _LIVE_BATCH)
 
-        # Inicializar live_urls_json para canales que aún no lo tienen
-        for ch in channels:
-            if not ch.live_urls_json:
-                ch.live_urls_json = _json.dumps([ch.url_stream])
-        db.session.commit()
-
-        # Recoger todas las URLs únicas para verificar en paralelo
-        channel_url_map: dict[int, list] = {}
-        for ch in channels:
-            try:
-                urls = _json.loads(ch.live_urls_json)
-            except (ValueError, TypeError):
-                urls = [ch.url_stream]
-            channel_url_map[ch.id] = urls
-
-    if not channel_url_map:
-        return {'channels': 0, 'failed': 0, 'timestamp': datetime.utcnow().isoformat()}
-
-    all_unique_urls = list({u for urls in channel_url_map.values() for u in urls})
-    logger.info(f'[LiveScan] Comprobando {len(all_unique_urls)} URLs de {len(channel_url_map)} canales...')
+    now = datetime.utcnow()
+    telemetry = {'app': app, 'tipo': 'live', 'run_ref': f'live:{now:%Y%m%d%H%M%S}',
+                 'workers': max_workers}
+    channels = failed = probed = batches = 0
+    last_id = 0
 
-    # Verificar en paralelo
-    url_results: dict[str, tuple] = {}   # url → (alive, latency_ms)
     with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        future_map = {pool.submit(check_url_with_latency, url, timeout): url for url in all_unique_urls}
-        for future in as_completed(future_map):
-            url = future_map[future]
-            try:
-                url_results[url] = future.result()
-            except Exception:
-                url_results[url] = (False, 0)
-
-    # Actualizar BD y generar reportes
-    failed = 0
-    now = datetime.utcnow()
-    cutoff = now - __import__('datetime').timedelta(days=7)
+        while True:
+            # ── 1. Lote de canales (proyección, sin objetos ORM) ─────
+            with app.app_context():
+                rows = (
+                    db.session.query(Contenido.id, Contenido.titulo, Contenido.url_stream,
+                                     Contenido.live_urls_json, Contenido.live_active_idx)
+                    .filter(Contenido.tipo == 'live', Contenido.fuente == 'm3u',
+                            Contenido.id > last_id)
+                    .order_by(Contenido.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                prev_scores = _prev_scores([r[0] for r in rows])
+
+            channel_urls: dict[int, list] = {}
+            for cid, _, url_stream, urls_json, _ in rows:
+                try:
+                    urls = _json.loads(urls_json) if urls_json else [url_stream]
+                except (ValueError, TypeError):
+                    urls = [url_stream]
+                channel_urls[cid] = urls or [url_stream]
+
+            # ── 2. Verificar las URLs únicas del lote en paralelo ─────
+            unique_urls = list({u for urls in channel_urls.values() for u in urls})
+            url_results = _probe_urls(pool, unique_urls, timeout, sample, window,
+                                      telemetry=telemetry)
+
+            # ── 3. Calcular orden, estado y reportes de cada canal ────
+            updates, reports = [], []
+            for cid, titulo, url_stream, _, active_idx in rows:
+                urls = channel_urls[cid]
+
+                # Eliminar duplicados exactos (mantener primera aparición)
+                seen: set = set()
+                deduped = []
+                for u in urls:
+                    if u not in seen:
+                        seen.add(u)
+                        deduped.append(u)
+
+                # Resultados y puntuación móvil para este canal
+                scores: dict[str, float] = {}
+                for url in deduped:
+                    probe = url_results.get(url) or {'alive': False, 'latency_ms': 0}
+                    scores[url] = rolling_score(prev_scores.get((cid, url)),
+                                                quality_score(probe))
+                    reports.append({
+                        'contenido_id':    cid,
+                        'url_probada':     url,
+                        'resultado':       probe['alive'],
+                        'latencia_ms':     probe.get('latency_ms', 0),
+                        'ttfb_ms':         probe.get('ttfb_ms'),
+                        'throughput_kbps': probe.get('throughput_kbps'),
+                        'score':           scores[url],
+                        'timestamp':       now,
+                    })
+
+                alive_urls = [u for u in deduped if url_results.get(u, {}).get('alive')]
+
+                # Eliminar URLs muertas que NO son la única URL disponible
+                if alive_urls and len(alive_urls) < len(deduped):
+                    deduped = alive_urls
+
+                # Ordenar por calidad: la mejor queda en el índice 0
+                current_idx = active_idx or 0
+                current_url = urls[current_idx] if current_idx < len(urls) else (deduped[0] if deduped else url_stream)
+
+                if alive_urls:
+                    ranked = _rank_live_urls(deduped, current_url, url_results, scores)
+                    if ranked[0] != current_url:
+                        logger.info(f'[LiveScan] {titulo}: URL activa → {ranked[0]} '
+                                    f'(score {scores.get(ranked[0])})')
+                    deduped = ranked
+                    new_idx, activo = 0, True
+                else:
+                    # Todos los servidores caídos: se conserva el orden actual
+                    new_idx = current_idx if current_idx < len(deduped) else 0
+                    activo = False
+                    failed += 1
+                    logger.warning(f'[LiveScan] Canal totalmente caído: {titulo}')
+
+                updates.append({
+                    'id':                  cid,
+                    'live_urls_json':      _json.dumps(deduped),
+                    'live_active_idx':     new_idx,
+                    'activo':              activo,
+                    'ultima_verificacion': now,
+                })
+
+            # ── 4. Escribir el lote: UPDATE por PK + INSERT masivo ────
+            with app.app_context():
+                db.session.execute(update(Contenido), updates)
+                if reports:
+                    db.session.execute(LiveScanReport.__table__.insert(), reports)
+                db.session.commit()
+
+            channels += len(rows)
+            probed += len(unique_urls)
+            batches += 1
+            logger.info(f'[LiveScan] Lote {batches}: {len(rows)} canales, '
+                        f'{len(unique_urls)} URLs ({channels} canales en total)')
 
     with app.app_context():
-        channels = Contenido.query.filter_by(tipo='live', fuente='m3u').all()
-        reports = []
-
-        for ch in channels:
-            try:
-                urls = _json.loads(ch.live_urls_json or '[]') or [ch.url_stream]
-            except (ValueError, TypeError):
-                urls = [ch.url_stream]
-
-            # ── 1. Eliminar duplicados exactos (mantener primera aparición) ──
-            seen: set = set()
-            deduped = []
-            for u in urls:
-                if u not in seen:
-                    seen.add(u)
-                    deduped.append(u)
-
-            # ── 2. Resultados para este canal ──
-            # Lista de (url, alive, latency_ms)
-            results_for_ch = [(u, *url_results.get(u, (False, 0))) for u in deduped]
-
-            # Crear registros de reporte
-            for url, alive, latency in results_for_ch:
-                reports.append(LiveScanReport(
-                    contenido_id=ch.id,
-                    url_probada=url,
-                    resultado=alive,
-                    latencia_ms=latency,
-                    timestamp=now,
-                ))
-
-            # ── 3. Deduplicación por calidad: entre URLs vivas, si hay dos
-            #       con latencia muy similar (±200ms), quitar la de peor latencia
-            alive_with_lat = [(u, lat) for u, alive, lat in results_for_ch if alive]
-            dead_urls      = {u for u, alive, _ in results_for_ch if not alive}
-
-            # Eliminar URLs muertas que NO son la única URL disponible
-            if dead_urls and len(deduped) > len(dead_urls):
-                deduped = [u for u in deduped if u not in dead_urls]
-                results_for_ch = [(u, a, l) for u, a, l in results_for_ch if u not in dead_urls]
-                alive_with_lat = [(u, lat) for u, lat in alive_with_lat]
-
-            # ── 4. Actualizar índice activo ──
-            current_idx = ch.live_active_idx or 0
-            current_url = deduped[current_idx] if current_idx < len(deduped) else (deduped[0] if deduped else ch.url_stream)
-            current_alive = url_results.get(current_url, (False, 0))[0]
-
-            if alive_with_lat:
-                if not current_alive:
-                    # Failover: buscar la primera URL viva en orden
-                    for i, u in enumerate(deduped):
-                        if url_results.get(u, (False, 0))[0]:
-                            ch.live_active_idx = i
-                            logger.info(f'[LiveScan] Failover {ch.titulo}: índice {current_idx} → {i}')
-                            break
-                # else: la URL activa sigue viva, no cambiar nada
-                ch.activo = True
-            else:
-                # Todos los servidores caídos
-                ch.activo = False
-                failed += 1
-                logger.warning(f'[LiveScan] Canal totalmente caído: {ch.titulo}')
-
-            ch.live_urls_json = _json.dumps(deduped)
-            ch.ultima_verificacion = now
-
-        # Guardar reportes y purgar los viejos
-        db.session.bulk_save_objects(reports)
-        LiveScanReport.query.filter(LiveScanReport.timestamp < cutoff).delete()
-
         # Actualizar last_scan en config
         config = LiveScanConfig.query.first()
         if config:
             config.last_scan = now
-
-        db.session.commit()
+            db.session.commit()
+        if channels:
+            import catalog_cache
+            catalog_cache.bump('scan live')
 
     result = {
-        'channels': len(channel_url_map),
+        'channels': channels,
+        'alive':    channels - failed,
         'failed':   failed,
+        'dead':     failed,
+        'urls':     probed,
+        'batches':  batches,
+        'run_ref':  telemetry['run_ref'],
         'timestamp': now.isoformat(),
     }
     logger.info(f'[LiveScan] Completado: {result}')
     return result
 
 
+def scan_curated_channels(app, max_workers: int = 20, batch_size: int = None) -> dict:
+    """
+    Scan de salud de los canales curados (CanalCurado.urls_json).
+
+    Misma medición que scan_live_channels() — probe_stream_quality() y
+    puntuación móvil — y reordena las URLs de cada canal: vivas por
+    puntuación (con la histéresis de _rank_live_urls) y después las caídas.
+    Las URLs caídas NO se borran: la lista es manual y el admin decide.
+    Así /api/canales-curados entrega primero una URL que funciona.
+    """
+    import json as _json
+    from sqlalchemy import update
+    from models import db, CanalCurado, CuradoScanReport
+
+    with app.app_context():
+        timeout = app.config.get('SCAN_TIMEOUT', 5)
+        sample  = app.config.get('LIVE_PROBE_KB', 256) * 1024
+        window  = app.config.get('LIVE_PROBE_WINDOW', 4)
+        batch_size = batch_size or app.config.get('LIVE_SCAN_BATCH_SIZE', _LIVE_BATCH)
+
+    now = datetime.utcnow()
+    telemetry = {'app': app, 'tipo': 'curado', 'run_ref': f'curado:{now:%Y%m%d%H%M%S}',
+                 'workers': max_workers}
+    channels = failed = probed = reordered = 0
+    last_id = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            with app.app_context():
+                rows = (
+                    db.session.query(CanalCurado.id, CanalCurado.nombre, CanalCurado.urls_json)
+                    .filter(CanalCurado.id > last_id)
+                    .order_by(CanalCurado.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                prev_scores = _prev_scores([r[0] for r in rows],
+                                           CuradoScanReport, CuradoScanReport.canal_id)
+
+            # Entradas {nombre, url} de cada canal (se conservan tal cual)
+            entries_by_canal: dict[int, list] = {}
+            for cid, _, urls_json in rows:
+                try:
+                    entries = _json.loads(urls_json or '[]')
+                except (ValueError, TypeError):
+                    entries = []
+                entries_by_canal[cid] = [e for e in entries if isinstance(e, dict) and e.get('url')]
+
+            unique_urls = list({e['url'] for es in entries_by_canal.values() for e in es})
+            url_results = _probe_urls(pool, unique_urls, timeout, sample, window,
+                                      motivo='scan curados', telemetry=telemetry)
+
+            updates, reports = [], []
+            for cid, nombre, _ in rows:
+                entries = entries_by_canal[cid]
+                if not entries:
+                    continue
+                urls = list(dict.fromkeys(e['url'] for e in entries))
+                scores: dict[str, float] = {}
+                for url in urls:
+                    probe = url_results.get(url) or {'alive': False, 'latency_ms': 0}
+                    scores[url] = rolling_score(prev_scores.get((cid, url)),
+                                                quality_score(probe))
+                    reports.append({
+                        'canal_id':        cid,
+                        'url_probada':     url,
+                        'resultado':       probe['alive'],
+                        'latencia_ms':     probe.get('latency_ms', 0),
+                        'ttfb_ms':         probe.get('ttfb_ms'),
+                        'throughput_kbps': probe.get('throughput_kbps'),
+                        'score':           scores[url],
+                        'timestamp':       now,
+                    })
+
+                n_alive = sum(1 for u in urls if url_results.get(u, {}).get('alive'))
+                if n_alive:
+                    ranked = _rank_live_urls(urls, urls[0], url_results, scores)
+                else:
+                    ranked = urls        # todo caído: no tocar el orden del admin
+                    failed += 1
+                    logger.warning(f'[CuradoScan] Canal sin URLs vivas: {nombre}')
+
+                # Reordenar las entradas según `ranked` (sort estable: las duplicadas quedan juntas)
+                pos = {u: i for i, u in enumerate(ranked)}
+                new_entries = sorted(entries, key=lambda e: pos[e['url']])
+                values = {'id': cid, 'ultima_verificacion': now, 'urls_vivas': n_alive}
+                if new_entries != entries:
+                    values['urls_json'] = _json.dumps(new_entries)
+                    reordered += 1
+                    if ranked[0] != urls[0]:
+                        logger.info(f'[CuradoScan] {nombre}: primera URL → {ranked[0]}')
+                updates.append(values)
+
+            with app.app_context():
+                # executemany agrupa por conjunto de columnas: los canales sin
+                # cambio de orden no reescriben urls_json
+                for keys in {tuple(sorted(u)) for u in updates}:
+                    db.session.execute(update(CanalCurado),
+                                       [u for u in updates if tuple(sorted(u)) == keys])
+                if reports:
+                    db.session.execute(CuradoScanReport.__table__.insert(), reports)
+                db.session.commit()
+
+            channels += len(updates)
+            probed += len(unique_urls)
+
+    if reordered:
+        import catalog_cache
+        with app.app_context():
+            catalog_cache.bump('scan curados')
+
+    result = {
+        'channels':  channels,
+        'alive':     channels - failed,
+        'failed':    failed,
+        'reordered': reordered,
+        'urls':      probed,
+        'run_ref':   telemetry['run_ref'],
+        'timestamp': now.isoformat(),
+    }
+    logger.info(f'[CuradoScan] Completado: {result}')
+    return result
+
+
+def purge_live_scan_reports(app, days: int = 7, chunk: int = 5000) -> int:
+    """
+    Borra los reportes de scan live y de canales curados con más de `days`
+    días, por trozos y con un commit por trozo (usa el índice de
+    `timestamp`). Se ejecuta después del scan live, fuera de su transacción.
+    """
+    from datetime import timedelta
+    from models import db, LiveScanReport, CuradoScanReport
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    with app.app_context():
+        for model in (LiveScanReport, CuradoScanReport):
+            while True:
+                ids = [r[0] for r in (
+                    db.session.query(model.id)
+                    .filter(model.timestamp < cutoff)
+                    .limit(chunk).all()
+                )]
+                if not ids:
+                    break
+                for i in range(0, len(ids), 900):
+                    total += model.query.filter(
+                        model.id.in_(ids[i:i + 900])
+                    ).delete(synchronize_session=False)
+                db.session.commit()
+    if total:
+        logger.info(f'[LiveScan] Historial: {total} reportes de más de {days} días eliminados')
+    return total
+
+
+def _pending_scan_query(lista_id: int = None, before: datetime = None):
+    """
+    Items VOD pendientes de verificar.
+    before → solo los no verificados desde esa fecha (cursor de ScanRun).
+    """
+    from models import Contenido
+    from sqlalchemy import or_
+
+    q = Contenido.query.filter(
+        Contenido.activo == True,
+        Contenido.fuente == 'm3u',
+        Contenido.tipo != 'live',   # los live los gestiona scan_live_channels()
+    )
+    if lista_id:
+        q = q.filter(Contenido.lista_id == lista_id)
+    if before is not None:
+        q = q.filter(or_(
+            Contenido.ultima_verificacion.is_(None),
+            Contenido.ultima_verificacion < before,
+        ))
+    return q
+
+
 def scan_dead_links(app, batch_size: int = 5000, max_workers: int = 40,
-                    lista_id: int = None) -> dict:
+                    lista_id: int = None, before: datetime = None,
+                    on_progress=None, run_ref: str = None) -> dict:
     """
     Escanea hasta `batch_size` links M3U (VOD) en paralelo.
     Excluye canales en directo (tipo='live') — esos los gestiona scan_live_channels().
 
     batch_size=0 → sin límite, escanea todos los items pendientes.
     lista_id → si se especifica, solo escanea contenido de esa lista.
+    before → ignora los items verificados después de esa fecha (reanudar un ScanRun).
+    on_progress(checked, alive, dead) → se llama periódicamente durante el lote.
+    run_ref → guarda la telemetría del lote con esa referencia (scan_metrics).
 
     Rendimiento orientativo (40 workers, timeout 15s):
       - ~160 checks/min → 80 000 items en ~8 horas (job nocturno ideal)
     """
     from models import db, Contenido, Lista
+    from sqlalchemy import case
 
     # ── 1. Leer datos de BD en hilo principal ──────────────────
     with app.app_context():
         timeout = app.config.get('SCAN_TIMEOUT', 15)
-        q = Contenido.query.filter(
-            Contenido.activo == True,
-            Contenido.fuente == 'm3u',
-            Contenido.tipo != 'live',   # los live los gestiona scan_live_channels()
-        )
-        if lista_id:
-            q = q.filter(Contenido.lista_id == lista_id)
         q = (
-            q.order_by(Contenido.ultima_verificacion.asc().nullsfirst())
-            .with_entities(Contenido.id, Contenido.url_stream)
+            _pending_scan_query(lista_id, before)
+            .order_by(Contenido.ultima_verificacion.asc().nullsfirst())
+            .with_entities(Contenido.id, Contenido.url_stream, Contenido.lista_id)
         )
         if batch_size > 0:
             q = q.limit(batch_size)
@@ -360,97 +869,372 @@ def scan_dead_links(app, batch_size: int = 5000, max_workers: int = 40,
     logger.info(f'[Scan] Verificando {len(to_check)} links con {max_workers} workers...')
 
     # ── 2. Verificar en paralelo (sin BD) ──────────────────────
+    import time
+    import scan_metrics
+    t0 = time.monotonic()
     results: dict[int, bool] = {}
+    probes: dict[int, dict] = {}
+    n_alive = 0
     with ThreadPoolExecutor(max_workers=max_workers) as pool:
         future_map = {
-            pool.submit(check_url, url, timeout): cid
-            for cid, url in to_check
+            pool.submit(check_url_detailed, row[1],
+                        min(timeout, _BREAKER_TIMEOUT) if is_open else timeout): row[0]
+            for row, is_open in _breaker_order(to_check, url_of=lambda r: r[1])
         }
         for future in as_completed(future_map):
             cid = future_map[future]
             try:
-                results[cid] = future.result()
+                probes[cid] = future.result()
             except Exception:
-                results[cid] = False
+                probes[cid] = {'alive': False}
+            results[cid] = probes[cid]['alive']
+            n_alive += results[cid]
+            if on_progress and len(results) % 50 == 0:
+                try:
+                    on_progress(len(results), n_alive, len(results) - n_alive)
+                except Exception as e:
+                    logger.debug(f'[Scan] on_progress falló: {e}')
+
+    seconds = time.monotonic() - t0
+    _breaker_feed(((url, results.get(cid, False)) for cid, url, _ in to_check), 'scan VOD')
+    total, per_host = scan_metrics.collect(
+        (url, probes[cid]) for cid, url, _ in to_check if cid in probes)
+    if run_ref:
+        scan_metrics.record(app, 'vod', run_ref, total, per_host, seconds,
+                            workers=max_workers, timeout=timeout)
 
     # ── 3. Actualizar BD en hilo principal ──────────────────────
-    dead = alive = 0
+    # UPDATE masivos por resultado (trozos de 900 ids → límite de SQLite)
+    # y contadores de lista por delta, sin cargar objetos ORM ni recontar.
+    alive_ids = [cid for cid, ok in results.items() if ok]
+    dead_by_lista: dict = {}
+    for cid, _, lid in to_check:
+        if cid in results and not results[cid]:
+            dead_by_lista.setdefault(lid, []).append(cid)
+
+    dead = 0
+    alive = len(alive_ids)
     with app.app_context():
         now = datetime.utcnow()
-        items = Contenido.query.filter(Contenido.id.in_(list(results.keys()))).all()
-        affected_listas: set[int] = set()
-
-        for item in items:
-            is_alive = results.get(item.id, False)
-            item.ultima_verificacion = now
-            if not is_alive:
-                item.activo = False
-                dead += 1
-            else:
-                alive += 1
-            if item.lista_id:
-                affected_listas.add(item.lista_id)
+        for i in range(0, len(alive_ids), 900):
+            Contenido.query.filter(
+                Contenido.id.in_(alive_ids[i:i + 900])
+            ).update({'ultima_verificacion': now}, synchronize_session=False)
+
+        for lid, ids in dead_by_lista.items():
+            lista_dead = 0
+            for i in range(0, len(ids), 900):
+                # activo==True en el WHERE → el rowcount es exacto aunque otro
+                # proceso haya desactivado alguno entre la lectura y ahora
+                lista_dead += Contenido.query.filter(
+                    Contenido.id.in_(ids[i:i + 900]),
+                    Contenido.activo == True,
+                ).update({'activo': False, 'ultima_verificacion': now},
+                         synchronize_session=False)
+            dead += lista_dead
+            if lid and lista_dead:
+                Lista.query.filter(Lista.id == lid).update(
+                    {'items_activos': case(
+                        (Lista.items_activos > lista_dead, Lista.items_activos - lista_dead),
+                        else_=0,
+                    )},
+                    synchronize_session=False,
+                )
 
         db.session.commit()
 
-        for lid in affected_listas:
-            lista = Lista.query.get(lid)
-            if lista:
-                lista.items_activos = (
-                    Contenido.query.filter_by(lista_id=lid, activo=True).count()
-                )
-        db.session.commit()
+        # Series agrupadas: los episodios caídos dejan de contar
+        if dead:
+            import series_index
+            series_index.refresh_safe(series_index.keys_for_ids(
+                cid for ids in dead_by_lista.values() for cid in ids))
+            import catalog_cache
+            catalog_cache.bump('scan vod')
+            import trending
+            trending.rebuild_safe('scan vod')
 
     # has_more=True si procesamos exactamente batch_size → probablemente hay más
     has_more = batch_size > 0 and len(results) == batch_size
 
+    m = scan_metrics.summary(total, seconds)
     result = {
-        'checked':   len(results),
-        'alive':     alive,
-        'dead':      dead,
-        'has_more':  has_more,
-        'timestamp': datetime.utcnow().isoformat(),
+        'checked':      len(results),
+        'alive':        alive,
+        'dead':         dead,
+        'has_more':     has_more,
+        'probes_per_s': m['probes_per_s'],
+        'p95_ms':       m['p95_ms'],
+        'timeout_rate': m['timeout_rate'],
+        'timestamp':    datetime.utcnow().isoformat(),
     }
     logger.info(f'[Scan] Completado: {result}')
     return result
 
 
+# ── Ejecuciones persistentes (ScanRun) ─────────────────────────
+# IDs de ScanRun que este proceso está ejecutando ahora mismo
+_active_runs: set = set()
+_active_lock = threading.Lock()
+
+
+def get_running_scan(app):
+    """Devuelve el ScanRun en curso (estado='running') o None."""
+    from models import ScanRun
+    with app.app_context():
+        return ScanRun.query.filter_by(estado='running').order_by(ScanRun.id.desc()).first()
+
+
+def create_scan_run(app, origen: str = 'auto', batch_size: int = 5000,
+                    max_workers: int = 40, lista_id: int = None,
+                    max_batches: int = 200) -> int:
+    """
+    Registra un nuevo ScanRun y devuelve su id.
+    El número de pendientes se calcula ahora para poder estimar el ETA.
+    """
+    from models import db, Lista, ScanRun
+
+    with app.app_context():
+        started = datetime.utcnow()
+        lista_nombre = None
+        if lista_id:
+            l = Lista.query.get(lista_id)
+            lista_nombre = l.nombre if l else None
+        total = _pending_scan_query(lista_id, started).count()
+        if batch_size > 0:
+            total = min(total, batch_size * max_batches)
+        run = ScanRun(
+            origen=origen, estado='running',
+            lista_id=lista_id, lista_nombre=lista_nombre,
+            batch_size=batch_size, max_workers=max_workers,
+            max_batches=max_batches, total_pendientes=total,
+            started_at=started,
+        )
+        db.session.add(run)
+        db.session.commit()
+        return run.id
+
+
+def run_scan(app, run_id: int) -> dict | None:
+    """
+    Ejecuta (o reanuda) un ScanRun lote a lote, guardando el progreso tras
+    cada lote. Si el proceso muere a mitad, el siguiente arranque lo retoma
+    desde el cursor: solo se vuelve a comprobar el lote que quedó a medias.
+
+    Devuelve el to_dict() final del run, o None si ya se está ejecutando
+    en este proceso.
+    """
+    import json as _json
+    import time as _time
+    from models import db, ScanRun
+
+    with _active_lock:
+        if run_id in _active_runs:
+            return None
+        _active_runs.add(run_id)
+
+    try:
+        with app.app_context():
+            run = ScanRun.query.get(run_id)
+            if run is None or run.estado != 'running':
+                return run.to_dict() if run else None
+            params = dict(
+                batch_size=run.batch_size, max_workers=run.max_workers,
+                lista_id=run.lista_id, before=run.started_at,
+                run_ref=f'vod:{run_id}',
+            )
+            if run.batches:
+                logger.info(f'[Scan] Reanudando ScanRun {run_id} tras {run.batches} lote(s)')
+
+        def _progress(checked, alive, dead, _last=[0.0]):
+            # Máximo una escritura cada 5 s — solo para la barra de progreso
+            if _time.monotonic() - _last[0] < 5:
+                return
+            _last[0] = _time.monotonic()
+            with app.app_context():
+                ScanRun.query.filter_by(id=run_id).update({
+                    'batch_checked': checked,
+                    'batch_alive':   alive,
+                    'batch_dead':    dead,
+                }, synchronize_session=False)
+                db.session.commit()
+
+        while True:
+            with app.app_context():
+                run = ScanRun.query.get(run_id)
+                if run.batches >= run.max_batches:
+                    break
+                run.batch_checked = run.batch_alive = run.batch_dead = 0
+                run.batch_started = datetime.utcnow()
+                db.session.commit()
+
+            t0 = _time.monotonic()
+            result = scan_dead_links(app, on_progress=_progress, **params)
+            seconds = round(_time.monotonic() - t0, 1)
+
+            with app.app_context():
+                run = ScanRun.query.get(run_id)
+                run.batches  += 1
+                run.checked  += result.get('checked', 0)
+                run.alive    += result.get('alive', 0)
+                run.dead     += result.get('dead', 0)
+                run.elapsed_s = (run.elapsed_s or 0) + seconds
+                run.batch_checked = run.batch_alive = run.batch_dead = 0
+                run.batch_started = None
+                batches = run.batch_results
+                batches.append({
+                    'n':         run.batches,
+                    'checked':   result.get('checked', 0),
+                    'alive':     result.get('alive', 0),
+                    'dead':      result.get('dead', 0),
+                    'seconds':   seconds,
+                    'p95_ms':    result.get('p95_ms'),
+                    'timeouts':  result.get('timeout_rate'),
+                    'timestamp': result.get('timestamp'),
+                })
+                run.batches_json = _json.dumps(batches)
+                db.session.commit()
+                logger.info(
+                    f'[Scan] ScanRun {run_id} lote {run.batches}: '
+                    f'{result.get("checked")} verificados, total acumulado={run.checked}'
+                )
+
+            if not result.get('has_more', False):
+                break
+            _time.sleep(2)
+
+        with app.app_context():
+            run = ScanRun.query.get(run_id)
+            run.estado = 'completed'
+            run.finished_at = datetime.utcnow()
+            db.session.commit()
+            return run.to_dict()
+
+    except Exception as e:
+        logger.exception(f'[Scan] ScanRun {run_id} falló: {e}')
+        with app.app_context():
+            db.session.rollback()
+            run = ScanRun.query.get(run_id)
+            if run:
+                run.estado = 'failed'
+                run.error = str(e)[:500]
+                run.finished_at = datetime.utcnow()
+                db.session.commit()
+                return run.to_dict()
+        return None
+
+    finally:
+        with _active_lock:
+            _active_runs.discard(run_id)
+
+
+_PURGE_CHUNK = 900   # ids por DELETE (límite de variables de SQLite)
+
+
 def purge_dead_links(app, days: int = 7) -> dict:
     """
     Elimina permanentemente de la BD el contenido M3U que lleva más de `days` días
     marcado como inactivo (activo=False) y ya fue verificado al menos una vez.
 
     Solo elimina fuente='m3u' para no borrar items RSS que no pasan por el scanner.
+
+    Se trabaja por trozos de ids (sin cargar objetos ORM) y con un commit por
+    trozo: tras la caída de un proveedor pueden ser decenas de miles de filas
+    y una sola transacción bloquearía la BD todo ese tiempo. Las filas
+    dependientes se borran explícitamente en cada trozo:
+      WatchHistory, ChannelReport, LiveScanReport → DELETE
+      IptvSession.contenido_id                    → NULL (la sesión sigue viva)
     """
-    from models import db, Contenido
-    from sqlalchemy import and_
+    import time
+    from models import (db, Contenido, Lista, WatchHistory, ChannelReport,
+                        LiveScanReport, IptvSession)
+    from sqlalchemy import case
 
     cutoff = datetime.utcnow() - __import__('datetime').timedelta(days=days)
+    t_start = time.monotonic()
+    timings = {'select_s': 0.0, 'deps_s': 0.0, 'delete_s': 0.0}
+    count = chunks = 0
+    deps = {'watch_history': 0, 'channel_reports': 0, 'live_scan_reports': 0,
+            'iptv_sessions': 0}
 
     with app.app_context():
-        to_delete = (
-            Contenido.query
-            .filter(
-                and_(
+        while True:
+            # Sin ORDER BY: lo borrado desaparece del filtro, así que cada
+            # vuelta es una búsqueda por el índice (activo, fuente,
+            # ultima_verificacion) que devuelve el siguiente trozo
+            t0 = time.monotonic()
+            rows = (
+                db.session.query(Contenido.id, Contenido.lista_id)
+                .filter(
                     Contenido.activo == False,
                     Contenido.fuente == 'm3u',
                     Contenido.ultima_verificacion.isnot(None),
                     Contenido.ultima_verificacion < cutoff,
                 )
+                .limit(_PURGE_CHUNK)
+                .all()
             )
-            .all()
-        )
-        count = len(to_delete)
-        for item in to_delete:
-            db.session.delete(item)
-        db.session.commit()
+            timings['select_s'] += time.monotonic() - t0
+            if not rows:
+                break
+            ids = [r[0] for r in rows]
+
+            t0 = time.monotonic()
+            deps['watch_history'] += WatchHistory.query.filter(
+                WatchHistory.contenido_id.in_(ids)).delete(synchronize_session=False)
+            deps['channel_reports'] += ChannelReport.query.filter(
+                ChannelReport.contenido_id.in_(ids)).delete(synchronize_session=False)
+            deps['live_scan_reports'] += LiveScanReport.query.filter(
+                LiveScanReport.contenido_id.in_(ids)).delete(synchronize_session=False)
+            deps['iptv_sessions'] += IptvSession.query.filter(
+                IptvSession.contenido_id.in_(ids)).update(
+                {'contenido_id': None}, synchronize_session=False)
+            timings['deps_s'] += time.monotonic() - t0
+
+            t0 = time.monotonic()
+            deleted = Contenido.query.filter(
+                Contenido.id.in_(ids),
+                Contenido.activo == False,
+            ).delete(synchronize_session=False)
+
+            # total_items por delta (items_activos no cambia: ya estaban inactivos).
+            # Si alguno se reactivó entre el SELECT y el DELETE, sigue en la BD.
+            kept = set()
+            if deleted != len(ids):
+                kept = {r[0] for r in db.session.query(Contenido.id)
+                        .filter(Contenido.id.in_(ids)).all()}
+            per_lista: dict = {}
+            for cid, lid in rows:
+                if lid and cid not in kept:
+                    per_lista[lid] = per_lista.get(lid, 0) + 1
+            for lid, n in per_lista.items():
+                Lista.query.filter(Lista.id == lid).update(
+                    {'total_items': case(
+                        (Lista.total_items > n, Lista.total_items - n), else_=0)},
+                    synchronize_session=False,
+                )
+            db.session.commit()
+            timings['delete_s'] += time.monotonic() - t0
+
+            count += deleted
+            chunks += 1
+
+        if count:
+            import catalog_cache
+            catalog_cache.bump('purge')
+            import trending
+            trending.rebuild_safe('purge')
 
     result = {
-        'deleted': count,
-        'days': days,
-        'timestamp': datetime.utcnow().isoformat(),
+        'deleted':    count,
+        'days':       days,
+        'chunks':     chunks,
+        'dependents': deps,
+        **{k: round(v, 2) for k, v in timings.items()},
+        'total_s':    round(time.monotonic() - t_start, 2),
+        'timestamp':  datetime.utcnow().isoformat(),
     }
-    logger.info(f'[Purge] Eliminados {count} items inactivos (>{days}d): {result}')
+    logger.info(f'[Purge] Eliminados {count} items inactivos (>{days}d) '
+                f'en {result["total_s"]}s ({chunks} trozos): {result}')
     return result
 
 
@@ -483,11 +1267,13 @@ def server_health(app) -> list:
         else:
             servers[key]['dead'] += cnt
 
+    import circuit_breaker
     result = []
     for s in servers.values():
         total = s['alive'] + s['dead']
         s['total'] = total
         s['dead_pct'] = round(s['dead'] / total * 100, 1) if total else 0
+        s['breaker'] = circuit_breaker.state(s['servidor'].lower())
         result.append(s)
 
     result.sort(key=lambda x: x['dead_pct'], reverse=True)
@@ -0,0 +1,117 @@
+"""
+Agrupado de canales en directo por nombre base ("DAZN FHD 1", "DAZN HD 2"
+→ "DAZN").
+
+/api/live-agrupados pasaba las regex de calidad/variante a cada canal
+visible en cada petición. El nombre base se calcula una vez, al insertar:
+
+  Contenido.live_group_key   base_name(titulo) para tipo='live' sin
+                             temporada; NULL en el resto
+
+Lo rellenan los imports M3U (_do_bulk_insert). Lo que quede desviado
+(filas antiguas, ediciones sueltas) lo corrige reconcile(): al arrancar si
+hay canales sin clave y una vez al día desde el scheduler.
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_BATCH = 5000   # filas por vuelta del recálculo (keyset por id)
+
+_QUALITY = r'(?:FULL\s?HD|FHD|UHD|4K|2K|1080[pP]?|720[pP]?|480[pP]?|360[pP]?|HD\+?|SD|HQ|LQ)'
+# "[base] [quality] [optional 1-2 digit number]"  →  "[base]"
+_QUALITY_SUFFIX_RE = re.compile(rf'\s+{_QUALITY}(?:\s+\d{{1,2}})?\s*$', re.IGNORECASE)
+# "[base] [1-2 digit number] [quality]"  →  "[base]"
+_NUMBER_QUALITY_RE = re.compile(rf'\s+\d{{1,2}}\s+{_QUALITY}\s*$', re.IGNORECASE)
+
+
+def base_name(title: str) -> str:
+    """
+    Strip quality/variant suffixes so duplicate live channels can be grouped.
+    Examples:
+      "DAZN FHD 1"  → "DAZN"      "DAZN HD 2"   → "DAZN"
+      "ESPN 2 HD"   → "ESPN 2"     "La 1 HD"     → "La 1"
+      "Telecinco HD"→ "Telecinco"
+    """
+    title = title or ''
+    t = title.strip()
+    for _ in range(3):
+        prev = t
+        t = _QUALITY_SUFFIX_RE.sub('', t).strip()
+        t = _NUMBER_QUALITY_RE.sub('', t).strip()
+        if t == prev or not t:
+            break
+    return t or title.strip()
+
+
+def is_groupable(tipo: str, temporada) -> bool:
+    """Canal en directo de verdad (los live con S01E01 son series)."""
+    return tipo == 'live' and temporada is None
+
+
+def key_for(titulo: str, tipo: str, temporada) -> str | None:
+    """Valor de Contenido.live_group_key para una fila (None si no es un canal)."""
+    if not is_groupable(tipo, temporada):
+        return None
+    return base_name(titulo)[:300] or None
+
+
+def reconcile() -> int:
+    """
+    Recalcula live_group_key de todo el catálogo (keyset por id, solo
+    escribe las que cambian). Llamar dentro de app_context. Devuelve las
+    filas corregidas.
+    """
+    from models import db, Contenido
+    from sqlalchemy import update
+
+    fixed = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Contenido.id, Contenido.titulo, Contenido.tipo,
+                             Contenido.temporada, Contenido.live_group_key)
+            .filter(Contenido.id > last_id)
+            .order_by(Contenido.id)
+            .limit(_BATCH)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        changes = []
+        for r in rows:
+            key = key_for(r.titulo, r.tipo, r.temporada)
+            if key != r.live_group_key:
+                changes.append({'id': r.id, 'live_group_key': key})
+        if changes:
+            db.session.execute(update(Contenido), changes)
+            db.session.commit()
+            fixed += len(changes)
+
+    if fixed:
+        import catalog_cache
+        catalog_cache.bump('live groups reconcile')
+    logger.info(f'[LiveGroups] Reconciliado: {fixed} claves corregidas')
+    return fixed
+
+
+def install():
+    """
+    Primera vez (canales sin clave): rellena live_group_key. Llamar dentro
+    de app_context tras _migrate_db().
+    """
+    from models import db, Contenido
+    pending = db.session.query(Contenido.id).filter(
+        Contenido.tipo == 'live', Contenido.temporada.is_(None),
+        Contenido.live_group_key.is_(None),
+    ).first()
+    if pending is None:
+        return
+    logger.info('[LiveGroups] Calculando el nombre base de los canales en directo…')
+    try:
+        reconcile()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[LiveGroups] No se pudo calcular el agrupado: {e}')
@@ -295,6 +295,24 @@ class FuenteRSS(db.Model):
 class Contenido(db.Model):
     """Película o serie — puede venir de RSS o M3U."""
     __tablename__ = 'contenidos'
+    __table_args__ = (
+        # Filtro del purge de caídos (y de los pendientes del scanner)
+        db.Index('ix_contenidos_activo_fuente_verif', 'activo', 'fuente', 'ultima_verificacion'),
+        # Episodios de una serie ya ordenados (serie-episodios, get_series_info
+        # y el refresco de la tabla series)
+        db.Index('ix_contenidos_serie_ep', 'serie_key', 'temporada', 'episodio'),
+        # Paginación por cursor (fecha_agregado, id) — el id va implícito en el índice
+        db.Index('ix_contenidos_tipo_fecha', 'tipo', 'fecha_agregado'),
+        db.Index('ix_contenidos_fecha', 'fecha_agregado'),
+        # Listados públicos (visibility.py): un solo rango de índice sin JOIN con listas
+        db.Index('ix_contenidos_visible_tipo_fecha',
+                 'activo', 'visibility_scope', 'tipo', 'fecha_agregado'),
+        db.Index('ix_contenidos_visible_fecha', 'activo', 'visibility_scope', 'fecha_agregado'),
+        # Canales en directo agrupados por nombre base (live-agrupados)
+        db.Index('ix_contenidos_visible_live_group',
+                 'activo', 'visibility_scope', 'tipo', 'live_group_key'),
+        db.Index('ix_contenidos_owner', 'owner_id'),
+    )
 
     id            = db.Column(db.Integer, primary_key=True)
     titulo        = db.Column(db.String(500), nullable=False)
@@ -315,9 +333,17 @@ class Contenido(db.Model):
     pais          = db.Column(db.String(50))
     temporada     = db.Column(db.Integer)
     episodio      = db.Column(db.Integer)
+    # Título base de la serie (series_index.key_for); NULL si no es episodio
+    serie_key     = db.Column(db.String(300), nullable=True)
+    # Nombre base del canal en directo (live_groups.key_for); NULL si no es live
+    live_group_key = db.Column(db.String(300), nullable=True)
+    # Ámbito de visibilidad copiado de la lista (visibility.py): 'global' |
+    # 'private' (solo owner_id) | 'none'
+    visibility_scope = db.Column(db.String(10), default='global')
+    owner_id         = db.Column(db.Integer, nullable=True)
 
     activo              = db.Column(db.Boolean, default=True, index=True)
-    fecha_agregado      = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_agregado      = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     ultima_verificacion = db.Column(db.DateTime)
 
     # ── Campos exclusivos para canales en directo (tipo='live') ──
@@ -350,69 +376,92 @@ class Contenido(db.Model):
     )
 
     def to_dict(self):
-        import json as _json
-        _type_map = {'pelicula': 'movie', 'serie': 'series', 'live': 'live'}
-
-        # Para canales live: calcular URL activa y lista completa
-        if self.tipo == 'live' and self.live_urls_json:
-            try:
-                all_urls = _json.loads(self.live_urls_json)
-                active_idx = self.live_active_idx or 0
-                active_url = all_urls[active_idx] if all_urls and active_idx < len(all_urls) else self.url_stream
-            except (ValueError, IndexError, TypeError):
-                all_urls = [self.url_stream]
-                active_idx = 0
-                active_url = self.url_stream
-        else:
-            all_urls = None
-            active_idx = 0
-            active_url = self.url_stream
-
-        d = {
-            'id':          self.id,
-            'title':       self.titulo,
-            'type':        _type_map.get(self.tipo, self.tipo),
-            'streamUrl':   active_url,
-            'source':      self.fuente,
-            'server':      self.servidor,
-            'image':       self.imagen or '',
-            'description': self.descripcion or '',
-            'year':        self.año,
-            'genres':      [g.strip() for g in self.genero.split(',')] if self.genero else [],
-            'groupTitle':  self.group_title,
-            'season':      self.temporada,
-            'episode':     self.episodio,
-            'active':      self.activo,
-            'addedAt':     self.fecha_agregado.isoformat() if self.fecha_agregado else None,
-            'lastCheck':   (
-                self.ultima_verificacion.isoformat() if self.ultima_verificacion else None
-            ),
+        # Formato único con los listados por proyección (serializers.py)
+        from serializers import contenido_dict
+        return contenido_dict(self)
+
+
+# ═══════════════════════════════════════════════════════════
+# SERIES AGRUPADAS — AGREGADO MATERIALIZADO
+# ═══════════════════════════════════════════════════════════
+
+class Serie(db.Model):
+    """
+    Una fila por serie (título base), ver series_index.py.
+
+    Resume los episodios activos que comparten `Contenido.serie_key` para
+    que /api/series-agrupadas pagine con un índice en vez de agrupar todo
+    el catálogo en Python. Se refresca por claves al importar, escanear y
+    borrar, y se reconcilia entera una vez al día.
+    """
+    __tablename__ = 'series'
+
+    id           = db.Column(db.Integer, primary_key=True)
+    serie_key    = db.Column(db.String(300), unique=True, nullable=False)
+    titulo       = db.Column(db.String(300), nullable=False)
+    titulo_orden = db.Column(db.String(300), nullable=False, index=True)   # lower(titulo)
+    first_id     = db.Column(db.Integer, nullable=False)    # primer episodio (id de la tarjeta)
+    imagen       = db.Column(db.Text)
+    año          = db.Column(db.Integer, index=True)
+    genero       = db.Column(db.String(300))
+    group_title  = db.Column(db.String(300))
+    fuente       = db.Column(db.String(10))
+    temporadas   = db.Column(db.Integer, nullable=False, default=1)
+    episodios    = db.Column(db.Integer, nullable=False, default=0)
+    added_at     = db.Column(db.DateTime, index=True)         # último episodio añadido
+    updated_at   = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id':           self.first_id,
+            'title':        self.titulo,
+            'type':         'series',
+            'source':       self.fuente,
+            'streamUrl':    '',
+            'image':        self.imagen or '',
+            'year':         self.año,
+            'genres':       [g.strip() for g in self.genero.split(',') if g.strip()] if self.genero else [],
+            'seasonCount':  self.temporadas,
+            'episodeCount': self.episodios,
+            'groupTitle':   self.group_title or '',
+            'addedAt':      self.added_at.isoformat() if self.added_at else None,
         }
-        if self.tipo == 'live':
-            d['liveUrls'] = all_urls or [self.url_stream]
-            d['activeUrlIndex'] = active_idx
-        # Propiedades DRM / Avanzadas
-        if self.drm_license_type:
-            d['drmLicenseType'] = self.drm_license_type
-        if self.drm_license_key:
-            d['drmLicenseKey'] = self.drm_license_key
-        if self.drm_key_id:
-            d['drmKeyId'] = self.drm_key_id
-        if self.drm_key:
-            d['drmKey'] = self.drm_key
-        if self.manifest_type:
-            d['manifestType'] = self.manifest_type
-        if self.catchup_type:
-            d['catchupType'] = self.catchup_type
-        if self.catchup_source:
-            d['catchupSource'] = self.catchup_source
-        if self.catchup_days:
-            d['catchupDays'] = self.catchup_days
-        if self.user_agent:
-            d['userAgent'] = self.user_agent
-        if self.http_referrer:
-            d['httpReferrer'] = self.http_referrer
-        return d
+
+
+# ═══════════════════════════════════════════════════════════
+# GÉNEROS NORMALIZADOS
+# ═══════════════════════════════════════════════════════════
+
+class Genero(db.Model):
+    """
+    Un género del catálogo, ver genres.py. `clave` es el nombre sin acentos
+    ni mayúsculas ("Acción" y "accion" son el mismo género); `nombre` la
+    primera forma vista, la que se muestra. `n_activos` se precalcula para
+    el menú de géneros.
+    """
+    __tablename__ = 'generos'
+
+    id         = db.Column(db.Integer, primary_key=True)
+    clave      = db.Column(db.String(100), unique=True, nullable=False)
+    nombre     = db.Column(db.String(100), nullable=False)
+    n_activos  = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ContenidoGenero(db.Model):
+    """
+    Enlace contenido ↔ género (Contenido.genero partido por comas).
+    `pos` conserva el orden original: 0 es el género principal.
+    """
+    __tablename__ = 'contenido_generos'
+    __table_args__ = (
+        # Filtro por género: contenidos de un género sin tocar la tabla grande
+        db.Index('ix_contenido_generos_genero', 'genero_id', 'contenido_id'),
+    )
+
+    contenido_id = db.Column(db.Integer, primary_key=True)
+    genero_id    = db.Column(db.Integer, primary_key=True)
+    pos          = db.Column(db.Integer, nullable=False, default=0)
 
 
 # ═══════════════════════════════════════════════════════════
@@ -440,6 +489,43 @@ class WatchHistory(db.Model):
     contenido = db.relationship('Contenido', backref=db.backref('watches', lazy='dynamic', cascade='all, delete-orphan'))
 
 
+class TasteProfile(db.Model):
+    """
+    Perfil de gustos de una sesión ('s:<session_key>') o de un usuario
+    ('u:<id>'), actualizado en cada reproducción (ver taste_profiles.py).
+    `weights` es JSON {genero_id: peso}; `recent`, JSON con los ids vistos
+    (el más reciente primero).
+    """
+    __tablename__ = 'taste_profiles'
+
+    profile_key = db.Column(db.String(80), primary_key=True)
+    weights     = db.Column(db.Text, nullable=False, default='{}')
+    recent      = db.Column(db.Text, nullable=False, default='[]')
+    events      = db.Column(db.Integer, nullable=False, default=0)
+    updated_at  = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class TrendingItem(db.Model):
+    """
+    Pool precalculado de /api/trending (ver trending.py). Una fila por
+    película o por serie (serie_key, con su episodio más visto), con su
+    popularidad reciente. `owner_id` 0 = contenido global; N = lista
+    privada del usuario N. La tabla se rehace entera en cada cálculo.
+    """
+    __tablename__ = 'trending_items'
+    __table_args__ = (
+        db.Index('ix_trending_items_pool', 'owner_id', 'tipo', 'score'),
+    )
+
+    id           = db.Column(db.Integer, primary_key=True)
+    owner_id     = db.Column(db.Integer, nullable=False, default=0)
+    tipo         = db.Column(db.String(20), nullable=False)
+    contenido_id = db.Column(db.Integer, nullable=False)
+    serie_key    = db.Column(db.String(300), nullable=True)
+    score        = db.Column(db.Float, nullable=False, default=0.0)
+    computed_at  = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 # ═══════════════════════════════════════════════════════════
 # REPORTES DE CANALES
 # ═══════════════════════════════════════════════════════════
@@ -548,12 +634,21 @@ class LiveScanConfig(db.Model):
 class LiveScanReport(db.Model):
     """Registro de cada verificación de URL de canal en directo."""
     __tablename__ = 'live_scan_reports'
+    __table_args__ = (
+        # Última puntuación por canal en el scan live (filtro por lote de canales)
+        db.Index('ix_live_scan_reports_contenido_ts', 'contenido_id', 'timestamp'),
+    )
 
     id           = db.Column(db.Integer, primary_key=True)
     contenido_id = db.Column(db.Integer, db.ForeignKey('contenidos.id'), nullable=False)
     url_probada  = db.Column(db.Text, nullable=False)
     resultado    = db.Column(db.Boolean, nullable=False)   # True=viva, False=caída
     latencia_ms  = db.Column(db.Integer, nullable=True)
+    # Calidad medida (None si no se pudo leer el cuerpo: 401/403, HLS vacío…)
+    ttfb_ms         = db.Column(db.Integer, nullable=True)
+    throughput_kbps = db.Column(db.Integer, nullable=True)
+    # Puntuación móvil 0–100 de la URL (EWMA sobre escaneos sucesivos)
+    score        = db.Column(db.Float, nullable=True)
     timestamp    = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     contenido = db.relationship('Contenido', backref=db.backref('scan_reports', lazy='dynamic'))
@@ -566,6 +661,9 @@ class LiveScanReport(db.Model):
             'url_probada':  self.url_probada,
             'resultado':    self.resultado,
             'latencia_ms':  self.latencia_ms,
+            'ttfb_ms':      self.ttfb_ms,
+            'throughput_kbps': self.throughput_kbps,
+            'score':        self.score,
             'timestamp':    self.timestamp.isoformat() if self.timestamp else None,
         }
 
@@ -584,6 +682,185 @@ class IptvSession(db.Model):
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+# ═══════════════════════════════════════════════════════════
+# ESCANEO VOD — EJECUCIONES PERSISTENTES
+# ═══════════════════════════════════════════════════════════
+
+class ScanRun(db.Model):
+    """
+    Ejecución de un escaneo de links VOD (automático o manual).
+
+    Se guarda tras cada lote para que un reinicio del servidor no pierda
+    el progreso: el cursor es `started_at` — todo item con
+    ultima_verificacion >= started_at ya se comprobó en esta ejecución,
+    así que al reanudar solo quedan los anteriores.
+    """
+    __tablename__ = 'scan_runs'
+
+    id           = db.Column(db.Integer, primary_key=True)
+    origen       = db.Column(db.String(10), nullable=False, default='auto')    # auto | manual
+    # running | completed | failed
+    estado       = db.Column(db.String(12), nullable=False, default='running', index=True)
+    # Sin FK: la lista puede borrarse y el historial del scan debe conservarse
+    lista_id     = db.Column(db.Integer, nullable=True)
+    lista_nombre = db.Column(db.String(200), nullable=True)
+    batch_size   = db.Column(db.Integer, nullable=False, default=5000)
+    max_workers  = db.Column(db.Integer, nullable=False, default=40)
+    max_batches  = db.Column(db.Integer, nullable=False, default=200)
+
+    # Pendientes al arrancar (base para el ETA)
+    total_pendientes = db.Column(db.Integer, nullable=False, default=0)
+
+    # Totales de lotes ya guardados en BD
+    batches   = db.Column(db.Integer, nullable=False, default=0)
+    checked   = db.Column(db.Integer, nullable=False, default=0)
+    alive     = db.Column(db.Integer, nullable=False, default=0)
+    dead      = db.Column(db.Integer, nullable=False, default=0)
+    elapsed_s = db.Column(db.Float,   nullable=False, default=0.0)   # tiempo activo (sin pausas)
+
+    # Progreso del lote en curso (aún no escrito en contenidos)
+    batch_checked = db.Column(db.Integer, nullable=False, default=0)
+    batch_alive   = db.Column(db.Integer, nullable=False, default=0)
+    batch_dead    = db.Column(db.Integer, nullable=False, default=0)
+    batch_started = db.Column(db.DateTime, nullable=True)
+
+    # Resultado de cada lote: [{n, checked, alive, dead, seconds, timestamp}]
+    batches_json = db.Column(db.Text, nullable=True)
+    error        = db.Column(db.Text, nullable=True)
+
+    started_at  = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at  = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def batch_results(self) -> list:
+        import json as _json
+        try:
+            return _json.loads(self.batches_json) if self.batches_json else []
+        except (ValueError, TypeError):
+            return []
+
+    def to_dict(self):
+        checked = self.checked + self.batch_checked
+        alive   = self.alive + self.batch_alive
+        dead    = self.dead + self.batch_dead
+
+        # Tiempo activo: lotes cerrados + lo que lleva el lote actual
+        elapsed = self.elapsed_s or 0.0
+        if self.estado == 'running' and self.batch_started:
+            elapsed += max(0.0, (datetime.utcnow() - self.batch_started).total_seconds())
+
+        rate = checked / elapsed if elapsed > 0 else 0.0
+        pending = max(0, (self.total_pendientes or 0) - checked)
+        eta = int(pending / rate) if rate > 0 and self.estado == 'running' else None
+
+        return {
+            'id':           self.id,
+            'origen':       self.origen,
+            'estado':       self.estado,
+            'lista_id':     self.lista_id,
+            'lista_nombre': self.lista_nombre,
+            'batch_size':   self.batch_size,
+            'max_workers':  self.max_workers,
+            'batches':      self.batches,
+            'total':        self.total_pendientes,
+            'checked':      checked,
+            'alive':        alive,
+            'dead':         dead,
+            'pending':      pending,
+            'items_per_s':  round(rate, 2),
+            'eta_s':        eta,
+            'elapsed_s':    int(elapsed),
+            'error':        self.error,
+            'batch_results': self.batch_results,
+            'started_at':   self.started_at.isoformat() if self.started_at else None,
+            'finished_at':  self.finished_at.isoformat() if self.finished_at else None,
+            'timestamp':    (self.finished_at or self.updated_at or self.started_at).isoformat(),
+        }
+
+
+class ScanMetric(db.Model):
+    """
+    Telemetría de los scans (VOD, live y curados), ver scan_metrics.py.
+
+    Dos tipos de fila por ejecución (`run_ref`, p. ej. 'vod:12'):
+      servidor NULL → totales de un lote (la serie temporal del panel)
+      servidor X    → acumulado de la ejecución para ese servidor; se
+                      fusiona lote a lote (contadores e histograma suman)
+    La latencia se guarda como histograma de buckets fijos
+    (scan_metrics.BOUNDS_MS) en texto "n0,n1,…" — los percentiles se
+    calculan al leer y los histogramas se pueden fusionar.
+    """
+    __tablename__ = 'scan_metrics'
+    __table_args__ = (
+        db.Index('ix_scan_metrics_tipo_ts', 'tipo', 'timestamp'),
+        db.Index('ix_scan_metrics_run_servidor', 'run_ref', 'servidor'),
+    )
+
+    id         = db.Column(db.Integer, primary_key=True)
+    tipo       = db.Column(db.String(10), nullable=False)       # vod | live | curado
+    run_ref    = db.Column(db.String(40), nullable=False)
+    servidor   = db.Column(db.String(300), nullable=True)
+    workers    = db.Column(db.Integer, nullable=True)
+    timeout_s  = db.Column(db.Integer, nullable=True)
+    seconds    = db.Column(db.Float, nullable=False, default=0.0)
+    probes     = db.Column(db.Integer, nullable=False, default=0)
+    alive      = db.Column(db.Integer, nullable=False, default=0)
+    timeouts   = db.Column(db.Integer, nullable=False, default=0)
+    html       = db.Column(db.Integer, nullable=False, default=0)   # páginas de error con 200
+    ua_retries = db.Column(db.Integer, nullable=False, default=0)   # fallback a UA de navegador
+    hist       = db.Column(db.String(200), nullable=True)
+    timestamp  = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+# ═══════════════════════════════════════════════════════════
+# TAREAS EN BACKGROUND — COLA PARA EL WORKER
+# ═══════════════════════════════════════════════════════════
+
+class BackgroundTask(db.Model):
+    """
+    Trabajo encolado por el proceso web para que lo ejecute worker.py
+    (solo con BACKGROUND_WORKER=1; si no, tasks.enqueue() lanza un hilo).
+
+    El worker reclama las tareas con un UPDATE condicional sobre `estado`,
+    así que varias instancias nunca ejecutan la misma.
+    """
+    __tablename__ = 'background_tasks'
+
+    id        = db.Column(db.Integer, primary_key=True)
+    tipo      = db.Column(db.String(30), nullable=False)     # scan_vod | scan_live | import_lista …
+    args_json = db.Column(db.Text, nullable=True)
+    # pending | running | done | failed
+    estado    = db.Column(db.String(10), nullable=False, default='pending', index=True)
+    worker    = db.Column(db.String(80), nullable=True)      # host:pid que la ejecuta
+    error     = db.Column(db.Text, nullable=True)
+
+    created_at  = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at  = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def args(self) -> dict:
+        import json as _json
+        try:
+            return _json.loads(self.args_json) if self.args_json else {}
+        except (ValueError, TypeError):
+            return {}
+
+    def to_dict(self):
+        return {
+            'id':          self.id,
+            'tipo':        self.tipo,
+            'args':        self.args,
+            'estado':      self.estado,
+            'worker':      self.worker,
+            'error':       self.error,
+            'created_at':  self.created_at.isoformat() if self.created_at else None,
+            'started_at':  self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
 # ═══════════════════════════════════════════════════════════
 # TELEGRAM — CONFIGURACIÓN Y SNAPSHOTS DE SALUD
 # ═══════════════════════════════════════════════════════════
@@ -644,6 +921,9 @@ class CanalCurado(db.Model):
     fuente     = db.Column(db.String(200), nullable=True)
     lista_id   = db.Column(db.Integer, db.ForeignKey('listas.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Último scan de salud (scan_curated_channels): cuándo y cuántas URLs vivas
+    ultima_verificacion = db.Column(db.DateTime, nullable=True)
+    urls_vivas          = db.Column(db.Integer, nullable=True)
 
     @property
     def urls(self):
@@ -681,6 +961,42 @@ class CanalCurado(db.Model):
         }
 
 
+class CuradoScanReport(db.Model):
+    """
+    Resultado de cada URL de un canal curado en el scan de salud.
+    Mismas métricas que LiveScanReport; la puntuación móvil decide el
+    orden de urls_json.
+    """
+    __tablename__ = 'curado_scan_reports'
+    __table_args__ = (
+        db.Index('ix_curado_scan_reports_canal_ts', 'canal_id', 'timestamp'),
+    )
+
+    id          = db.Column(db.Integer, primary_key=True)
+    # Sin FK: al borrar un canal curado su historial caduca con la retención
+    canal_id    = db.Column(db.Integer, nullable=False)
+    url_probada = db.Column(db.Text, nullable=False)
+    resultado   = db.Column(db.Boolean, nullable=False)
+    latencia_ms = db.Column(db.Integer, nullable=True)
+    ttfb_ms         = db.Column(db.Integer, nullable=True)
+    throughput_kbps = db.Column(db.Integer, nullable=True)
+    score       = db.Column(db.Float, nullable=True)
+    timestamp   = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id':              self.id,
+            'canal_id':        self.canal_id,
+            'url_probada':     self.url_probada,
+            'resultado':       self.resultado,
+            'latencia_ms':     self.latencia_ms,
+            'ttfb_ms':         self.ttfb_ms,
+            'throughput_kbps': self.throughput_kbps,
+            'score':           self.score,
+            'timestamp':       self.timestamp.isoformat() if self.timestamp else None,
+        }
+
+
 # ═══════════════════════════════════════════════════════════
 # XTREAM CODES — CONFIGURACIÓN DEL SERVIDOR
 # ═══════════════════════════════════════════════════════════
@@ -726,3 +1042,76 @@ class ServerHealthSnapshot(db.Model):
     # True si ya se envió alerta de caída para este servidor (evita duplicados)
     alerted    = db.Column(db.Boolean, nullable=False, default=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ═══════════════════════════════════════════════════════════
+# CIRCUIT BREAKER POR SERVIDOR
+# ═══════════════════════════════════════════════════════════
+
+class ServerBreaker(db.Model):
+    """
+    Estado compartido del circuit breaker de cada servidor (ver
+    circuit_breaker.py). Cada proceso lo tiene en memoria y lo sincroniza
+    aquí cada pocos segundos.
+    """
+    __tablename__ = 'server_breakers'
+
+    id            = db.Column(db.Integer, primary_key=True)
+    servidor      = db.Column(db.String(300), unique=True, nullable=False, index=True)
+    estado        = db.Column(db.String(10), nullable=False, default='closed')   # closed | open
+    fallos        = db.Column(db.Float, nullable=False, default=0.0)
+    reaperturas   = db.Column(db.Integer, nullable=False, default=0)
+    abierto_hasta = db.Column(db.DateTime, nullable=True)
+    motivo        = db.Column(db.String(200), nullable=True)
+    updated_at    = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'servidor':      self.servidor,
+            'estado':        self.estado,
+            'fallos':        self.fallos,
+            'reaperturas':   self.reaperturas,
+            'abierto_hasta': self.abierto_hasta.isoformat() if self.abierto_hasta else None,
+            'motivo':        self.motivo,
+            'updated_at':    self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+# ═══════════════════════════════════════════════════════════
+# CACHÉ DEL CATÁLOGO — GENERACIÓN
+# ═══════════════════════════════════════════════════════════
+
+class CatalogGeneration(db.Model):
+    """
+    Contador de versión del catálogo (una sola fila, id=1), ver
+    catalog_cache.py. Imports, scans, purges y ediciones del admin lo
+    incrementan; las respuestas cacheadas de otra generación se descartan.
+    Vive en BD para que gunicorn y worker.py invaliden todos a la vez.
+    """
+    __tablename__ = 'catalog_generation'
+
+    id         = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    motivo     = db.Column(db.String(60), nullable=True)     # último bump (diagnóstico)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class CatalogCounter(db.Model):
+    """
+    Número de contenidos por (tipo, fuente, activo, lista), ver
+    catalog_counters.py. En SQLite lo mantienen triggers sobre contenidos
+    (misma transacción que la escritura); /api/stats, el dashboard y los
+    resúmenes de Telegram suman estas filas en vez de hacer COUNT(*).
+    NULL se guarda como '' / 0 para que la clave única funcione.
+    """
+    __tablename__ = 'catalog_counters'
+    __table_args__ = (
+        db.UniqueConstraint('tipo', 'fuente', 'activo', 'lista_id', name='uq_catalog_counters_key'),
+    )
+
+    id       = db.Column(db.Integer, primary_key=True)
+    tipo     = db.Column(db.String(20), nullable=False, default='')
+    fuente   = db.Column(db.String(10), nullable=False, default='')
+    activo   = db.Column(db.Integer, nullable=False, default=0)   # 0 | 1
+    lista_id = db.Column(db.Integer, nullable=False, default=0)   # 0 = sin lista (RSS)
+    n        = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,247 @@
+"""
+Matriz contenido × género en memoria para /api/recomendaciones.
+
+get_recomendaciones cargaba hasta 2000 candidatos ORM y los puntuaba uno a
+uno en Python: con un catálogo grande el pool era una muestra pequeña y
+cada petición pagaba la carga. Aquí cada proceso guarda en arrays NumPy
+todo el contenido activo no live:
+
+  ids           id de contenido por fila (ordenados → searchsorted)
+  tipo / scope  código de tipo, ámbito de visibilidad y dueño por fila
+  main          género principal (pos 0) por fila, para la cuota
+  por género    filas que lo tienen (matriz dispersa por columnas:
+                indptr + rows, como una CSC sin valores)
+
+El perfil del usuario es un vector de pesos por género; puntuar es sumar
+sus columnas sobre todo el catálogo (más imagen y jitter, como antes),
+enmascarar lo que no ve o ya vio y quedarse con los mejores
+(argpartition). Sin NumPy (dependencia opcional) o con RECO_MATRIX=0,
+rank() devuelve None y la ruta usa el pool SQL de antes.
+
+La matriz se construye siempre en un hilo: install() la empieza al
+arrancar y, hasta que está lista, rank() devuelve None (pool SQL). Se
+reconstruye cuando cambia la generación del catálogo (catalog_cache) y
+han pasado RECO_MATRIX_REFRESH segundos; entre tanto se sigue usando la
+anterior.
+"""
+import logging
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:          # dependencia opcional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+_BATCH = 20000    # contenidos por vuelta al leer el catálogo (keyset por id)
+
+_app = None
+_enabled = True
+_refresh = 300    # segundos mínimos entre reconstrucciones
+
+_lock = threading.Lock()
+_state = None     # dict con los arrays (ver _build)
+_building = False
+
+_SCOPES = {'global': 0, 'private': 1}   # el resto (none, NULL) → 2
+
+
+def available() -> bool:
+    return np is not None and _enabled
+
+
+# ── Construcción ───────────────────────────────────────────────
+
+def _build() -> dict:
+    """Lee contenidos y enlaces de géneros y arma los arrays. Requiere app_context."""
+    import catalog_cache
+    from models import db, Contenido, ContenidoGenero
+    from sqlalchemy import select
+
+    t0 = time.perf_counter()
+    gen = catalog_cache.generation()
+    tipos: dict = {}
+    ids, tipo, scope, owner, img = [], [], [], [], []
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Contenido.id, Contenido.tipo, Contenido.visibility_scope,
+                   Contenido.owner_id, Contenido.imagen)
+            .where(Contenido.id > last_id, Contenido.activo == True,
+                   Contenido.tipo != 'live')
+            .order_by(Contenido.id).limit(_BATCH)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for cid, t, s, o, im in rows:
+            ids.append(cid)
+            tipo.append(tipos.setdefault(t, len(tipos)))
+            scope.append(_SCOPES.get(s, 2))
+            owner.append(o or 0)
+            img.append(bool(im))
+
+    ids_a = np.array(ids, dtype=np.int64)
+    n = len(ids_a)
+
+    links = db.session.execute(
+        select(ContenidoGenero.contenido_id, ContenidoGenero.genero_id, ContenidoGenero.pos)
+    ).all()
+    link_c = [r[0] for r in links]
+    link_g = [r[1] for r in links]
+    link_p = [r[2] for r in links]
+    del links
+
+    lc = np.array(link_c, dtype=np.int64)
+    lg = np.array(link_g, dtype=np.int64)
+    lp = np.array(link_p, dtype=np.int32)
+    # contenido_id → fila; fuera los enlaces de contenidos no incluidos
+    pos = np.searchsorted(ids_a, lc)
+    pos_ok = np.minimum(pos, max(n - 1, 0))
+    keep = (pos < n) & (ids_a[pos_ok] == lc) if n else np.zeros(len(lc), dtype=bool)
+    rows_l, lg, lp = pos[keep].astype(np.int32), lg[keep], lp[keep]
+
+    main = np.full(n, -1, dtype=np.int64)
+    first = lp == 0
+    main[rows_l[first]] = lg[first]
+    has_genre = np.zeros(n, dtype=bool)
+    has_genre[rows_l] = True
+
+    # Columnas: filas agrupadas por género
+    order = np.argsort(lg, kind='stable')
+    col_rows = rows_l[order]
+    gids, starts = np.unique(lg[order], return_index=True)
+    indptr = np.append(starts, len(col_rows))
+
+    state = {
+        'generation': gen,
+        'built_at':   time.monotonic(),
+        'ids':        ids_a,
+        'tipos':      tipos,
+        'tipo':       np.array(tipo, dtype=np.int16),
+        'scope':      np.array(scope, dtype=np.int8),
+        'owner':      np.array(owner, dtype=np.int64),
+        'image':      np.array(img, dtype=bool),
+        'has_genre':  has_genre,
+        'main':       main,
+        'gids':       gids,
+        'indptr':     indptr,
+        'col_rows':   col_rows,
+    }
+    logger.info(f'[RecoMatrix] {n} contenidos, {len(col_rows)} enlaces, '
+                f'{len(gids)} géneros en {time.perf_counter() - t0:.2f}s')
+    return state
+
+
+def _rebuild_async():
+    global _state, _building
+    try:
+        with _app.app_context():
+            state = _build()
+        with _lock:
+            _state = state
+    except Exception as e:
+        logger.warning(f'[RecoMatrix] No se pudo construir la matriz: {e}')
+    finally:
+        with _lock:
+            _building = False
+
+
+def _start_build():
+    """Lanza la construcción en un hilo si no hay otra en marcha."""
+    global _building
+    with _lock:
+        if _building or _app is None:
+            return
+        _building = True
+    threading.Thread(target=_rebuild_async, daemon=True, name='reco-matrix').start()
+
+
+def _current():
+    """Matriz vigente; None mientras se construye la primera (→ pool SQL)."""
+    import catalog_cache
+    state = _state
+    if state is None:
+        _start_build()
+        return None
+    if (state['generation'] != catalog_cache.generation()
+            and time.monotonic() - state['built_at'] >= _refresh):
+        _start_build()
+    return state
+
+
+def invalidate():
+    """Descarta la matriz (la siguiente petición lanza la reconstrucción)."""
+    global _state
+    with _lock:
+        _state = None
+
+
+# ── Puntuación ─────────────────────────────────────────────────
+
+def rank(weights: dict, user_id=None, exclude=(), tipo: str = None, n: int = 200):
+    """
+    Mejores `n` contenidos para un perfil {genero_id: peso}:
+    [(contenido_id, genero_principal | None)] de mayor a menor score.
+    Misma puntuación que el pool SQL: suma de pesos de sus géneros, +0.3 con
+    imagen y jitter ±0.1; 0 si no tiene géneros. None si no hay NumPy o
+    la matriz aún no está lista. Requiere app_context.
+    """
+    if not available():
+        return None
+    state = _current()
+    if state is None:
+        return None
+    ids = state['ids']
+    size = len(ids)
+    if not size:
+        return []
+
+    scores = np.zeros(size, dtype=np.float64)
+    gids, indptr, col_rows = state['gids'], state['indptr'], state['col_rows']
+    for gid, w in weights.items():
+        j = np.searchsorted(gids, gid)
+        if j < len(gids) and gids[j] == gid:
+            scores[col_rows[indptr[j]:indptr[j + 1]]] += w
+    rng = np.random.default_rng()
+    scores += 0.3 * state['image'] + rng.uniform(-0.1, 0.1, size)
+    scores[~state['has_genre']] = 0.0
+
+    visible = state['scope'] == 0
+    if user_id:
+        visible |= (state['scope'] == 1) & (state['owner'] == user_id)
+    if tipo is not None:
+        code = state['tipos'].get(tipo)
+        visible &= state['tipo'] == (code if code is not None else -1)
+    scores[~visible] = -np.inf
+    if exclude:
+        ex = np.fromiter(exclude, dtype=np.int64)
+        pos = np.searchsorted(ids, ex)
+        pos = pos[pos < size]
+        pos = pos[np.isin(ids[pos], ex)]
+        scores[pos] = -np.inf
+
+    k = min(n, size)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    top = top[np.isfinite(scores[top])]
+    main = state['main']
+    return [(int(ids[i]), int(main[i]) if main[i] >= 0 else None) for i in top]
+
+
+def install(app):
+    """
+    Configura desde app.config (RECO_MATRIX, RECO_MATRIX_REFRESH) y empieza
+    a construir la matriz en un hilo (salvo en testing: la primera petición).
+    """
+    global _app, _enabled, _refresh
+    _app = app
+    _enabled = bool(app.config.get('RECO_MATRIX', 1))
+    _refresh = app.config.get('RECO_MATRIX_REFRESH', 300)
+    invalidate()
+    if _enabled and np is None:
+        logger.info('[RecoMatrix] NumPy no instalado: recomendaciones con el pool SQL')
+    elif available() and not app.testing:
+        _start_build()
@@ -5,7 +5,6 @@ import json
 import re as _re
 import threading
 import time as _time
-import uuid
 from datetime import datetime
 from functools import wraps
 
@@ -22,17 +21,30 @@ from m3u_parser import (
     fetch_and_parse, parse_and_filter,
     fetch_groups_preview, get_groups_preview, decode_m3u_bytes,
 )
-from link_checker import scan_dead_links, purge_dead_links, server_health
+from link_checker import (
+    server_health, create_scan_run, get_running_scan,
+)
 from rss_importer import import_rss_source, DEFAULT_RSS_SOURCES
+from tasks import enqueue, save_upload, pop_upload
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
-# ── Estado del scan en memoria ─────────────────────────────────
-_scan_state: dict = {'running': False, 'last_result': None}
+# Endpoints de escritura del panel que no tocan el catálogo
+_NO_CATALOG_BUMP = {'admin.login_post', 'admin.logout', 'admin.admin_catalog_cache_clear'}
+
 
-# ── Almacén temporal para uploads en el flujo de previsualización ──
-# Clave: temp_id (UUID), valor: raw_bytes del archivo M3U
-_temp_uploads: dict[str, bytes] = {}
+@admin_bp.after_request
+def _bump_catalog_generation(resp):
+    """
+    Cualquier edición del panel (POST/PUT/DELETE correcto) invalida la caché
+    de respuestas del catálogo (catalog_cache.py). Invalidar de más solo
+    cuesta un recálculo; quedarse corto serviría datos viejos.
+    """
+    if (request.method not in ('GET', 'HEAD', 'OPTIONS') and resp.status_code < 400
+            and request.endpoint not in _NO_CATALOG_BUMP and session.get('user_id')):
+        import catalog_cache
+        catalog_cache.bump(f'admin {request.endpoint or ""}'[:60])
+    return resp
 
 
 # ── Auth ───────────────────────────────────────────────────────
@@ -130,16 +142,19 @@ def logout():
 def dashboard():
     panel_user = _get_panel_user()
 
+    import catalog_counters
+    counters = catalog_counters.snapshot()
+    contar = lambda **kw: catalog_counters.count(counters, **kw)
     if panel_user.is_superadmin:
         stats = {
-            'peliculas':   Contenido.query.filter_by(tipo='pelicula', activo=True).count(),
-            'series':      Contenido.query.filter_by(tipo='serie', activo=True).count(),
-            'live':        Contenido.query.filter_by(tipo='live', activo=True).count(),
-            'inactivos':   Contenido.query.filter_by(activo=False).count(),
+            'peliculas':   contar(tipo='pelicula', activo=True),
+            'series':      contar(tipo='serie', activo=True),
+            'live':        contar(tipo='live', activo=True),
+            'inactivos':   contar(activo=False),
             'listas_m3u':  Lista.query.count(),
             'fuentes_rss': FuenteRSS.query.count(),
-            'total_m3u':   Contenido.query.filter_by(fuente='m3u', activo=True).count(),
-            'total_rss':   Contenido.query.filter_by(fuente='rss', activo=True).count(),
+            'total_m3u':   contar(fuente='m3u', activo=True),
+            'total_rss':   contar(fuente='rss', activo=True),
             'usuarios':    User.query.count(),
             'usuarios_normales': User.query.filter_by(role='user').count(),
             'usuarios_premium':  User.query.filter_by(role='premium').count(),
@@ -150,17 +165,14 @@ def dashboard():
     else:
         # Usuario premium: solo sus listas privadas
         mis_ids = [l.id for l in panel_user.listas]
-        q_cont  = Contenido.query.filter(
-            Contenido.lista_id.in_(mis_ids), Contenido.activo == True
-        ) if mis_ids else Contenido.query.filter(False)
         stats = {
-            'peliculas':   q_cont.filter_by(tipo='pelicula').count(),
-            'series':      q_cont.filter_by(tipo='serie').count(),
-            'live':        q_cont.filter_by(tipo='live').count(),
+            'peliculas':   contar(tipo='pelicula', activo=True, lista_ids=mis_ids),
+            'series':      contar(tipo='serie', activo=True, lista_ids=mis_ids),
+            'live':        contar(tipo='live', activo=True, lista_ids=mis_ids),
             'inactivos':   0,
             'listas_m3u':  panel_user.listas.count(),
             'fuentes_rss': panel_user.fuentes_rss.count(),
-            'total_m3u':   q_cont.count(),
+            'total_m3u':   contar(activo=True, lista_ids=mis_ids),
             'total_rss':   0,
         }
         listas  = panel_user.listas.order_by(Lista.fecha_creacion.desc()).limit(6).all()
@@ -182,7 +194,7 @@ def dashboard():
         db.session.add(live_cfg)
         db.session.commit()
 
-    scan_state_with_live = dict(_scan_state)
+    scan_state_with_live = _scan_state()
     scan_state_with_live['show_in_frontend'] = live_cfg.show_in_frontend
 
     return render_template(
@@ -366,6 +378,7 @@ def eliminar_lista(lista_id):
     if not panel_user.is_superadmin and lista.owner_id != panel_user.id:
         flash('No tienes permiso para eliminar esta lista.', 'danger')
         return redirect(url_for('admin.listas'))
+    import series_index
     nombre     = lista.nombre
     total_items = lista.total_items or 0
 
@@ -376,6 +389,7 @@ def eliminar_lista(lista_id):
                 # 1. Obtener IDs de contenidos sin cargar objetos ORM
                 cids = [r[0] for r in
                         db.session.query(Contenido.id).filter_by(lista_id=lista_id).all()]
+                serie_keys = series_index.keys_for_lista(lista_id)
 
                 # 2. Borrar dependencias en trozos y confirmar cada uno
                 for i in range(0, len(cids), 900):
@@ -400,6 +414,13 @@ def eliminar_lista(lista_id):
                 if lista_obj:
                     db.session.delete(lista_obj)
                 db.session.commit()
+                series_index.refresh_safe(serie_keys)
+                # En el hilo (listas grandes) el after_request ya pasó: hay que
+                # invalidar aquí o se volverían a cachear listados con lo borrado
+                import catalog_cache
+                import genres
+                genres.refresh_counts()
+                catalog_cache.bump('eliminar lista')
             except Exception as exc:
                 db.session.rollback()
                 current_app.logger.exception(
@@ -413,6 +434,7 @@ def eliminar_lista(lista_id):
         try:
             cids = [r[0] for r in
                     db.session.query(Contenido.id).filter_by(lista_id=lista_id).all()]
+            serie_keys = series_index.keys_for_lista(lista_id)
             for i in range(0, len(cids), 900):
                 chunk = cids[i:i + 900]
                 WatchHistory.query.filter(
@@ -429,6 +451,7 @@ def eliminar_lista(lista_id):
                 db.session.flush()
             db.session.delete(lista)
             db.session.commit()
+            series_index.refresh_safe(serie_keys)
             flash(f'Lista "{nombre}" y todo su contenido eliminados.', 'success')
         except Exception as exc:
             db.session.rollback()
@@ -479,9 +502,11 @@ def toggle_lista(lista_id):
 @login_required
 def toggle_visibility_lista(lista_id):
     """Alterna la visibilidad de una lista entre 'global' y 'private'."""
+    import visibility
     lista = Lista.query.get_or_404(lista_id)
     lista.visibilidad = 'private' if lista.visibilidad == 'global' else 'global'
     db.session.commit()
+    visibility.sync([lista.id])
     return jsonify({'ok': True, 'visibilidad': lista.visibilidad, 'nombre': lista.nombre})
 
 
@@ -582,36 +607,21 @@ def importar_defaults_rss():
 @login_required
 def manual_scan():
     """Escaneo multi-hilo de links caídos. Solo actúa sobre fuente='m3u'."""
-    if _scan_state['running']:
+    app = current_app._get_current_object()
+    if get_running_scan(app) is not None:
         flash('Ya hay un escaneo en curso. Espera a que termine.', 'warning')
         return redirect(url_for('admin.dashboard'))
 
-    app = current_app._get_current_object()
     batch   = request.form.get('batch', app.config.get('SCAN_BATCH_SIZE', 500), type=int)
     workers = request.form.get('workers', 40, type=int)
     workers = max(5, min(workers, 80))   # entre 5 y 80
     lista_id = request.form.get('lista_id', 0, type=int) or None
 
-    lista_nombre = None
-    if lista_id:
-        l = Lista.query.get(lista_id)
-        lista_nombre = l.nombre if l else None
+    # Un único lote: el progreso queda en un ScanRun y sobrevive a reinicios
+    run_id = create_scan_run(app, origen='manual', batch_size=batch,
+                             max_workers=workers, lista_id=lista_id, max_batches=1)
 
-    def run():
-        _scan_state['running'] = True
-        try:
-            result = scan_dead_links(app, batch_size=batch, max_workers=workers,
-                                     lista_id=lista_id)
-            if lista_nombre:
-                result['lista_nombre'] = lista_nombre
-            _scan_state['last_result'] = result
-        except Exception as e:
-            _scan_state['last_result'] = {'error': str(e)}
-        finally:
-            _scan_state['running'] = False
-
-    t = threading.Thread(target=run, daemon=True)
-    t.start()
+    enqueue(app, 'scan_vod', run_id=run_id)
     flash(
         f'Escaneo iniciado: {batch} links con {workers} hilos en paralelo. '
         f'Refresca en unos minutos para ver resultados.',
@@ -620,28 +630,35 @@ def manual_scan():
     return redirect(url_for('admin.dashboard'))
 
 
+def _scan_state() -> dict:
+    """Estado del scan VOD a partir de los ScanRun guardados en BD."""
+    from models import ScanRun
+    running = ScanRun.query.filter_by(estado='running').order_by(ScanRun.id.desc()).first()
+    last = (
+        ScanRun.query.filter(ScanRun.estado != 'running')
+        .order_by(ScanRun.id.desc()).first()
+    )
+    return {
+        'running':     running is not None,
+        'progress':    running.to_dict() if running else None,
+        'last_result': last.to_dict() if last else None,
+    }
+
+
 @admin_bp.get('/api/scan-status')
 @login_required
 def scan_status():
-    return jsonify({
-        'running': _scan_state['running'],
-        'last_result': _scan_state['last_result'],
-    })
+    return jsonify(_scan_state())
 
 
 @admin_bp.post('/purge-dead')
 @login_required
 def admin_purge_dead():
-    """Elimina permanentemente el contenido M3U inactivo más de N días."""
+    """Elimina permanentemente el contenido M3U inactivo más de N días (en background)."""
     days = request.form.get('days', 7, type=int)
     days = max(1, min(days, 365))
-    app = current_app._get_current_object()
-    result = purge_dead_links(app, days=days)
-    flash(
-        f'Purge completado: {result["deleted"]} items eliminados '
-        f'(inactivos >{days} días).',
-        'success' if result['deleted'] > 0 else 'info',
-    )
+    enqueue(current_app._get_current_object(), 'purge', days=days)
+    flash(f'Purge iniciado en background (inactivos >{days} días).', 'info')
     return redirect(url_for('admin.dashboard'))
 
 
@@ -1052,10 +1069,9 @@ def subir_lista():
         return redirect(url_for('admin.listas'))
 
     # Obtener bytes: primero desde el almacén temporal (flujo 2-pasos), luego desde el archivo
-    raw_bytes = None
-    if temp_id and temp_id in _temp_uploads:
-        raw_bytes = _temp_uploads.pop(temp_id)
-    else:
+    app = current_app._get_current_object()
+    raw_bytes = pop_upload(app, temp_id) if temp_id else None
+    if raw_bytes is None:
         archivo = request.files.get('archivo')
         if not archivo or not archivo.filename:
             flash('Selecciona un archivo .m3u o .m3u8.', 'danger')
@@ -1099,14 +1115,10 @@ def subir_lista():
         live_a_curado=live_a_curado,
     )
     db.session.add(lista)
-    db.session.commit()   # commit ANTES de lanzar el hilo para que el hilo vea la fila
+    db.session.commit()   # commit ANTES de encolar para que la tarea vea la fila
 
-    app = current_app._get_current_object()
-    t = threading.Thread(
-        target=_import_from_bytes, args=(app, lista.id, raw_bytes),
-        daemon=True,
-    )
-    t.start()
+    # El archivo va a disco: la importación puede correr en el worker
+    enqueue(app, 'import_upload', lista_id=lista.id, upload_id=save_upload(app, raw_bytes))
     flash(
         f'Lista "{nombre}" creada. Procesando archivo ({len(raw_bytes)//1024} KB)…',
         'info',
@@ -1142,17 +1154,16 @@ def resubir_lista(lista_id):
             chunk = old_ids[i:i + 900]
             WatchHistory.query.filter(WatchHistory.contenido_id.in_(chunk)).delete(synchronize_session=False)
     # Borrar contenido antiguo de esta lista antes de re-importar
+    import series_index
+    serie_keys = series_index.keys_for_lista(lista_id)
     Contenido.query.filter_by(lista_id=lista_id).delete()
     lista.ultima_actualizacion = None
     lista.error = None
-    db.session.commit()   # commit ANTES de lanzar el hilo
+    db.session.commit()   # commit ANTES de encolar
+    series_index.refresh_safe(serie_keys)
 
     app = current_app._get_current_object()
-    t = threading.Thread(
-        target=_import_from_bytes, args=(app, lista_id, raw_bytes),
-        daemon=True,
-    )
-    t.start()
+    enqueue(app, 'import_upload', lista_id=lista_id, upload_id=save_upload(app, raw_bytes))
 
     flash(f'Re-importando "{lista.nombre}" desde nuevo archivo…', 'info')
     return redirect(url_for('admin.listas'))
@@ -1202,8 +1213,8 @@ def preview_file_grupos():
     content = decode_m3u_bytes(raw_bytes)
     groups = get_groups_preview(content)
 
-    temp_id = str(uuid.uuid4())
-    _temp_uploads[temp_id] = raw_bytes
+    # En disco y no en memoria: el import puede llegar a otro proceso
+    temp_id = save_upload(current_app._get_current_object(), raw_bytes)
 
     return jsonify({
         'ok': True,
@@ -1305,8 +1316,11 @@ def lista_edit_grupos(lista_id):
         for i in range(0, len(old_ids), 900):
             chunk = old_ids[i:i + 900]
             WatchHistory.query.filter(WatchHistory.contenido_id.in_(chunk)).delete(synchronize_session=False)
+    import series_index
+    serie_keys = series_index.keys_for_lista(lista_id)
     Contenido.query.filter_by(lista_id=lista_id).delete()
     db.session.commit()
+    series_index.refresh_safe(serie_keys)
 
     _import_lista_async(current_app._get_current_object(), lista.id)
     flash(f'Selección de grupos actualizada para "{lista.nombre}". Re-importando...', 'success')
@@ -1363,7 +1377,13 @@ def _do_bulk_insert(items: list, existing_hashes: set, lista_id: int, conflict_i
 
     Devuelve (nuevos_insertados, duplicados_descartados_del_m3u).
     """
+    import series_index
+    import live_groups
+    import visibility
+    import genres
     now = datetime.utcnow()
+    # Ámbito de visibilidad de la lista, copiado a cada fila
+    scope, scope_owner = visibility.scope_for(Lista.query.get(lista_id) if lista_id else None)
 
     # ── Fase 1: elegir la mejor variante por título (películas) ────────
     best_pelicula: dict[str, dict] = {}   # title_key → mejor item
@@ -1424,10 +1444,16 @@ def _do_bulk_insert(items: list, existing_hashes: set, lista_id: int, conflict_i
             'pais':                it.get('pais') or '',
             'temporada':           it.get('temporada'),
             'episodio':            it.get('episodio'),
+            'serie_key':           series_index.key_for(
+                it.get('titulo') or '', it.get('tipo', 'pelicula'), it.get('temporada')),
+            'live_group_key':      live_groups.key_for(
+                it.get('titulo') or '', it.get('tipo', 'pelicula'), it.get('temporada')),
             'activo':              True,
             'fecha_agregado':      now,
             'ultima_verificacion': None,
             'lista_id':            lista_id,
+            'visibility_scope':    scope,
+            'owner_id':            scope_owner,
             'fuente_rss_id':       None,
             # Campos DRM / Avanzados
             'drm_license_type': it.get('drm_license_type'),
@@ -1441,6 +1467,7 @@ def _do_bulk_insert(items: list, existing_hashes: set, lista_id: int, conflict_i
         })
 
     # ── Fase 3: Bulk INSERT en chunks ───────────────────────────────────
+    last_id = genres.max_id()   # los ids nuevos son > last_id (enlaces de géneros)
     if conflict_ignore:
         # INSERT OR IGNORE via engine.connect() (evita insertmanyvalues de SQLAlchemy 2.x
         # que añade RETURNING y es lento con on_conflict_do_nothing).
@@ -1456,12 +1483,21 @@ def _do_bulk_insert(items: list, existing_hashes: set, lista_id: int, conflict_i
             db.session.execute(_stmt, rows[i:i + _BULK_CHUNK])
             db.session.commit()
 
+    # Series agrupadas: recalcular solo las que han recibido episodios
+    series_index.refresh_safe({r['serie_key'] for r in rows if r['serie_key']})
+    if rows:
+        genres.link_since(last_id)
+        genres.refresh_counts()
+        import catalog_cache
+        catalog_cache.bump('import')
+        import trending
+        trending.rebuild_safe('import')
+
     return len(rows), dupl_m3u
 
 
 def _import_lista_async(app, lista_id: int):
-    t = threading.Thread(target=_import_lista, args=(app, lista_id), daemon=True)
-    t.start()
+    enqueue(app, 'import_lista', lista_id=lista_id)
 
 
 def _insert_batch(batch: list, lista_id: int) -> tuple[int, int]:
@@ -1877,6 +1913,8 @@ def dedup_peliculas():
                 to_delete.append(p.id)
 
     if to_delete:
+        import series_index
+        serie_keys = series_index.keys_for_ids(to_delete)
         # Primero borrar watch_history para evitar violación NOT NULL en FK
         for i in range(0, len(to_delete), 900):
             chunk = to_delete[i:i + 900]
@@ -1886,6 +1924,7 @@ def dedup_peliculas():
             chunk = to_delete[i:i + 900]
             Contenido.query.filter(Contenido.id.in_(chunk)).delete(synchronize_session=False)
         db.session.commit()
+        series_index.refresh_safe(serie_keys)
 
     return jsonify({'ok': True, 'eliminados': len(to_delete)})
 
@@ -1962,6 +2001,8 @@ def eliminar_user(user_id):
         flash('No puedes eliminar al superadmin.', 'danger')
         return redirect(url_for('admin.users'))
     # Reasignar sus listas a global antes de borrar
+    import visibility
+    lista_ids = [l.id for l in Lista.query.filter_by(owner_id=u.id)]
     Lista.query.filter_by(owner_id=u.id).update({
         'owner_id': None, 'visibilidad': 'global'
     })
@@ -1970,6 +2011,7 @@ def eliminar_user(user_id):
     })
     db.session.delete(u)
     db.session.commit()
+    visibility.sync(lista_ids)
     flash(f'Usuario {u.username} eliminado.', 'success')
     return redirect(url_for('admin.users'))
 
@@ -2063,6 +2105,9 @@ def resolver_reporte(report_id):
         r.nota_admin     = 'Canal desactivado'
         r.fecha_revision = datetime.utcnow()
         db.session.commit()
+        if c and c.serie_key:
+            import series_index
+            series_index.refresh_safe({c.serie_key})
         flash('Canal desactivado y reporte cerrado.', 'success')
     elif accion == 'resuelto':
         r.estado         = 'resuelto'
@@ -2403,6 +2448,55 @@ def rescan_server():
     return jsonify({'ok': True, 'updated': updated})
 
 
+@admin_bp.get('/api/scan-metrics')
+@login_required
+def admin_scan_metrics():
+    """Telemetría de scans: serie por lote y desglose por servidor de la última ejecución."""
+    from scan_metrics import series
+    tipo = request.args.get('tipo', 'vod')
+    if tipo not in ('vod', 'live', 'curado'):
+        return jsonify({'error': 'tipo inválido'}), 400
+    days = min(max(request.args.get('days', 7, type=int), 1), 90)
+    return jsonify(series(current_app._get_current_object(), tipo, days=days))
+
+
+@admin_bp.get('/api/catalog-cache')
+@login_required
+def admin_catalog_cache():
+    """Tasa de aciertos y tamaño de la caché de respuestas del catálogo (este proceso)."""
+    import catalog_cache
+    return jsonify(catalog_cache.stats())
+
+
+@admin_bp.post('/api/catalog-cache/clear')
+@superadmin_required
+def admin_catalog_cache_clear():
+    """Invalida la caché del catálogo en todos los procesos."""
+    import catalog_cache
+    catalog_cache.bump('reset manual')
+    return jsonify({'ok': True, 'generation': catalog_cache.generation()})
+
+
+@admin_bp.get('/api/breakers')
+@login_required
+def admin_breakers():
+    """Servidores con el circuit breaker abierto o con fallos acumulados."""
+    import circuit_breaker
+    return jsonify(circuit_breaker.snapshot())
+
+
+@admin_bp.post('/api/breaker-reset')
+@superadmin_required
+def breaker_reset():
+    """Cierra a mano el circuit breaker de un servidor."""
+    import circuit_breaker
+    servidor = (request.get_json(silent=True) or {}).get('servidor', '').strip().lower()
+    if not servidor:
+        return jsonify({'ok': False, 'msg': 'Falta servidor.'})
+    circuit_breaker.reset(servidor)
+    return jsonify({'ok': True})
+
+
 # ── Acciones manuales Telegram ─────────────────────────────────
 
 @admin_bp.post('/api/telegram-send-digest')
@@ -2478,27 +2572,25 @@ def telegram_send_down():
 @admin_bp.post('/api/backup-create')
 @superadmin_api_required
 def backup_create():
-    """Crea un backup manual de la BD."""
-    try:
-        from backup import create_backup
-        path = create_backup(current_app._get_current_object())
-        return jsonify({'ok': True, 'msg': f'Backup creado: {path.name} ({path.stat().st_size // 1024} KB)'})
-    except Exception as e:
-        return jsonify({'ok': False, 'msg': str(e)})
+    """Crea un backup manual de la BD (en background: copiar la BD puede tardar)."""
+    enqueue(current_app._get_current_object(), 'backup')
+    return jsonify({'ok': True, 'msg': 'Backup en curso: aparecerá en "Ver backups" al terminar.'})
 
 
 @admin_bp.post('/api/backup-send')
 @superadmin_api_required
 def backup_send():
-    """Crea un backup y lo envía por Telegram."""
-    try:
-        from backup import create_backup, send_backup_telegram
-        app = current_app._get_current_object()
-        path = create_backup(app)
-        ok, msg = send_backup_telegram(app, path)
-        return jsonify({'ok': ok, 'msg': msg})
-    except Exception as e:
-        return jsonify({'ok': False, 'msg': str(e)})
+    """
+    Crea un backup y lo envía por Telegram (en background). Un bot sin
+    configurar se comprueba aquí; un envío fallido marca la tarea 'failed'.
+    """
+    from telegram_bot import _get_config
+    app = current_app._get_current_object()
+    token, chat_ids = _get_config(app)
+    if not token or not chat_ids:
+        return jsonify({'ok': False, 'msg': 'Bot no configurado o desactivado.'})
+    enqueue(app, 'backup', send_telegram=True)
+    return jsonify({'ok': True, 'msg': 'Backup en curso: se enviará por Telegram al terminar.'})
 
 
 @admin_bp.get('/api/backup-list')
@@ -2661,7 +2753,8 @@ def curado_buscar():
         Contenido.activo == True,
     )
     if q:
-        base_q = base_q.filter(Contenido.titulo.ilike(f'%{q}%'))
+        import search
+        base_q = search.apply(base_q, q, titulo_only=True, rank=True)
     if lista_id:
         base_q = base_q.filter(Contenido.lista_id == lista_id)
 
@@ -2741,6 +2834,15 @@ def curado_eliminar(cid):
     return redirect(url_for('admin.curado'))
 
 
+@admin_bp.post('/curado/scan')
+@superadmin_required
+def curado_scan():
+    """Lanza el scan de salud de los canales curados (reordena sus URLs)."""
+    enqueue(current_app._get_current_object(), 'scan_curado')
+    flash('Verificando URLs de los canales curados en segundo plano…', 'info')
+    return redirect(url_for('admin.curado'))
+
+
 @admin_bp.post('/curado/reordenar')
 @superadmin_required
 def curado_reordenar():
@@ -10,6 +10,8 @@ from flask import session as _session
 from models import db, Contenido, Lista, FuenteRSS, ChannelReport, WatchHistory, LiveScanConfig, LiveScanReport, XtreamConfig
 from sqlalchemy import or_, and_, nulls_last
 import requests
+import catalog_cache
+import serializers
 
 # ── Helpers de seguridad para proxies ───────────────────────────
 
@@ -17,29 +19,24 @@ def _is_private(url: str) -> bool:
     """
     Bloquea URLs que apunten a IPs privadas/locales (prevención de SSRF).
 
-    Solo bloquea si el hostname ES explícitamente localhost o una IP privada literal.
-    Para nombres de host externos (dplatino.net, etc.) NO hace DNS — permite la petición
-    y deja que requests.get() falle de forma segura si no puede conectar.
-    Razón: setdefaulttimeout() es global y no thread-safe; usarlo en un worker
-    gthread rompería todas las conexiones en curso.
+    Comprueba la IP literal o, para hostnames, las IPs a las que resuelve.
+    La resolución sale de dns_cache, la misma que usará requests.get() al
+    conectar: no hay consulta DNS extra ni ventana para DNS rebinding.
+    Si el host no resuelve se permite — requests.get() fallará de forma
+    segura al no poder conectar.
     """
+    import dns_cache
+    if current_app and current_app.config.get('PROXY_ALLOW_PRIVATE'):
+        return False
     try:
-        h = _urlparse(url).hostname or ''
-        # Bloquear hostnames claramente locales
-        if h in ('localhost', '127.0.0.1', '::1', '0.0.0.0', ''):
+        h = (_urlparse(url).hostname or '').lower()
+        if h in ('localhost', ''):
             return True
-        # Si es una IP literal, comprobar rango sin DNS (rápido y thread-safe)
-        if _re.match(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$', h):
-            try:
-                p = list(map(int, h.split('.')))
-                return (p[0] == 127 or p[0] == 10
-                        or (p[0] == 172 and 16 <= p[1] <= 31)
-                        or (p[0] == 192 and p[1] == 168)
-                        or (p[0] == 169 and p[1] == 254))
-            except ValueError:
-                return True  # IP malformada → bloquear
-        # Hostname externo (dplatino.net, somoseluno.blog, etc.) → permitir
-        return False
+        try:
+            ips = dns_cache.resolve_ips(h)
+        except _socket.gaierror:
+            return False
+        return any(dns_cache.is_private_ip(ip) for ip in ips)
     except Exception:
         return True  # URL malformada → bloquear
 
@@ -95,10 +92,12 @@ api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 # ── Helpers ────────────────────────────────────────────────────
 
-def paginate_query(query, page, per_page):
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+def paginate_query(query, page, per_page, live_state=True):
+    # Solo las columnas del dict: Rows ligeras en vez de objetos Contenido
+    pagination = serializers.project(query).paginate(page=page, per_page=per_page,
+                                                     error_out=False)
     return {
-        'items': [item.to_dict() for item in pagination.items],
+        'items': [serializers.contenido_dict(r, live_state) for r in pagination.items],
         'total': pagination.total,
         'page': pagination.page,
         'pages': pagination.pages,
@@ -106,54 +105,181 @@ def paginate_query(query, page, per_page):
     }
 
 
+# ── Paginación por cursor (keyset) ─────────────────────────────
+# paginate() hace COUNT(*) y OFFSET en cada página: el scroll infinito del
+# APK va más lento cuanto más baja. Con ?cursor= (vacío en la primera
+# petición) se pagina por la clave de orden + id: cada página es una
+# búsqueda por índice. El total se calcula una vez por generación del
+# catálogo (catalog_cache.memo). Sin ?cursor se mantiene el modo por página.
+
+# sort → [(atributo, descendente, valor en lugar de NULL)]; el id desempata.
+# fecha_agregado no tiene sustituto: es NOT NULL (_migrate_db rellena las
+# filas antiguas) y así el keyset usa los índices por fecha.
+_KEYSET_SORTS = {
+    'recent':    [('fecha_agregado', True, None), ('id', True, None)],
+    'year_desc': [('año', True, -1), ('fecha_agregado', True, None), ('id', True, None)],
+    'year_asc':  [('año', False, 9999), ('fecha_agregado', True, None), ('id', True, None)],
+    'title_asc': [('titulo', False, None), ('id', False, None)],
+}
+
+
+def _encode_cursor(data: dict) -> str:
+    import base64, json
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> dict | None:
+    import base64, json
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return data if isinstance(data, dict) else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _keyset_columns(sort: str) -> list:
+    from sqlalchemy import func
+    cols = []
+    for attr, desc, null_as in _KEYSET_SORTS[sort]:
+        col = getattr(Contenido, attr)
+        expr = func.coalesce(col, null_as) if null_as is not None else col
+        cols.append((attr, expr, desc, null_as))
+    return cols
+
+
+def keyset_query(query, sort: str, cursor: str, per_page: int, count_key: tuple,
+                 live_state: bool = True) -> dict:
+    """
+    Una página en modo cursor. `query` trae los filtros pero NO el orden.
+    Con sort='relevance' (rango del índice de texto, no es una columna) el
+    cursor lleva un offset: las búsquedas devuelven pocas filas.
+    """
+    from datetime import datetime
+
+    data = _decode_cursor(cursor) if cursor else {}
+    if data is None or (data and data.get('s') != sort):
+        return None
+
+    total = catalog_cache.memo('count', count_key, query.order_by(None).count)
+    query = serializers.project(query)
+
+    if sort not in _KEYSET_SORTS:
+        try:
+            offset = max(0, int(data.get('o', 0) or 0))
+        except (ValueError, TypeError):
+            return None
+        rows = query.offset(offset).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = _encode_cursor({'s': sort, 'o': offset + len(rows)}) if has_more else None
+        return {'items': [serializers.contenido_dict(r, live_state) for r in rows], 'total': total,
+                'per_page': per_page, 'has_more': has_more, 'next_cursor': next_cursor}
+
+    cols = _keyset_columns(sort)
+    values = data.get('v')
+    if values is not None:
+        if not isinstance(values, list) or len(values) != len(cols):
+            return None
+        # Solo escalares: NULL no se compara (expr < None) y una lista o un
+        # dict no es un valor de columna
+        if any(v is None or isinstance(v, bool) or not isinstance(v, (str, int, float))
+               for v in values):
+            return None
+        try:
+            values = [datetime.fromisoformat(v) if attr == 'fecha_agregado' and v else v
+                      for (attr, _, _, _), v in zip(cols, values)]
+        except (ValueError, TypeError):
+            return None
+        # Posición estrictamente posterior a la última fila servida:
+        # (a > va) OR (a = va AND b > vb) OR … con el sentido de cada columna
+        conds = []
+        for i, (_, expr, desc, _) in enumerate(cols):
+            prefix = [cols[j][1] == values[j] for j in range(i)]
+            conds.append(and_(*prefix, expr < values[i] if desc else expr > values[i]))
+        query = query.filter(or_(*conds))
+    for _, expr, desc, _ in cols:
+        query = query.order_by(expr.desc() if desc else expr.asc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        vals = []
+        for attr, _, _, null_as in cols:
+            v = getattr(last, attr)
+            if v is None:
+                v = null_as
+            vals.append(v.isoformat() if isinstance(v, datetime) else v)
+        next_cursor = _encode_cursor({'s': sort, 'v': vals})
+    return {'items': [serializers.contenido_dict(r, live_state) for r in rows], 'total': total,
+            'per_page': per_page, 'has_more': has_more, 'next_cursor': next_cursor}
+
+
+def _count_key(*extra) -> tuple:
+    """Clave del total cacheado: filtros de la petición (sin cursor/limit) y usuario."""
+    args = tuple(sorted((k, v) for k, v in request.args.items(multi=True)
+                        if k not in ('cursor', 'limit', 'page') and v.strip()))
+    return (request.endpoint, args, _session.get('user_id')) + extra
+
+
 def _build_visible_query():
     """
     Construye una query base de Contenido que respeta la visibilidad:
     - Contenido global (lista.visibilidad='global' o sin lista) → visible para todos
     - Contenido privado → solo visible para el propietario de la lista
-    El JOIN con Lista es LEFT OUTER para incluir contenido RSS (lista_id=NULL).
+    El ámbito va copiado en cada fila (visibility_scope / owner_id, ver
+    visibility.py): sin JOIN con Lista, los índices (activo, visibility_scope,
+    tipo, …) resuelven el filtro con un rango.
     """
-    user_id = _session.get('user_id')
-    q = (
-        Contenido.query
-        .filter_by(activo=True)
-        .outerjoin(Lista, Contenido.lista_id == Lista.id)
+    import visibility
+    return Contenido.query.filter(
+        Contenido.activo == True,
+        visibility.visible_filter(_session.get('user_id')),
     )
-    if user_id:
-        q = q.filter(
-            or_(
-                Contenido.lista_id.is_(None),            # contenido RSS
-                Lista.visibilidad == 'global',           # lista global
-                and_(
-                    Lista.owner_id == user_id,
-                    Lista.visibilidad == 'private',      # lista privada del usuario
-                ),
-            )
-        )
-    else:
-        q = q.filter(
-            or_(
-                Contenido.lista_id.is_(None),
-                Lista.visibilidad == 'global',
-            )
-        )
-    return q
+
+
+def _visible_by_ids(ids) -> dict:
+    """
+    {id: fila proyectada} de los contenidos activos y visibles de `ids`
+    (trending, recomendaciones). Busca por clave primaria y aplica la
+    visibilidad a las filas leídas: con el filtro en SQL, SQLite sin
+    ANALYZE prefiere el índice (activo, visibility_scope, …) y recorre
+    todo lo visible.
+    """
+    import visibility
+    user_id = _session.get('user_id')
+    ids = list(ids)
+    out = {}
+    for i in range(0, len(ids), 900):
+        q = serializers.project(Contenido.query.filter(Contenido.id.in_(ids[i:i + 900])))
+        for r in q.add_columns(Contenido.activo, Contenido.visibility_scope, Contenido.owner_id):
+            if r[-3] and visibility.is_visible(r[-2], r[-1], user_id):
+                out[r.id] = r
+    return out
 
 
 # ── Endpoints ──────────────────────────────────────────────────
 
 @api_bp.get('/contenido')
+@catalog_cache.conditional(max_age=60, per_user=True)
+@catalog_cache.cached(per_user=True, paged=True)
 def get_contenido():
     """
     Lista contenido con filtros opcionales.
-    Query params: tipo, genero, año, q (búsqueda), sort, page, limit
-    sort: recent (default) | year_desc | year_asc | title_asc
+    Query params: tipo, genero, año, q (búsqueda), sort, page, limit, cursor
+    sort: recent (default) | year_desc | year_asc | title_asc |
+          relevance (default con q: índice de texto, ver search.py)
+    cursor: modo keyset (vacío en la primera petición; luego next_cursor)
     """
+    import search
     tipo = request.args.get('tipo')           # 'pelicula' | 'serie'
     genero = request.args.get('genero', '')
     año = request.args.get('año', '')
     q = request.args.get('q', '').strip()
-    sort = request.args.get('sort', 'recent')
+    sort = request.args.get('sort', 'relevance' if q else 'recent')
     page = max(1, request.args.get('page', 1, type=int))
     per_page = min(
         request.args.get('limit', current_app.config['ITEMS_PER_PAGE'], type=int),
@@ -166,38 +292,42 @@ def get_contenido():
         query = query.filter(Contenido.tipo == tipo)
 
     if genero:
-        # ilike en ambos campos: SQLAlchemy genera lower(col) LIKE lower(pattern),
-        # lo que funciona con caracteres acentuados en SQLite porque lower() los deja
-        # igual en ambos lados (SQLite lower() solo convierte ASCII).
-        query = query.filter(
-            or_(
-                Contenido.genero.ilike(f'%{genero}%'),
-                Contenido.group_title.ilike(f'%{genero}%'),
-            )
-        )
+        # Índice de géneros normalizados (acentos y mayúsculas indiferentes);
+        # si el valor no es un género conocido, ILIKE sobre genero / group_title.
+        import genres
+        query = genres.filter_query(query, genero)
 
     if año and año.isdigit():
         query = query.filter_by(año=int(año))
 
     if q:
-        query = query.filter(
-            or_(
-                Contenido.titulo.ilike(f'%{q}%'),
-                Contenido.genero.ilike(f'%{q}%'),
-                Contenido.group_title.ilike(f'%{q}%'),
-            )
-        )
+        # Prefijo por palabra y sin acentos; con sort=relevance ordena por rango
+        query = search.apply(query, q, rank=(sort == 'relevance'))
 
     _sort_map = {
         'year_desc':  [nulls_last(Contenido.año.desc()),   Contenido.fecha_agregado.desc()],
         'year_asc':   [nulls_last(Contenido.año.asc()),    Contenido.fecha_agregado.desc()],
         'title_asc':  [Contenido.titulo.asc()],
         'recent':     [Contenido.fecha_agregado.desc()],
+        'relevance':  [Contenido.fecha_agregado.desc()],   # desempate tras el rango
     }
-    for col in _sort_map.get(sort, _sort_map['recent']):
+    if sort not in _sort_map:
+        sort = 'recent'
+
+    if 'cursor' in request.args:
+        if sort == 'relevance':
+            query = query.order_by(Contenido.fecha_agregado.desc(), Contenido.id.desc())
+        result = keyset_query(query, sort, request.args['cursor'].strip(), per_page,
+                              _count_key(sort), live_state=False)
+        if result is None:
+            return jsonify({'error': 'cursor inválido'}), 400
+        return serializers.json_response(result)
+
+    for col in _sort_map[sort]:
         query = query.order_by(col)
 
-    return jsonify(paginate_query(query, page, per_page))
+    # Cacheada: sin el índice activo de los canales live (ver serializers)
+    return serializers.json_response(paginate_query(query, page, per_page, live_state=False))
 
 
 @api_bp.get('/contenido/<int:item_id>')
@@ -230,74 +360,37 @@ def get_contenido_by_type(tipo):
         request.args.get('limit', current_app.config['ITEMS_PER_PAGE'], type=int),
         200,
     )
-    query = (
-        _build_visible_query()
-        .filter(Contenido.tipo == tipo)
-        .order_by(Contenido.fecha_agregado.desc())
-    )
-    return jsonify(paginate_query(query, page, per_page))
+    query = _build_visible_query().filter(Contenido.tipo == tipo)
+    if 'cursor' in request.args:
+        result = keyset_query(query, 'recent', request.args['cursor'].strip(), per_page,
+                              _count_key())
+        if result is None:
+            return jsonify({'error': 'cursor inválido'}), 400
+        return serializers.json_response(result)
+    query = query.order_by(Contenido.fecha_agregado.desc())
+    return serializers.json_response(paginate_query(query, page, per_page))
 
 
 @api_bp.get('/trending')
 def get_trending():
     """
-    Tendencias: contenido del último año (o los 2 más recientes si hay pocos),
-    selección aleatoria para que cambie en cada carga.
-    Series deduplicadas: una tarjeta por título base.
+    Tendencias: lo más visto recientemente (WatchHistory con decaimiento
+    temporal), precalculado por el scheduler en trending_items (ver
+    trending.py). Muestreo ponderado para que cambie en cada carga.
+    Series deduplicadas: una tarjeta por serie.
+    Query params: limit (max 50), tipo (pelicula | serie; por defecto ambos).
     """
-    import random as _random
+    import trending
     limit = min(request.args.get('limit', 20, type=int), 50)
+    tipo  = request.args.get('tipo', '').strip() or None
 
-    # Determinar el año de corte (último año con contenido)
-    from sqlalchemy import func as _func
-    max_year = (
-        db.session.query(_func.max(Contenido.año))
-        .filter(Contenido.activo == True, Contenido.tipo != 'live', Contenido.año.isnot(None))
-        .scalar()
-    ) or 0
-    # Incluir también el año anterior para tener suficiente variedad
-    min_year = max(max_year - 1, max_year)
-
-    candidates = (
-        Contenido.query
-        .filter(
-            Contenido.activo == True,
-            Contenido.tipo != 'live',
-            Contenido.año >= min_year,
-            Contenido.imagen.isnot(None),
-            Contenido.imagen != '',
-        )
-        .order_by(Contenido.año.desc(), Contenido.fecha_agregado.desc())
-        .limit(limit * 20)   # pool amplio para poder mezclar y deduplicar
-        .all()
-    )
-
-    # Si no hay suficientes con imagen en el último año, relajar el filtro
-    if len(candidates) < limit * 3:
-        candidates = (
-            Contenido.query
-            .filter(Contenido.activo == True, Contenido.tipo != 'live')
-            .order_by(Contenido.año.desc(), Contenido.fecha_agregado.desc())
-            .limit(limit * 20)
-            .all()
-        )
-
-    # Mezclar para que cada visita muestre un orden diferente
-    _random.shuffle(candidates)
-
-    seen_series: set = set()
-    result: list = []
-    for item in candidates:
-        if item.tipo == 'serie' or item.temporada is not None:
-            base = _get_base_title(item.titulo)
-            if base in seen_series:
-                continue
-            seen_series.add(base)
-        result.append(item)
-        if len(result) >= limit:
-            break
-
-    return jsonify([i.to_dict() for i in result])
+    ids = trending.sample(limit, tipo, _session.get('user_id'))
+    if not ids:
+        return jsonify([])
+    # El pool puede tener unos minutos: activo y visibilidad se comprueban aquí
+    by_id = _visible_by_ids(ids)
+    result = [serializers.contenido_dict(by_id[i]) for i in ids if i in by_id][:limit]
+    return serializers.json_response(result)
 
 
 def _clean_genre_text(text: str) -> str:
@@ -319,20 +412,11 @@ def _clean_genre_text(text: str) -> str:
 
 
 @api_bp.get('/generos')
+@catalog_cache.cached()
 def get_generos():
-    """Lista de géneros únicos disponibles."""
-    rows = db.session.query(Contenido.genero).filter(
-        Contenido.activo == True,
-        Contenido.genero != None,
-        Contenido.genero != '',
-    ).distinct().all()
-
-    generos = set()
-    for (g,) in rows:
-        for part in g.split(','):
-            cleaned = part.strip()
-            if cleaned:
-                generos.add(cleaned)
+    """Lista de géneros únicos disponibles (índice de géneros, ver genres.py)."""
+    import genres
+    generos = set(genres.menu())
 
     # Si hay muy pocos géneros, usar group_title como fallback
     # Solo de contenido NO-live (excluye grupos de canales de TV)
@@ -366,131 +450,65 @@ def get_generos():
 # ── Helper para extraer título base de serie ───────────────
 
 def _get_base_title(title: str) -> str:
-    """
-    Elimina info de temporada/episodio del título para agrupar series.
-    Maneja el formato IPTV habitual: "{título} S01 {título} - S01E52"
-    """
-    _EP_PATTERNS = [
-        r'\s+[Ss]\d{1,3}\s*[Ee]\d{1,3}.*$',           # S01E01, S01.E01, S01-E01
-        r'\s+\d{1,2}[xX]\d{1,3}.*$',                   # 1x01, 2x10
-        r'\s+[-–]\s*[Ss]eason\s*\d+.*$',                # - Season 1
-        r'\s+[-–]\s*[Tt]emporada\s*\d+.*$',             # - Temporada 1
-        r'\s+[Tt]\d+\s*[Ee]\d+.*$',                     # T1E01
-        r'\s+[-–:]\s*[Cc]ap[íi]tulo\s*\d+.*$',         # - Capitulo 1
-        r'\s+[-–:]\s*[Ee]p(?:isodio|isode)?\.?\s*\d+.*$',   # Episodio / Episode 1
-        # Limpieza del marcador de temporada suelto (formato IPTV: "Título S01 Título")
-        # Se aplica DESPUÉS de quitar el patrón SnnEmm para eliminar " S01 resto"
-        r'\s+[Ss]\d{1,2}\b.*$',                         # S01 ... al final
-        r'\s+[-–:]\s*\d+$',                              # número suelto al final
-    ]
-    result = title.strip()
-    for p in _EP_PATTERNS:
-        new = _re.sub(p, '', result, flags=_re.IGNORECASE).strip(' -–:')
-        if new:
-            result = new
-    return result or title.strip()
+    """Título base de serie (sin temporada/episodio); ver series_index.base_title."""
+    from series_index import base_title
+    return base_title(title)
 
 
 @api_bp.get('/series-agrupadas')
+@catalog_cache.conditional(max_age=300)
 def get_series_agrupadas():
     """
     Series agrupadas por título base (un ítem por serie).
     Devuelve: título, imagen, año, géneros, nº temporadas, nº episodios.
+    Lee la tabla materializada `series` (series_index.py): ordenación y
+    paginación en SQL sobre sus índices.
     """
+    from models import Serie
     page     = max(1, request.args.get('page', 1, type=int))
     per_page = min(request.args.get('limit', 24, type=int), 100)
     q        = request.args.get('q', '').strip()
     genero   = request.args.get('genero', '').strip()
     sort     = request.args.get('sort', 'title_asc')
 
-    # Incluir tipo='serie', items 'live' con temporada (series mal clasificadas por el
-    # parser antiguo) Y tipo='pelicula' con temporada (importados antes del tipos_override)
-    base_q = Contenido.query.filter(
-        Contenido.activo == True,
-        or_(
-            Contenido.tipo == 'serie',
-            and_(
-                Contenido.tipo == 'live',
-                Contenido.temporada != None,   # tiene S01E01 → es serie, no canal
-            ),
-            and_(
-                Contenido.tipo == 'pelicula',
-                Contenido.temporada != None,   # importado antes del tipos_override
-            ),
-        ),
-    )
+    base_q = Serie.query
     if q:
-        base_q = base_q.filter(Contenido.titulo.ilike(f'%{q}%'))
+        # Búsqueda sobre los títulos de los episodios → sus series
+        import search
+        eps = db.session.query(Contenido.serie_key).filter(
+            Contenido.serie_key.isnot(None), Contenido.activo == True)
+        eps = search.apply(eps, q, titulo_only=True)
+        base_q = base_q.filter(Serie.serie_key.in_(eps.scalar_subquery()))
     if genero:
-        base_q = base_q.filter(
-            or_(Contenido.genero.ilike(f'%{genero}%'),
-                Contenido.group_title.ilike(f'%{genero}%'))
-        )
-
-    all_eps = base_q.all()
-
-    groups: dict = {}
-    for ep in all_eps:
-        base = _get_base_title(ep.titulo)
-        if base not in groups:
-            groups[base] = {
-                'first_id':   ep.id,
-                'image':      ep.imagen or '',
-                'year':       ep.año,
-                'genres':     [],
-                'seasons':    set(),
-                'ep_count':   0,
-                'group_title': ep.group_title or '',
-                'added_at':   ep.fecha_agregado,
-                'source':     ep.fuente,
-            }
-        g = groups[base]
-        g['ep_count'] += 1
-        if ep.temporada:
-            g['seasons'].add(ep.temporada)
-        if ep.imagen and not g['image']:
-            g['image'] = ep.imagen
-        if ep.año and not g['year']:
-            g['year'] = ep.año
-        if ep.genero and not g['genres']:
-            g['genres'] = [x.strip() for x in ep.genero.split(',') if x.strip()]
-        if ep.fecha_agregado and (
-            not g['added_at'] or ep.fecha_agregado > g['added_at']
-        ):
-            g['added_at'] = ep.fecha_agregado
-
-    series_list = []
-    for base_title, data in groups.items():
-        series_list.append({
-            'id':           data['first_id'],
-            'title':        base_title,
-            'type':         'series',
-            'source':       data['source'],
-            'streamUrl':    '',
-            'image':        data['image'],
-            'year':         data['year'],
-            'genres':       data['genres'],
-            'seasonCount':  len(data['seasons']) or 1,
-            'episodeCount': data['ep_count'],
-            'groupTitle':   data['group_title'],
-            'addedAt':      data['added_at'].isoformat() if data['added_at'] else None,
-        })
+        import genres
+        genre_ids = genres.matching_ids(genero)
+        if genre_ids:
+            # Series con algún episodio activo de ese género
+            eps = db.session.query(Contenido.serie_key).filter(
+                Contenido.id.in_(genres.contenido_ids(genre_ids)),
+                Contenido.serie_key.isnot(None), Contenido.activo == True)
+            base_q = base_q.filter(Serie.serie_key.in_(eps.scalar_subquery()))
+        else:
+            base_q = base_q.filter(
+                or_(Serie.genero.ilike(f'%{genero}%'),
+                    Serie.group_title.ilike(f'%{genero}%'))
+            )
 
     if sort == 'recent':
-        series_list.sort(key=lambda x: x.get('addedAt') or '', reverse=True)
+        order = [nulls_last(Serie.added_at.desc()), Serie.first_id]
     elif sort == 'year_desc':
-        series_list.sort(key=lambda x: (x.get('year') or 0), reverse=True)
+        order = [nulls_last(Serie.año.desc()), Serie.first_id]
     elif sort == 'year_asc':
-        series_list.sort(key=lambda x: (x.get('year') or 9999))
+        order = [nulls_last(Serie.año.asc()), Serie.first_id]
     else:
-        series_list.sort(key=lambda x: x['title'].lower())
+        order = [Serie.titulo_orden, Serie.first_id]
 
-    total = len(series_list)
-    start = (page - 1) * per_page
-    items = series_list[start:start + per_page]
+    total = base_q.order_by(None).count()
+    items = (base_q.order_by(*order)
+             .offset((page - 1) * per_page).limit(per_page).all())
 
     return jsonify({
-        'items':    items,
+        'items':    [s.to_dict() for s in items],
         'total':    total,
         'page':     page,
         'pages':    max(1, (total + per_page - 1) // per_page),
@@ -499,54 +517,85 @@ def get_series_agrupadas():
 
 
 def _normalize_live_base(title: str) -> str:
-    """
-    Strip quality/variant suffixes so duplicate live channels can be grouped.
-    Examples:
-      "DAZN FHD 1"  → "DAZN"      "DAZN HD 2"   → "DAZN"
-      "ESPN 2 HD"   → "ESPN 2"     "La 1 HD"     → "La 1"
-      "Telecinco HD"→ "Telecinco"
-    """
-    quality = r'(?:FULL\s?HD|FHD|UHD|4K|2K|1080[pP]?|720[pP]?|480[pP]?|360[pP]?|HD\+?|SD|HQ|LQ)'
-    t = title.strip()
-    for _ in range(3):
-        prev = t
-        # "[base] [quality] [optional 1-2 digit number]"  →  "[base]"
-        t = _re.sub(rf'\s+{quality}(?:\s+\d{{1,2}})?\s*$', '', t, flags=_re.IGNORECASE).strip()
-        # "[base] [1-2 digit number] [quality]"  →  "[base]"
-        t = _re.sub(rf'\s+\d{{1,2}}\s+{quality}\s*$', '', t, flags=_re.IGNORECASE).strip()
-        if t == prev or not t:
-            break
-    return t or title.strip()
+    """Nombre base del canal (sin sufijos de calidad/variante): ver live_groups.py."""
+    import live_groups
+    return live_groups.base_name(title)
 
 
 @api_bp.get('/live-agrupados')
+@catalog_cache.conditional(max_age=60, per_user=True)
+@catalog_cache.cached(per_user=True)
 def get_live_agrupados():
     """
     Canales en directo agrupados por nombre base (elimina sufijos de calidad/variante).
     Devuelve cada grupo con sus canales internos para mostrar un selector de calidad.
+    Query params: q, categoria, lista_id y opcionalmente
+      page, limit  paginado por grupos → {items, total, page, pages, per_page}
+                   (sin page: la lista completa como array, como siempre; la
+                   web ya manda limit y espera el array)
+      compact=1    cada grupo lleva channelIds en vez de los canales completos
+    El nombre base viene precalculado en Contenido.live_group_key. Cacheada:
+    los canales salen con su URL 0 (orden del scan), sin el índice activo
+    que mueven report-down / set-server.
     """
     q         = request.args.get('q', '').strip()
     categoria = request.args.get('categoria', '').strip()
     lista_id  = request.args.get('lista_id', type=int)
+    paged     = 'page' in request.args
+    page      = max(1, request.args.get('page', 1, type=int))
+    per_page  = max(1, min(request.args.get('limit', 100, type=int), 200))
+    compact   = request.args.get('compact', '') in ('1', 'true')
 
     base_q = _build_visible_query().filter(
         Contenido.tipo == 'live',
         Contenido.temporada == None,   # excluir live con S01E01 (son series)
     )
     if q:
-        base_q = base_q.filter(Contenido.titulo.ilike(f'%{q}%'))
+        import search
+        base_q = search.apply(base_q, q, titulo_only=True)
     if categoria:
         base_q = base_q.filter(Contenido.group_title.ilike(f'%{categoria}%'))
     if lista_id:
         base_q = base_q.filter(Contenido.lista_id == lista_id)
 
-    channels = base_q.order_by(Contenido.titulo.asc()).all()
+    total = None
+    if paged:
+        # Página de grupos: claves distintas por el índice (tipo, live_group_key),
+        # ordenadas como la lista completa; luego solo los canales de esas claves
+        keys = {r[0] for r in base_q.with_entities(Contenido.live_group_key).distinct() if r[0]}
+        # Canales sin clave todavía (altas fuera de los imports, hasta el
+        # reconcile): clave al vuelo, como en la lista completa
+        unkeyed: dict = {}
+        for cid, titulo in (base_q.filter(Contenido.live_group_key.is_(None))
+                            .with_entities(Contenido.id, Contenido.titulo)):
+            unkeyed.setdefault(_normalize_live_base(titulo), []).append(cid)
+        keys = sorted(keys | unkeyed.keys(), key=lambda k: (k.lower(), k))
+        total = len(keys)
+        page_keys = keys[(page - 1) * per_page:page * per_page]   # ≤ 200: un solo IN
+        channels = (
+            serializers.project(base_q.filter(Contenido.live_group_key.in_(page_keys)))
+            .add_columns(Contenido.live_group_key)
+            .all()
+        ) if page_keys else []
+        unkeyed_ids = [cid for k in page_keys for cid in unkeyed.get(k, ())]
+        for i in range(0, len(unkeyed_ids), 900):
+            channels += (
+                serializers.project(base_q.filter(Contenido.id.in_(unkeyed_ids[i:i + 900])))
+                .add_columns(Contenido.live_group_key)
+                .all()
+            )
+        channels.sort(key=lambda ch: ch.titulo or '')
+    else:
+        channels = (serializers.project(base_q).add_columns(Contenido.live_group_key)
+                    .order_by(Contenido.titulo.asc()).all())
 
     groups: dict = {}
     for ch in channels:
-        base = _normalize_live_base(ch.titulo)
-        if base not in groups:
-            groups[base] = {
+        # Canal sin clave todavía (anterior a la columna): se calcula al vuelo
+        base = ch.live_group_key or _normalize_live_base(ch.titulo)
+        g = groups.get(base)
+        if g is None:
+            g = groups[base] = {
                 'first_id':    ch.id,
                 'image':       ch.imagen or '',
                 'genres':      [],
@@ -554,16 +603,21 @@ def get_live_agrupados():
                 'channels':    [],
                 'source':      ch.fuente,
             }
-        g = groups[base]
-        g['channels'].append(ch.to_dict())
+        g['channels'].append(ch)
         if ch.imagen and not g['image']:
             g['image'] = ch.imagen
         if ch.genero and not g['genres']:
             g['genres'] = [x.strip() for x in ch.genero.split(',') if x.strip()]
 
     result = []
-    for base_title, data in sorted(groups.items(), key=lambda x: x[0].lower()):
-        best_ch = data['channels'][0]
+    for base_title, data in sorted(groups.items(), key=lambda x: (x[0].lower(), x[0])):
+        if compact:
+            best_ch = serializers.contenido_dict(data['channels'][0], live_state=False)
+            channels_out = {'channelIds': [ch.id for ch in data['channels']]}
+        else:
+            dicts = [serializers.contenido_dict(ch, live_state=False) for ch in data['channels']]
+            best_ch = dicts[0]
+            channels_out = {'channels': dicts}
         result.append({
             'id':           data['first_id'],
             'title':        base_title,
@@ -575,13 +629,22 @@ def get_live_agrupados():
             'genres':       data['genres'],
             'groupTitle':   data['group_title'],
             'channelCount': len(data['channels']),
-            'channels':     data['channels'],
+            **channels_out,
         })
 
-    return jsonify(result)
+    if total is None:
+        return serializers.json_response(result)
+    return serializers.json_response({
+        'items':    result,
+        'total':    total,
+        'page':     page,
+        'pages':    max(1, (total + per_page - 1) // per_page),
+        'per_page': per_page,
+    })
 
 
 @api_bp.get('/live-categorias')
+@catalog_cache.cached()
 def get_live_categorias():
     """
     Categorías de canales en directo.
@@ -591,13 +654,12 @@ def get_live_categorias():
     lista_id = request.args.get('lista_id', type=int)
     q = (
         db.session.query(Contenido.group_title)
-        .outerjoin(Lista, Contenido.lista_id == Lista.id)
         .filter(
             Contenido.activo == True,
+            Contenido.visibility_scope == 'global',
             Contenido.tipo == 'live',
             Contenido.group_title != None,
             Contenido.group_title != '',
-            or_(Contenido.lista_id.is_(None), Lista.visibilidad == 'global'),
         )
     )
     if lista_id:
@@ -609,6 +671,7 @@ def get_live_categorias():
 
 
 @api_bp.get('/live-listas')
+@catalog_cache.cached()
 def get_live_listas():
     """Listas M3U que contienen al menos un canal en directo activo."""
     rows = (
@@ -629,32 +692,29 @@ def get_live_listas():
 
 @api_bp.get('/serie-episodios')
 def get_serie_episodios():
-    """Devuelve todos los episodios de una serie dado su título base."""
+    """
+    Devuelve todos los episodios de una serie dado su título base.
+    Búsqueda por el índice (serie_key, temporada, episodio).
+    """
+    from sqlalchemy import func
+    from series_index import episode_filter
     titulo = request.args.get('titulo', '').strip()
     if not titulo:
         return jsonify([])
 
     # Igual que series-agrupadas: incluir 'serie', 'live' con temporada y 'pelicula' con temporada
-    all_eps = Contenido.query.filter(
-        Contenido.activo == True,
-        or_(
-            Contenido.tipo == 'serie',
-            and_(
-                Contenido.tipo == 'live',
-                Contenido.temporada != None,
-            ),
-            and_(
-                Contenido.tipo == 'pelicula',
-                Contenido.temporada != None,
-            ),
-        ),
+    eps = serializers.project(
+        Contenido.query
+        .filter(Contenido.serie_key == titulo[:300], Contenido.activo == True,
+                episode_filter())
+        .order_by(func.coalesce(Contenido.temporada, 99),
+                  func.coalesce(Contenido.episodio, 99), Contenido.id)
     ).all()
-    episodes = [ep.to_dict() for ep in all_eps if _get_base_title(ep.titulo) == titulo]
-    episodes.sort(key=lambda x: (x.get('season') or 99, x.get('episode') or 99))
-    return jsonify(episodes)
+    return serializers.json_response([serializers.contenido_dict(ep) for ep in eps])
 
 
 @api_bp.get('/anos')
+@catalog_cache.cached()
 def get_años():
     """Lista de años disponibles (para filtros)."""
     rows = db.session.query(Contenido.año).filter(
@@ -696,6 +756,43 @@ def stream_config():
     return jsonify({'stream_mode': cfg.stream_mode if cfg else 'direct'})
 
 
+def _breaker_blocked(url: str, endpoint: str):
+    """
+    Si el circuit breaker del servidor de `url` está abierto, devuelve la
+    respuesta a dar sin tocar el servidor: redirección a una URL de backup
+    del mismo canal (live_urls_json) en un servidor sano, o 503 con
+    Retry-After. None si la petición puede seguir.
+    """
+    import circuit_breaker
+    from m3u_parser import url_hash
+    host = circuit_breaker.host_of(url)
+    if circuit_breaker.allow(host):
+        return None
+
+    c = (db.session.query(Contenido.live_urls_json)
+         .filter(Contenido.url_hash == url_hash(url)).first())
+    if c and c.live_urls_json:
+        import json as _json
+        try:
+            backups = _json.loads(c.live_urls_json) or []
+        except (ValueError, TypeError):
+            backups = []
+        for alt in backups:
+            if (isinstance(alt, str) and alt.strip() != url
+                    and not circuit_breaker.is_open(circuit_breaker.host_of(alt))):
+                target = request.host_url.rstrip('/') + f'/api/{endpoint}?url={_quote(alt.strip(), safe="")}'
+                return Response('', status=307, headers={
+                    'Location': target, 'X-Breaker': 'open; backup',
+                    'Access-Control-Allow-Origin': '*',
+                })
+
+    return Response('', status=503, headers={
+        'Retry-After': str(max(1, circuit_breaker.retry_after(host))),
+        'X-Breaker': 'open',
+        'Access-Control-Allow-Origin': '*',
+    })
+
+
 @api_bp.get('/stream-proxy')
 def stream_proxy():
     """
@@ -717,6 +814,15 @@ def stream_proxy():
     if _clean_path != _parsed.path:
         url = _parsed._replace(path=_clean_path).geturl()
 
+    # Servidor caído según el circuit breaker → backup o 503 inmediato
+    import circuit_breaker
+    _blocked = _breaker_blocked(url, 'stream-proxy')
+    if _blocked is not None:
+        return _blocked
+    _host = circuit_breaker.host_of(url)
+    # En half-open solo se hace la petición de prueba, sin reintentos
+    _attempts = 3 if circuit_breaker.state(_host) == 'closed' else 1
+
     hdrs = {**_PROXY_UA}
     # Referer = origen del servidor IPTV; valida sesión de segmentos HLS (/hlsr/)
     _p = _urlparse(url)
@@ -748,7 +854,7 @@ def stream_proxy():
     import time as _time
     up = None
     last_exc = None
-    for _attempt in range(3):
+    for _attempt in range(_attempts):
         try:
             up = requests.get(url, stream=True, headers=hdrs, timeout=(8, 20),
                               proxies={}, allow_redirects=True)
@@ -756,26 +862,29 @@ def stream_proxy():
                 break
             up.close()
             up = None
-            if _attempt < 2:
+            if _attempt < _attempts - 1:
                 _time.sleep(0.4)
         except requests.exceptions.Timeout as exc:
             last_exc = exc
             up = None
-            if _attempt < 2:
+            if _attempt < _attempts - 1:
                 _time.sleep(0.4)
         except Exception as exc:
             last_exc = exc
             up = None
-            if _attempt < 2:
+            if _attempt < _attempts - 1:
                 _time.sleep(0.3)
 
     if up is None:
+        circuit_breaker.record_failure(_host, 'proxy: timeout' if isinstance(
+            last_exc, requests.exceptions.Timeout) else 'proxy: conexión/5xx')
         return ('', 504) if isinstance(last_exc, requests.exceptions.Timeout) else ('', 502)
 
     _server_ct = up.headers.get('Content-Type', '')
     # Si el servidor IPTV devuelve Content-Type texto → es página de error, no video
     if 'text/html' in _server_ct or 'text/plain' in _server_ct or 'text/xml' in _server_ct:
         up.close()
+        circuit_breaker.record_failure(_host, 'proxy: página de error')
         return '', 502
 
     ct = _content_type_for_url(url, _server_ct)
@@ -813,6 +922,7 @@ def stream_proxy():
 
     if _first_chunk is None:
         up.close()
+        circuit_breaker.record_failure(_host, 'proxy: respuesta vacía')
         return '', 502
 
     # Detectar cualquier respuesta de texto (HTML, JSON, plain text) disfrazada de video.
@@ -820,8 +930,13 @@ def stream_proxy():
     _tip = _first_chunk.lstrip()
     if _tip and _tip[0:1] in (b'<', b'{', b'['):
         up.close()
+        circuit_breaker.record_failure(_host, 'proxy: página de error')
         return '', 502
 
+    # 4xx (canal concreto bloqueado o inexistente) no dice nada del servidor
+    if up.status_code < 400:
+        circuit_breaker.record_success(_host)
+
     def _gen():
         try:
             yield _first_chunk
@@ -855,6 +970,13 @@ def hls_proxy():
     if _hc != _hp.path:
         url = _hp._replace(path=_hc).geturl()
 
+    import circuit_breaker
+    _blocked = _breaker_blocked(url, 'hls-proxy')
+    if _blocked is not None:
+        return _blocked
+    _host = circuit_breaker.host_of(url)
+    _attempts = 3 if circuit_breaker.state(_host) == 'closed' else 1
+
     try:
         import time as _time
         parsed    = _urlparse(url)
@@ -864,26 +986,30 @@ def hls_proxy():
         }
         resp = None
         last_exc = None
-        for _att in range(3):
+        for _att in range(_attempts):
             try:
                 resp = requests.get(url, headers=mfst_hdrs, timeout=12,
                                     proxies={}, allow_redirects=True)
                 if resp.status_code < 500:
                     break
                 resp = None
-                if _att < 2:
+                if _att < _attempts - 1:
                     _time.sleep(0.3)
             except requests.exceptions.Timeout as _e:
                 last_exc = _e
                 resp = None
-                if _att < 2:
+                if _att < _attempts - 1:
                     _time.sleep(0.2)
             except Exception as _e:
                 last_exc = _e
                 resp = None
                 break
         if resp is None:
+            circuit_breaker.record_failure(_host, 'hls: timeout' if isinstance(
+                last_exc, requests.exceptions.Timeout) else 'hls: conexión/5xx')
             return ('', 504) if isinstance(last_exc, requests.exceptions.Timeout) else ('', 502)
+        if resp.status_code < 400:
+            circuit_breaker.record_success(_host)
         if resp.status_code >= 400:
             # Propagar el status code real del proveedor (403, 404, etc.)
             return '', (resp.status_code if resp.status_code < 500 else 502)
@@ -1156,12 +1282,15 @@ def og_image():
 
 
 @api_bp.get('/stats')
+@catalog_cache.cached()
 def get_stats():
     """Estadísticas básicas (usadas en el frontend y admin)."""
-    total_peliculas = Contenido.query.filter_by(tipo='pelicula', activo=True).count()
-    total_series = Contenido.query.filter_by(tipo='serie', activo=True).count()
-    total_live = Contenido.query.filter_by(tipo='live', activo=True).count()
-    total_inactivos = Contenido.query.filter_by(activo=False).count()
+    import catalog_counters
+    counters = catalog_counters.snapshot()
+    total_peliculas = catalog_counters.count(counters, tipo='pelicula', activo=True)
+    total_series = catalog_counters.count(counters, tipo='serie', activo=True)
+    total_live = catalog_counters.count(counters, tipo='live', activo=True)
+    total_inactivos = catalog_counters.count(counters, activo=False)
     total_listas = Lista.query.filter_by(activa=True).count()
 
     return jsonify({
@@ -1219,6 +1348,11 @@ def record_watch():
         )
         db.session.add(w)
         db.session.commit()
+        # Perfil de gustos incremental (lo que lee /api/recomendaciones)
+        import genres
+        import taste_profiles
+        taste_profiles.record(session_key, user_id, item.id,
+                              genres.genres_of([item.id]).get(item.id, []))
 
     return jsonify({'ok': True})
 
@@ -1235,13 +1369,13 @@ def get_recomendaciones():
                      (si se indica, devuelve items del mismo género/tipo)
 
     Algoritmo:
-      1. Recuperar los últimos 30 items vistos por esta sesión
-      2. Construir perfil de géneros ponderado (más reciente = más peso)
+      1. Leer el perfil de gustos de la sesión / usuario (taste_profiles:
+         pesos por género con decaimiento y vistos recientes)
+      2. Sumar los géneros del item de contexto, si lo hay
       3. Puntuar todos los items activos por overlap de géneros
       4. Excluir los ya vistos recientemente
       5. Devolver top N mezclado con algo de aleatoriedad (no siempre el mismo orden)
     """
-    import random as _rand
     session_key = request.args.get('session_key', '').strip()[:64]
     limit       = min(request.args.get('limit', 20, type=int), 60)
     context_id  = request.args.get('context_id', type=int)
@@ -1252,32 +1386,21 @@ def get_recomendaciones():
     if context_id:
         context_item = Contenido.query.filter_by(id=context_id, activo=True).first()
 
-    genre_weights: dict[str, float] = {}
-    watched_ids: set[int] = set()
-
-    if session_key:
-        recent = (
-            WatchHistory.query
-            .filter_by(session_key=session_key)
-            .order_by(WatchHistory.played_at.desc())
-            .limit(50)
-            .all()
-        )
-        for i, w in enumerate(recent):
-            watched_ids.add(w.contenido_id)
-            decay = 1.0 / (i + 1)   # más reciente = más peso
-            genres = [g.strip() for g in (w.genres_snapshot or '').split(',') if g.strip()]
-            for g in genres:
-                genre_weights[g] = genre_weights.get(g, 0) + decay
+    # Perfil incremental (taste_profiles): pesos por género y vistos
+    # recientes, sin releer WatchHistory
+    import genres
+    import taste_profiles
+    profile = taste_profiles.get(session_key, _session.get('user_id'))
+    weights_by_gid: dict[int, float] = dict(profile['weights'])
+    watched_ids: set[int] = set(profile['recent'])
 
     # Si hay item de contexto, sus géneros dominan
     if context_item:
-        ctx_genres = [g.strip() for g in (context_item.genero or '').split(',') if g.strip()]
-        for g in ctx_genres:
-            genre_weights[g] = genre_weights.get(g, 0) + 5.0   # boost fuerte
+        for g in genres.genres_of([context_item.id]).get(context_item.id, []):
+            weights_by_gid[g] = weights_by_gid.get(g, 0) + 5.0   # boost fuerte
 
     # Sin perfil ni contexto → devolver trending normal
-    if not genre_weights:
+    if not weights_by_gid:
         import random as _r
         candidates = (
             Contenido.query
@@ -1294,7 +1417,60 @@ def get_recomendaciones():
         _r.shuffle(candidates)
         return jsonify([c.to_dict() for c in candidates[:limit]])
 
-    # ── 2. Candidatos: todo el contenido activo no visto ───
+    # ── 2. Ranking ─────────────────────────────────────────
+    # Con NumPy se puntúa todo el catálogo en memoria (reco_matrix); si no,
+    # el pool SQL.
+    import reco_matrix
+    top_gids = sorted(weights_by_gid, key=weights_by_gid.get, reverse=True)[:3]
+    ranked = reco_matrix.rank(
+        weights_by_gid,
+        user_id=_session.get('user_id'),
+        exclude=watched_ids,
+        tipo=context_item.tipo if context_item else None,
+        n=limit * 10,
+    )
+    if ranked is None:
+        ranked = _rank_pool(weights_by_gid, watched_ids, context_item)
+
+    # ── 3. Diversificar: no más de 4 items del mismo género ─
+    genre_quota: dict = {}
+    result_ids: list[int] = []
+    for cid, main_genre in ranked:
+        if len(result_ids) >= limit:
+            break
+        if genre_quota.get(main_genre, 0) >= 4:
+            continue
+        genre_quota[main_genre] = genre_quota.get(main_genre, 0) + 1
+        result_ids.append(cid)
+
+    # Rellenar si quedan huecos
+    if len(result_ids) < limit:
+        seen_ids = set(result_ids)
+        for cid, _ in ranked:
+            if len(result_ids) >= limit:
+                break
+            if cid not in seen_ids:
+                result_ids.append(cid)
+
+    # ── 4. Serializar en el orden elegido ──────────────────
+    # (la matriz puede tener unos minutos: activo y visibilidad se comprueban aquí)
+    by_id = _visible_by_ids(result_ids)
+
+    return jsonify({
+        'items':       [serializers.contenido_dict(by_id[i]) for i in result_ids if i in by_id],
+        'top_genres':  genres.names(top_gids),
+        'context':     context_item.to_dict() if context_item else None,
+    })
+
+
+def _rank_pool(weights_by_gid: dict, watched_ids: set, context_item) -> list:
+    """
+    Ranking sin reco_matrix (sin NumPy o RECO_MATRIX=0): pool SQL de hasta
+    2000 candidatos preseleccionados por género, puntuados en Python.
+    Devuelve [(contenido_id, genero_principal)] de mayor a menor score.
+    """
+    import random as _rand
+    import genres
     base_q = _build_visible_query().filter(
         Contenido.tipo != 'live',
     )
@@ -1302,17 +1478,18 @@ def get_recomendaciones():
         base_q = base_q.filter(Contenido.id.notin_(list(watched_ids)[:500]))
     if context_item:
         base_q = base_q.filter(Contenido.tipo == context_item.tipo)
+    if weights_by_gid:
+        top_gids = sorted(weights_by_gid, key=weights_by_gid.get, reverse=True)[:10]
+        base_q = base_q.filter(Contenido.id.in_(genres.contenido_ids(top_gids)))
 
-    pool = base_q.limit(2000).all()
-
-    # ── 3. Puntuar candidatos ──────────────────────────────
-    top_genres = sorted(genre_weights, key=genre_weights.get, reverse=True)[:5]
+    pool = base_q.with_entities(Contenido.id, Contenido.imagen).limit(2000).all()
+    pool_genres = genres.genres_of(r.id for r in pool)
 
-    def _score(item: Contenido) -> float:
-        if not item.genero:
+    def _score(item) -> float:
+        item_genres = pool_genres.get(item.id)
+        if not item_genres:
             return 0.0
-        item_genres = {g.strip() for g in item.genero.split(',') if g.strip()}
-        score = sum(genre_weights.get(g, 0) for g in item_genres)
+        score = sum(weights_by_gid.get(g, 0) for g in item_genres)
         # Pequeño boost por imagen disponible (mejor experiencia visual)
         if item.imagen:
             score += 0.3
@@ -1321,33 +1498,7 @@ def get_recomendaciones():
         return score
 
     ranked = sorted(pool, key=_score, reverse=True)
-
-    # ── 4. Diversificar: no más de 3 items del mismo género ─
-    genre_quota: dict[str, int] = {}
-    result: list[Contenido] = []
-    for item in ranked:
-        if len(result) >= limit:
-            break
-        main_genre = (item.genero or '').split(',')[0].strip()
-        if genre_quota.get(main_genre, 0) >= 4:
-            continue
-        genre_quota[main_genre] = genre_quota.get(main_genre, 0) + 1
-        result.append(item)
-
-    # Rellenar si quedan huecos
-    if len(result) < limit:
-        seen_ids = {i.id for i in result}
-        for item in ranked:
-            if len(result) >= limit:
-                break
-            if item.id not in seen_ids:
-                result.append(item)
-
-    return jsonify({
-        'items':       [i.to_dict() for i in result],
-        'top_genres':  top_genres[:3],
-        'context':     context_item.to_dict() if context_item else None,
-    })
+    return [(r.id, (pool_genres.get(r.id) or [None])[0]) for r in ranked]
 
 
 # ── Reportes de canales ────────────────────────────────────
@@ -1375,6 +1526,10 @@ def reportar_canal(contenido_id):
     report = ChannelReport(contenido_id=contenido_id, ip_address=ip)
     db.session.add(report)
     db.session.commit()
+
+    # Un reporte es una señal débil contra el servidor (medio fallo)
+    import circuit_breaker
+    circuit_breaker.record_failure(circuit_breaker.host_of(c.url_stream or ''), 'reporte', weight=0.5)
     return jsonify({'ok': True})
 
 
@@ -1462,6 +1617,8 @@ def report_live_down(channel_id):
         break
 
     if next_idx is not None:
+        # Estado por reporte: no invalida la caché (los listados cacheados
+        # no llevan live_active_idx, ver serializers.contenido_dict)
         channel.live_active_idx = next_idx
         db.session.commit()
         return jsonify({'next_url': urls[next_idx], 'channel_still_alive': True})
@@ -1501,6 +1658,8 @@ def add_live_url(channel_id):
     urls.append(new_url)
     channel.live_urls_json = _json.dumps(urls)
     db.session.commit()
+    # Endpoint público: bump agrupado para que no se pueda vaciar la caché en bucle
+    catalog_cache.bump_coalesced('live add-url')
     return jsonify({'ok': True, 'urls': urls})
 
 
@@ -1523,14 +1682,8 @@ def get_live_scan_reports():
 @api_bp.post('/live/scan/run')
 def run_live_scan_now():
     """Lanza el escaneo de canales en directo de forma inmediata (manual)."""
-    import threading
-
-    def _run():
-        from link_checker import scan_live_channels
-        scan_live_channels(current_app._get_current_object())
-
-    t = threading.Thread(target=_run, daemon=True)
-    t.start()
+    from tasks import enqueue
+    enqueue(current_app._get_current_object(), 'scan_live')
     return jsonify({'ok': True, 'message': 'Escaneo iniciado en background'})
 
 
@@ -1561,9 +1714,13 @@ def set_live_server(channel_id):
     if idx < 0 or idx >= len(urls):
         return jsonify({'error': f'index fuera de rango (0-{len(urls)-1})'}), 400
 
+    was_active = channel.activo
     channel.live_active_idx = idx
     channel.activo = True
     db.session.commit()
+    if not was_active:
+        # Reactivar un canal cambia los listados; el índice elegido no (por reporte)
+        catalog_cache.bump_coalesced('live set-server')
 
     return jsonify({
         'ok':           True,
@@ -1605,6 +1762,9 @@ def get_live_servers(channel_id):
             last_reports[url] = {
                 'alive':      rep.resultado,
                 'latency_ms': rep.latencia_ms,
+                'ttfb_ms':    rep.ttfb_ms,
+                'throughput_kbps': rep.throughput_kbps,
+                'score':      rep.score,
                 'checked_at': rep.timestamp.isoformat(),
             }
 
@@ -1673,12 +1833,11 @@ def proxy_diag():
 
     t0 = time.time()
     try:
-        import socket as _sock
+        import dns_cache
         from urllib.parse import urlparse as _up
         h = _up(url).hostname
-        p = _up(url).port or 80
-        # Test DNS
-        _sock.getaddrinfo(h, p, _sock.AF_UNSPEC, _sock.SOCK_STREAM)
+        # Test DNS (misma caché que usan los proxies)
+        result['dns_ips'] = dns_cache.resolve_ips(h)
         result['dns_ok'] = True
         # Test HTTP HEAD
         resp = requests.head(url, headers={**_PROXY_UA}, timeout=(5, 5),
@@ -1691,12 +1850,16 @@ def proxy_diag():
     finally:
         result['duration_ms'] = round((time.time() - t0) * 1000)
 
+    import dns_cache
+    result['dns_cache'] = dns_cache.stats()
     return jsonify(result)
 
 
 # ── Canales curados ────────────────────────────────────────────
 
 @api_bp.get('/canales-curados')
+@catalog_cache.conditional(max_age=120)
+@catalog_cache.cached()
 def canales_curados():
     """
     Lista de canales TV en directo curados manualmente por el admin.
@@ -20,13 +20,12 @@ El modo de stream (proxy VPS / directo al proveedor) se controla desde el
 panel admin -> IPTV -> Configuracion Xtream (XtreamConfig en BD).
 """
 import json as _json
-import re as _re
 import secrets
 from datetime import datetime, timedelta
 from urllib.parse import quote as _quote
 
 import requests as _requests
-from flask import Blueprint, Response, abort, jsonify, redirect, request, stream_with_context
+from flask import Blueprint, Response, abort, g, jsonify, redirect, request, stream_with_context
 
 from models import db, Contenido, IptvUser, IptvSession, Lista, XtreamConfig
 
@@ -319,9 +318,6 @@ def _file_ext(url_stream: str, fallback: str = 'mp4') -> str:
     return fallback
 
 
-_EP_PAT = _re.compile(r'\s*[Ss]\d{1,2}[Ee]\d{1,3}.*$')
-
-
 def _xtream_dispatch(username: str, password: str, cid_str: str,
                      allowed_tipo: str | None = None):
     """Auth + control de conexiones + stream (directo o proxy)."""
@@ -422,6 +418,19 @@ def get_php():
 
 # ── player_api.php (Xtream JSON API) ─────────────────────────────
 
+_XTREAM_MAX_AGE = 300   # s de Cache-Control para las acciones de catálogo
+
+
+@xtream_bp.after_request
+def _xtream_cache_headers(resp):
+    """ETag + Cache-Control de las acciones de player_api (ver player_api)."""
+    tag = g.pop('xtream_etag', None)
+    if tag:
+        import catalog_cache
+        catalog_cache.tag_response(resp, tag, _XTREAM_MAX_AGE, private=True)
+    return resp
+
+
 @xtream_bp.get('/player_api.php')
 @xtream_bp.post('/player_api.php')
 def player_api():
@@ -440,6 +449,16 @@ def player_api():
     if not action:
         return jsonify(_build_account_info(u, base))
 
+    # Acciones de catálogo: 304 si el cliente ya tiene la generación actual
+    # (tras autenticar: un usuario desactivado no debe recibir ni un 304)
+    if request.method == 'GET':
+        import catalog_cache
+        tag = catalog_cache.etag()
+        resp = catalog_cache.not_modified(tag, _XTREAM_MAX_AGE, private=True)
+        if resp is not None:
+            return resp
+        g.xtream_etag = tag
+
     # ── Categorias live ───────────────────────────────────────
     if action == 'get_live_categories':
         if not cfg.live_enabled:
@@ -524,7 +543,8 @@ def player_api():
         items = _user_q(u, 'serie').order_by(Contenido.titulo).all()
         seen: dict[str, dict] = {}
         for c in items:
-            base_title = _EP_PAT.sub('', c.titulo).strip() or c.titulo
+            # Misma clave que get_series_info (series_index.key_for)
+            base_title = c.serie_key or c.titulo
             if base_title not in seen:
                 seen[base_title] = {
                     'series_id':       c.id,
@@ -556,11 +576,14 @@ def player_api():
         root = Contenido.query.get(sid)
         if not root or root.tipo != 'serie':
             return jsonify({})
-        base_title = _EP_PAT.sub('', root.titulo).strip() or root.titulo
+        # Episodios por el índice (serie_key, temporada, episodio): solo los
+        # de esta serie, no cualquier título que empiece igual
+        from series_index import key_for
+        base_title = root.serie_key or key_for(root.titulo, root.tipo, root.temporada)
         eps = (
             Contenido.query
-            .filter(Contenido.activo == True, Contenido.tipo == 'serie',
-                    Contenido.titulo.like(f'{base_title}%'))
+            .filter(Contenido.serie_key == base_title, Contenido.activo == True,
+                    Contenido.tipo == 'serie')
             .order_by(Contenido.temporada, Contenido.episodio, Contenido.titulo)
             .all()
         )
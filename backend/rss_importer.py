@@ -204,18 +204,15 @@ def import_rss_source(app, fuente_rss_id: int):
     """
     Importa una FuenteRSS a la BD.
     Solo guarda items nuevos (deduplicación por url_hash).
+    Se ejecuta en background (hilo o worker, según BACKGROUND_WORKER).
     """
-    import threading
-    t = threading.Thread(
-        target=_do_import,
-        args=(app, fuente_rss_id),
-        daemon=True,
-    )
-    t.start()
+    from tasks import enqueue
+    enqueue(app, 'import_rss', fuente_id=fuente_rss_id)
 
 
 def _do_import(app, fuente_rss_id: int):
     from models import db, Contenido, FuenteRSS
+    import series_index
 
     with app.app_context():
         fuente = FuenteRSS.query.get(fuente_rss_id)
@@ -232,11 +229,18 @@ def _do_import(app, fuente_rss_id: int):
             logger.error(f'[RSS Import] Error: {error}')
             return
 
+        import genres
+        last_id = genres.max_id()
         nuevos = 0
+        serie_keys = set()
         for it in items:
             if Contenido.query.filter_by(url_hash=it['url_hash']).first():
                 continue
 
+            serie_key = series_index.key_for(
+                it['titulo'] or 'Sin título', it['tipo'], it.get('temporada'))
+            if serie_key:
+                serie_keys.add(serie_key)
             c = Contenido(
                 titulo=it['titulo'] or 'Sin título',
                 tipo=it['tipo'],
@@ -252,6 +256,7 @@ def _do_import(app, fuente_rss_id: int):
                 pais=it.get('pais', 'es'),
                 temporada=it.get('temporada'),
                 episodio=it.get('episodio'),
+                serie_key=serie_key,
                 fuente='rss',
                 fuente_rss_id=fuente_rss_id,
                 lista_id=None,
@@ -262,6 +267,14 @@ def _do_import(app, fuente_rss_id: int):
                 db.session.commit()
 
         db.session.commit()
+        series_index.refresh_safe(serie_keys)
+        if nuevos:
+            genres.link_since(last_id)
+            genres.refresh_counts()
+            import catalog_cache
+            catalog_cache.bump('import rss')
+            import trending
+            trending.rebuild_safe('import rss')
 
         fuente.error = None
         fuente.total_items = Contenido.query.filter_by(fuente_rss_id=fuente_rss_id).count()
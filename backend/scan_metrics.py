@@ -0,0 +1,239 @@
+"""
+Telemetría de los scans: rendimiento y latencia por ejecución y por servidor.
+
+Cada sonda (check_url_detailed / probe_stream_quality) devuelve alive,
+latency_ms, attempts, timeout y html. Aquí se agregan en acumuladores
+fusionables:
+
+  probes, alive, timeouts, html, ua_retries  contadores
+  hist                                       histograma de latencia con
+                                             buckets fijos (BOUNDS_MS)
+
+Por lote se guarda una fila de totales (serie temporal: sondas/s, p50/p95,
+tasa de timeouts…) y por servidor un acumulado de toda la ejecución que se
+fusiona lote a lote. Con eso se ajustan SCAN_MAX_WORKERS y SCAN_TIMEOUT
+con datos: si p95 se acerca al timeout o la tasa de timeouts sube al
+subir hilos, el cuello de botella es la red y no el número de workers.
+"""
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Límite superior (ms) de cada bucket; el último bucket es "> 12800 ms"
+BOUNDS_MS = (25, 50, 100, 200, 400, 800, 1600, 3200, 6400, 12800)
+
+_COUNTERS = ('probes', 'alive', 'timeouts', 'html', 'ua_retries')
+
+
+def new() -> dict:
+    return {**{k: 0 for k in _COUNTERS}, 'hist': [0] * (len(BOUNDS_MS) + 1)}
+
+
+def add(acc: dict, probe: dict):
+    """Suma el resultado de una sonda al acumulador."""
+    acc['probes'] += 1
+    acc['alive'] += bool(probe.get('alive'))
+    acc['timeouts'] += bool(probe.get('timeout'))
+    acc['html'] += bool(probe.get('html'))
+    acc['ua_retries'] += (probe.get('attempts') or 1) > 1
+    latency = probe.get('latency_ms')
+    if probe.get('alive') and latency is not None:
+        i = 0
+        while i < len(BOUNDS_MS) and latency > BOUNDS_MS[i]:
+            i += 1
+        acc['hist'][i] += 1
+
+
+def merge(into: dict, other: dict) -> dict:
+    for k in _COUNTERS:
+        into[k] += other.get(k, 0)
+    for i, n in enumerate(other.get('hist') or []):
+        if i < len(into['hist']):
+            into['hist'][i] += n
+    return into
+
+
+def collect(results) -> tuple:
+    """
+    Agrega un lote de (url, probe) → (total, {servidor: acumulado}).
+    El servidor es el netloc, igual que Contenido.servidor y el circuit breaker.
+    """
+    import circuit_breaker
+    total, per_host = new(), {}
+    for url, probe in results:
+        add(total, probe)
+        host = circuit_breaker.host_of(url or '')
+        if host:
+            add(per_host.setdefault(host, new()), probe)
+    return total, per_host
+
+
+def percentile(hist: list, p: float):
+    """
+    Percentil `p` (0–100) del histograma, interpolando dentro del bucket.
+    None sin datos; el bucket abierto final devuelve su límite inferior.
+    """
+    n = sum(hist)
+    if not n:
+        return None
+    target = n * p / 100
+    seen = 0
+    for i, count in enumerate(hist):
+        if count and seen + count >= target:
+            lo = BOUNDS_MS[i - 1] if i > 0 else 0
+            if i >= len(BOUNDS_MS):
+                return lo
+            return int(lo + (BOUNDS_MS[i] - lo) * (target - seen) / count)
+        seen += count
+    return BOUNDS_MS[-1]
+
+
+def summary(acc: dict, seconds: float = None) -> dict:
+    probes = acc['probes']
+    rate = (lambda k: round(acc[k] / probes, 4)) if probes else (lambda k: 0.0)
+    return {
+        'probes':         probes,
+        'alive':          acc['alive'],
+        'probes_per_s':   round(probes / seconds, 2) if seconds else None,
+        'p50_ms':         percentile(acc['hist'], 50),
+        'p95_ms':         percentile(acc['hist'], 95),
+        'p99_ms':         percentile(acc['hist'], 99),
+        'timeout_rate':   rate('timeouts'),
+        'html_rate':      rate('html'),
+        'ua_retry_rate':  rate('ua_retries'),
+    }
+
+
+# ── Persistencia ───────────────────────────────────────────────
+
+def _hist_str(hist: list) -> str:
+    hist = list(hist)
+    while hist and not hist[-1]:
+        hist.pop()
+    return ','.join(str(n) for n in hist)
+
+
+def _row_acc(row) -> dict:
+    acc = {k: getattr(row, k) or 0 for k in _COUNTERS}
+    hist = [int(x) for x in row.hist.split(',')] if row.hist else []
+    acc['hist'] = hist + [0] * (len(BOUNDS_MS) + 1 - len(hist))
+    return acc
+
+
+def record(app, tipo: str, run_ref: str, total: dict, per_host: dict,
+           seconds: float, workers: int = None, timeout: int = None):
+    """
+    Guarda la fila de totales del lote y fusiona los acumulados por
+    servidor de la ejecución. Nunca rompe el scan: los errores se registran.
+    """
+    from models import db, ScanMetric
+    if not total['probes']:
+        return
+    try:
+        with app.app_context():
+            now = datetime.utcnow()
+            db.session.add(ScanMetric(
+                tipo=tipo, run_ref=run_ref, servidor=None, workers=workers,
+                timeout_s=timeout, seconds=round(seconds, 2),
+                hist=_hist_str(total['hist']), timestamp=now,
+                **{k: total[k] for k in _COUNTERS},
+            ))
+
+            hosts = list(per_host)
+            existing = {}
+            for i in range(0, len(hosts), 900):
+                for row in ScanMetric.query.filter(
+                        ScanMetric.run_ref == run_ref,
+                        ScanMetric.servidor.in_(hosts[i:i + 900])):
+                    existing[row.servidor] = row
+            for host, acc in per_host.items():
+                row = existing.get(host)
+                if row is None:
+                    row = ScanMetric(tipo=tipo, run_ref=run_ref, servidor=host[:300],
+                                     seconds=0.0, **{k: 0 for k in _COUNTERS})
+                    db.session.add(row)
+                    merged = acc
+                else:
+                    merged = merge(_row_acc(row), acc)
+                for k in _COUNTERS:
+                    setattr(row, k, merged[k])
+                row.hist = _hist_str(merged['hist'])
+                row.workers, row.timeout_s = workers, timeout
+                row.timestamp = now
+            db.session.commit()
+    except Exception as e:
+        logger.warning(f'[ScanMetrics] No se pudo guardar la telemetría de {run_ref}: {e}')
+
+
+def run_summary(app, run_ref: str, top_hosts: int = 3) -> dict:
+    """
+    Resumen de una ejecución: totales de todos sus lotes y los servidores
+    con peor tasa de timeouts (para el aviso de Telegram).
+    """
+    from models import ScanMetric
+    with app.app_context():
+        rows = ScanMetric.query.filter(ScanMetric.run_ref == run_ref).all()
+    total, seconds, hosts = new(), 0.0, []
+    for row in rows:
+        if row.servidor is None:
+            merge(total, _row_acc(row))
+            seconds += row.seconds or 0.0
+        elif (row.probes or 0) >= 20:
+            hosts.append({'servidor': row.servidor, **summary(_row_acc(row))})
+    hosts.sort(key=lambda h: h['timeout_rate'], reverse=True)
+    return {**summary(total, seconds),
+            'worst_hosts': [h for h in hosts if h['timeout_rate'] > 0][:top_hosts]}
+
+
+def series(app, tipo: str, days: int = 7, limit: int = 500) -> dict:
+    """Serie temporal por lote y desglose por servidor de la última ejecución."""
+    from models import ScanMetric
+    since = datetime.utcnow() - timedelta(days=days)
+    with app.app_context():
+        rows = (
+            ScanMetric.query
+            .filter(ScanMetric.tipo == tipo, ScanMetric.timestamp >= since,
+                    ScanMetric.servidor.is_(None))
+            .order_by(ScanMetric.timestamp.desc())
+            .limit(limit).all()
+        )
+        points = [{
+            'timestamp': r.timestamp.isoformat(),
+            'run':       r.run_ref,
+            'workers':   r.workers,
+            'timeout_s': r.timeout_s,
+            **summary(_row_acc(r), r.seconds),
+        } for r in reversed(rows)]
+
+        hosts = []
+        if rows:
+            last_run = rows[0].run_ref
+            hosts = [
+                {'servidor': r.servidor, **summary(_row_acc(r))}
+                for r in ScanMetric.query.filter(
+                    ScanMetric.run_ref == last_run, ScanMetric.servidor.isnot(None))
+            ]
+            hosts.sort(key=lambda h: h['probes'], reverse=True)
+    return {'tipo': tipo, 'series': points, 'hosts': hosts[:50]}
+
+
+def purge(app, days: int = 30, chunk: int = 5000) -> int:
+    """Borra la telemetría de más de `days` días por trozos."""
+    from models import db, ScanMetric
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    deleted = 0
+    with app.app_context():
+        while True:
+            ids = [r[0] for r in db.session.query(ScanMetric.id)
+                   .filter(ScanMetric.timestamp < cutoff).limit(chunk).all()]
+            if not ids:
+                break
+            for i in range(0, len(ids), 900):
+                deleted += ScanMetric.query.filter(
+                    ScanMetric.id.in_(ids[i:i + 900])).delete(synchronize_session=False)
+            db.session.commit()
+    if deleted:
+        logger.info(f'[ScanMetrics] {deleted} filas de telemetría purgadas (> {days} días)')
+    return deleted
+
@@ -1,9 +1,10 @@
 """
 Scheduler de tareas en background (APScheduler).
-Se usa para escanear links caídos periódicamente.
+Se usa para escanear links caídos periódicamente (init_scheduler, con
+AUTO_SCAN=1) y para el mantenimiento de las tablas derivadas
+(init_maintenance, siempre).
 """
 import logging
-import time as _time
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
@@ -18,52 +19,32 @@ def init_scheduler(app):
         """
         Escanea todos los canales VOD en lotes sucesivos hasta cubrir la BD entera.
         Con 80k canales y 40 workers puede tardar varias horas — se ejecuta en
-        segundo plano sin bloquear el servidor web.
+        segundo plano sin bloquear el servidor web. El progreso se guarda en un
+        ScanRun tras cada lote, así que un reinicio no lo pierde.
         """
-        from link_checker import scan_dead_links
-        from telegram_bot import notify_scan_report, check_and_notify_server_health
+        from link_checker import create_scan_run, get_running_scan
 
-        batch   = app.config.get('SCAN_BATCH_SIZE', 5000)
-        workers = app.config.get('SCAN_MAX_WORKERS', 40)
-
-        total_checked = total_alive = total_dead = 0
-        iteration = 0
-        max_iter  = 200
-
-        while iteration < max_iter:
-            iteration += 1
-            result = scan_dead_links(app, batch_size=batch, max_workers=workers)
-            total_checked += result.get('checked', 0)
-            total_alive   += result.get('alive',   0)
-            total_dead    += result.get('dead',     0)
-
-            logger.info(
-                f'[Scheduler] Scan VOD iter {iteration}: '
-                f'{result.get("checked")} verificados, '
-                f'total acumulado={total_checked}'
-            )
-
-            if not result.get('has_more', False):
-                break
-
-            _time.sleep(2)
+        if get_running_scan(app) is not None:
+            logger.info('[Scheduler] Ya hay un scan VOD en curso — se omite esta ejecución')
+            return
 
-        logger.info(
-            f'[Scheduler] Scan VOD completo: {total_checked} verificados, '
-            f'{total_alive} vivos, {total_dead} caídos en {iteration} lote(s)'
+        run_id = create_scan_run(
+            app, origen='auto',
+            batch_size=app.config.get('SCAN_BATCH_SIZE', 5000),
+            max_workers=app.config.get('SCAN_MAX_WORKERS', 40),
+            max_batches=200,
         )
-        # Notificar resumen por Telegram
-        try:
-            notify_scan_report(app, total_checked, total_alive, total_dead, scan_type='VOD')
-            check_and_notify_server_health(app)
-        except Exception as e:
-            logger.warning(f'[Scheduler] Error notificación Telegram post-scan: {e}')
+        _run_vod_scan(app, run_id)
 
     def job_purge():
         from link_checker import purge_dead_links
         days   = app.config.get('PURGE_DEAD_DAYS', 7)
         result = purge_dead_links(app, days=days)
         logger.info(f'[Scheduler] Purge automático: {result}')
+        from tasks import purge_finished
+        purge_finished(app, days=days)
+        from scan_metrics import purge as purge_scan_metrics
+        purge_scan_metrics(app, days=app.config.get('SCAN_METRICS_DAYS', 30))
 
     def job_live_scan():
         """
@@ -73,7 +54,8 @@ def init_scheduler(app):
         """
         from datetime import datetime, timedelta
         from models import LiveScanConfig
-        from link_checker import scan_live_channels
+        from link_checker import (scan_live_channels, scan_curated_channels,
+                                  purge_live_scan_reports)
         from telegram_bot import notify_scan_report
 
         with app.app_context():
@@ -95,9 +77,17 @@ def init_scheduler(app):
         result = scan_live_channels(app)
         logger.info(f'[Scheduler] Scan live: {result}')
         try:
+            curado = scan_curated_channels(app)
+            logger.info(f'[Scheduler] Scan canales curados: {curado}')
+        except Exception as e:
+            logger.error(f'[Scheduler] Error en scan de canales curados: {e}')
+        purge_live_scan_reports(app, days=app.config.get('LIVE_REPORT_DAYS', 7))
+        try:
+            from scan_metrics import run_summary
             alive = result.get('alive', 0)
             dead  = result.get('dead',  0)
-            notify_scan_report(app, alive + dead, alive, dead, scan_type='Live')
+            notify_scan_report(app, alive + dead, alive, dead, scan_type='Live',
+                               metrics=run_summary(app, result['run_ref']))
         except Exception as e:
             logger.warning(f'[Scheduler] Error notificación Telegram post-live-scan: {e}')
 
@@ -175,14 +165,141 @@ def init_scheduler(app):
         replace_existing=True,
     )
 
+    _start()
+    logger.info(
+        f'[Scheduler] Scans programados — VOD cada {hours}h (lotes completos), '
+        f'live cada 1h (control interno), purge semanal'
+    )
+    return _scheduler
+
+
+def init_maintenance(app):
+    """
+    Jobs de mantenimiento de las tablas derivadas (contadores, índices).
+    No dependen de AUTO_SCAN: sin ellos una deriva no se corregiría nunca
+    en las instalaciones sin scans automáticos. Comparte el scheduler con
+    init_scheduler.
+    """
+
+    def job_counters_reconcile():
+        """Recalcula catalog_counters desde contenidos (corrige cualquier deriva)."""
+        import catalog_counters
+        with app.app_context():
+            catalog_counters.reconcile()
+
+    def job_genre_counts():
+        """Recalcula cuántos contenidos activos tiene cada género (menú de géneros)."""
+        import genres
+        with app.app_context():
+            genres.refresh_counts()
+
+    def job_genres_reconcile():
+        """Completa los enlaces de géneros y borra los huérfanos."""
+        import genres
+        with app.app_context():
+            genres.reconcile()
+
+    def job_series_reconcile():
+        """Corrige las series agrupadas que se hayan desviado (ediciones, cambios de tipo)."""
+        import series_index
+        with app.app_context():
+            series_index.reconcile()
+
+    def job_live_groups_reconcile():
+        """Corrige el nombre base de los canales en directo (live-agrupados)."""
+        import live_groups
+        with app.app_context():
+            live_groups.reconcile()
+
+    _scheduler.add_job(
+        func=job_counters_reconcile,
+        trigger=IntervalTrigger(hours=6),
+        id='counters_reconcile',
+        name='Reconciliación de contadores del catálogo',
+        replace_existing=True,
+    )
+
+    _scheduler.add_job(
+        func=job_genre_counts,
+        trigger=IntervalTrigger(hours=1),
+        id='genre_counts',
+        name='Contadores de géneros',
+        replace_existing=True,
+    )
+
+    _scheduler.add_job(
+        func=job_genres_reconcile,
+        trigger=IntervalTrigger(hours=24),
+        id='genres_reconcile',
+        name='Reconciliación diaria de géneros',
+        replace_existing=True,
+    )
+
+    _scheduler.add_job(
+        func=job_series_reconcile,
+        trigger=IntervalTrigger(hours=24),
+        id='series_reconcile',
+        name='Reconciliación diaria de series agrupadas',
+        replace_existing=True,
+    )
+
+    _scheduler.add_job(
+        func=job_live_groups_reconcile,
+        trigger=IntervalTrigger(hours=24),
+        id='live_groups_reconcile',
+        name='Reconciliación diaria de canales agrupados',
+        replace_existing=True,
+    )
+
+    _start()
+    return _scheduler
+
+
+def _start():
     if not _scheduler.running:
         _scheduler.start()
-        logger.info(
-            f'[Scheduler] Iniciado — scan VOD cada {hours}h (lotes completos), '
-            f'live cada 1h (control interno), purge semanal'
-        )
+        logger.info('[Scheduler] Iniciado')
 
-    return _scheduler
+
+def _run_vod_scan(app, run_id: int):
+    """Ejecuta un ScanRun y, si es automático, envía el resumen por Telegram."""
+    from link_checker import run_scan
+    from telegram_bot import notify_scan_report, check_and_notify_server_health
+
+    result = run_scan(app, run_id)
+    if not result:
+        return
+    logger.info(
+        f'[Scheduler] Scan VOD {result["estado"]}: {result["checked"]} verificados, '
+        f'{result["alive"]} vivos, {result["dead"]} caídos en {result["batches"]} lote(s)'
+    )
+    if result['origen'] != 'auto' or result['estado'] != 'completed':
+        return
+    # Notificar resumen por Telegram
+    try:
+        from scan_metrics import run_summary
+        notify_scan_report(app, result['checked'], result['alive'], result['dead'], scan_type='VOD',
+                           metrics=run_summary(app, f'vod:{run_id}'))
+        check_and_notify_server_health(app)
+    except Exception as e:
+        logger.warning(f'[Scheduler] Error notificación Telegram post-scan: {e}')
+
+
+def resume_scan_runs(app):
+    """
+    Reanuda en segundo plano los ScanRun que quedaron en estado 'running'
+    (el proceso murió a mitad de scan). Se llama al arrancar la app.
+    """
+    import threading
+    from models import ScanRun
+
+    with app.app_context():
+        pending = [r.id for r in ScanRun.query.filter_by(estado='running').all()]
+
+    for run_id in pending:
+        logger.info(f'[Scheduler] Reanudando ScanRun {run_id} interrumpido')
+        threading.Thread(target=_run_vod_scan, args=(app, run_id), daemon=True).start()
+    return pending
 
 
 def get_scheduler():
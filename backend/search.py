@@ -0,0 +1,195 @@
+"""
+Búsqueda de texto completo en el catálogo (titulo, genero, group_title).
+
+Un ilike('%q%') recorre la tabla entera en cada tecla y no pliega acentos
+("accion" no encuentra "Acción"). Aquí se mantiene un índice de texto:
+
+  SQLite      tabla virtual FTS5 `contenidos_fts` (external content sobre
+              contenidos) con tokenizer unicode61 remove_diacritics 2 y
+              prefijos indexados. La mantienen al día triggers de
+              INSERT / UPDATE / DELETE, así que los imports (Core insert),
+              las ediciones y el purge la actualizan sin código extra.
+  PostgreSQL  índices GIN de expresión sobre to_tsvector('simple',
+              cc_unaccent(...)); la expresión se recalcula sola en cada
+              escritura. Requiere la extensión unaccent (si no se puede
+              crear, se indexa sin plegar acentos).
+  Otro / error  se vuelve al ilike de siempre.
+
+Las consultas son por prefijo de cada palabra ("star wa" → star* AND wa*),
+pensadas para buscar mientras se escribe, y pueden ordenarse por relevancia.
+"""
+import logging
+import re
+
+from sqlalchemy import text, Integer, Float, or_
+
+logger = logging.getLogger(__name__)
+
+# 'fts5' | 'pg' | None (ilike)
+_backend = None
+
+_FTS_TABLE = 'contenidos_fts'
+_FTS_COLUMNS = ('titulo', 'genero', 'group_title')
+# Peso de cada columna en bm25 (el título manda)
+_FTS_WEIGHTS = (10.0, 2.0, 1.0)
+_MAX_TERMS = 8
+
+
+def _pg_vector(titulo_only: bool, table: str = '') -> str:
+    """Expresión tsvector; la misma (sin tabla) que la de los índices GIN."""
+    p = f'{table}.' if table else ''
+    if titulo_only:
+        body = f"coalesce({p}titulo, '')"
+    else:
+        body = (f"coalesce({p}titulo, '') || ' ' || coalesce({p}genero, '') || ' ' || "
+                f"coalesce({p}group_title, '')")
+    return f"to_tsvector('simple', cc_unaccent({body}))"
+
+
+def backend() -> str | None:
+    return _backend
+
+
+# ── Instalación ────────────────────────────────────────────────
+
+def _install_sqlite(conn) -> bool:
+    try:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"
+        ), {'n': _FTS_TABLE}).first() is not None
+
+        cols = ', '.join(_FTS_COLUMNS)
+        new_cols = ', '.join(f'new.{c}' for c in _FTS_COLUMNS)
+        old_cols = ', '.join(f'old.{c}' for c in _FTS_COLUMNS)
+        stmts = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5("
+            f"{cols}, content='contenidos', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')",
+            f"CREATE TRIGGER IF NOT EXISTS contenidos_fts_ai AFTER INSERT ON contenidos BEGIN "
+            f"INSERT INTO {_FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+            f"CREATE TRIGGER IF NOT EXISTS contenidos_fts_ad AFTER DELETE ON contenidos BEGIN "
+            f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}, rowid, {cols}) "
+            f"VALUES ('delete', old.id, {old_cols}); END",
+            f"CREATE TRIGGER IF NOT EXISTS contenidos_fts_au AFTER UPDATE OF {cols} ON contenidos BEGIN "
+            f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}, rowid, {cols}) "
+            f"VALUES ('delete', old.id, {old_cols}); "
+            f"INSERT INTO {_FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+        ]
+        for stmt in stmts:
+            conn.execute(text(stmt))
+        if not exists:
+            # Primera vez: indexar el catálogo que ya hay
+            logger.info('[Search] Creando índice FTS5 del catálogo…')
+            conn.execute(text(f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}) VALUES ('rebuild')"))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f'[Search] FTS5 no disponible, búsqueda con LIKE: {e}')
+        return False
+
+
+def _install_pg(conn) -> bool:
+    try:
+        try:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS unaccent'))
+            # unaccent() es STABLE: un índice necesita una función IMMUTABLE
+            conn.execute(text(
+                "CREATE OR REPLACE FUNCTION cc_unaccent(text) RETURNS text "
+                "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+                "AS $$ SELECT public.unaccent('public.unaccent', $1) $$"
+            ))
+        except Exception as e:
+            conn.rollback()
+            logger.warning(f'[Search] Extensión unaccent no disponible ({e}): sin plegado de acentos')
+            conn.execute(text(
+                "CREATE OR REPLACE FUNCTION cc_unaccent(text) RETURNS text "
+                "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS $$ SELECT lower($1) $$"
+            ))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_contenidos_fts ON contenidos '
+                          f'USING gin (({_pg_vector(False)}))'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_contenidos_fts_titulo ON contenidos '
+                          f'USING gin (({_pg_vector(True)}))'))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f'[Search] Índice de texto no disponible, búsqueda con ILIKE: {e}')
+        return False
+
+
+def install(db):
+    """Crea (si falta) el índice de texto. Llamar dentro de app_context tras create_all()."""
+    global _backend
+    dialect = db.engine.dialect.name
+    with db.engine.connect() as conn:
+        if dialect == 'sqlite' and _install_sqlite(conn):
+            _backend = 'fts5'
+        elif dialect == 'postgresql' and _install_pg(conn):
+            _backend = 'pg'
+        else:
+            _backend = None
+
+
+def rebuild(db):
+    """Reconstruye el índice FTS5 desde cero (mantenimiento; en PG no hace falta)."""
+    if _backend != 'fts5':
+        return
+    with db.engine.connect() as conn:
+        conn.execute(text(f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}) VALUES ('rebuild')"))
+        conn.commit()
+
+
+# ── Consulta ───────────────────────────────────────────────────
+
+def _terms(q: str) -> list:
+    return re.findall(r'\w+', q or '')[:_MAX_TERMS]
+
+
+def _match_expr(terms: list, titulo_only: bool) -> str:
+    if _backend == 'pg':
+        return ' & '.join(f'{t.lower()}:*' for t in terms)
+    # FTS5: cada término entre comillas (sin sintaxis del usuario) y con *
+    col = '{titulo}: ' if titulo_only else ''
+    return ' AND '.join(f'{col}"{t}"*' for t in terms)
+
+
+def apply(query, q: str, titulo_only: bool = False, rank: bool = False):
+    """
+    Filtra `query` (sobre Contenido) por la búsqueda `q`.
+    titulo_only → solo el título; si no, título + género + group_title.
+    rank → ordena primero por relevancia (el llamante puede añadir más
+    order_by detrás como desempate).
+    """
+    from models import Contenido
+    terms = _terms(q)
+    if not terms:
+        # Solo signos de puntuación: nada que buscar → sin resultados
+        from sqlalchemy import false
+        return query.filter(false())
+
+    if _backend == 'fts5':
+        weights = ', '.join(str(w) for w in _FTS_WEIGHTS)
+        hits = (
+            text(f'SELECT rowid AS id, bm25({_FTS_TABLE}, {weights}) AS rank '
+                 f'FROM {_FTS_TABLE} WHERE {_FTS_TABLE} MATCH :fts_q')
+            .bindparams(fts_q=_match_expr(terms, titulo_only))
+            .columns(id=Integer, rank=Float)
+            .subquery('fts_hits')
+        )
+        query = query.join(hits, Contenido.id == hits.c.id)
+        return query.order_by(hits.c.rank) if rank else query
+
+    if _backend == 'pg':
+        from sqlalchemy import func, literal_column
+        vector = literal_column(_pg_vector(titulo_only, 'contenidos'))
+        tsq = func.to_tsquery('simple', func.cc_unaccent(_match_expr(terms, titulo_only)))
+        query = query.filter(vector.op('@@')(tsq))
+        return query.order_by(func.ts_rank(vector, tsq).desc()) if rank else query
+
+    # Sin índice: ilike por término (al menos no exige el orden exacto)
+    for t in terms:
+        cols = [Contenido.titulo] if titulo_only else [
+            Contenido.titulo, Contenido.genero, Contenido.group_title]
+        query = query.filter(or_(*(c.ilike(f'%{t}%') for c in cols)))
+    return query
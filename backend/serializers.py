@@ -0,0 +1,130 @@
+"""
+Serialización de listados de contenido.
+
+Los listados construían un objeto ORM completo por fila (identity map,
+estado de sesión, todas las columnas) solo para llamar a to_dict(). Aquí:
+
+  list_columns()    las columnas que usa el dict del APK/web; con
+                    project(query) la consulta devuelve Rows ligeras en vez
+                    de objetos Contenido (sin url_hash, lista_id,
+                    serie_key, fuente_rss_id…)
+  contenido_dict()  el dict de la API a partir de una Row o de un
+                    Contenido — Contenido.to_dict() delega aquí, así que
+                    el formato es uno solo
+  json_response()   orjson si está instalado (opcional, pip install
+                    orjson), si no el JSON de Flask
+"""
+import json as _json
+
+from flask import current_app
+from sqlalchemy.engine import Row
+
+try:
+    import orjson
+except ImportError:          # dependencia opcional
+    orjson = None
+
+_TYPE_MAP = {'pelicula': 'movie', 'serie': 'series', 'live': 'live'}
+
+# Campos opcionales: solo se envían si tienen valor
+_OPTIONAL = (
+    ('drm_license_type', 'drmLicenseType'),
+    ('drm_license_key',  'drmLicenseKey'),
+    ('drm_key_id',       'drmKeyId'),
+    ('drm_key',          'drmKey'),
+    ('manifest_type',    'manifestType'),
+    ('catchup_type',     'catchupType'),
+    ('catchup_source',   'catchupSource'),
+    ('catchup_days',     'catchupDays'),
+    ('user_agent',       'userAgent'),
+    ('http_referrer',    'httpReferrer'),
+)
+
+# El orden importa: contenido_dict() desempaqueta las Rows por posición
+_BASE_ATTRS = (
+    'id', 'titulo', 'tipo', 'url_stream', 'fuente', 'servidor', 'imagen', 'descripcion',
+    'año', 'genero', 'group_title', 'temporada', 'episodio', 'activo',
+    'fecha_agregado', 'ultima_verificacion', 'live_urls_json', 'live_active_idx',
+)
+_N_BASE = len(_BASE_ATTRS)
+_OPTIONAL_KEYS = tuple(key for _, key in _OPTIONAL)
+_LIST_ATTRS = _BASE_ATTRS + tuple(attr for attr, _ in _OPTIONAL)
+
+
+def list_columns() -> list:
+    from models import Contenido
+    return [getattr(Contenido, attr) for attr in _LIST_ATTRS]
+
+
+def project(query):
+    """
+    La misma consulta (filtros, joins, orden) devolviendo solo list_columns().
+    Se pueden añadir columnas detrás (add_columns): contenido_dict las ignora.
+    """
+    return query.with_entities(*list_columns())
+
+
+def contenido_dict(c, live_state: bool = True) -> dict:
+    """
+    Dict de la API para un Contenido o una Row de project().
+    live_state=False (listados cacheados): los canales live salen con la URL
+    0, la mejor según el último scan, sin el live_active_idx que cambian los
+    reportes de los clientes (report-down, set-server).
+    """
+    # Una Row de project() viene en el orden de _LIST_ATTRS: desempaquetar
+    # por posición evita ~30 getattr por fila
+    values = tuple(c) if isinstance(c, Row) else tuple(getattr(c, a) for a in _LIST_ATTRS)
+    (id_, titulo, tipo, url_stream, fuente, servidor, imagen, descripcion, año,
+     genero, group_title, temporada, episodio, activo, fecha, verif,
+     live_urls_json, live_active_idx) = values[:_N_BASE]
+
+    # Para canales live: calcular URL activa y lista completa
+    all_urls = None
+    active_idx = 0
+    active_url = url_stream
+    if tipo == 'live' and live_urls_json:
+        try:
+            all_urls = _json.loads(live_urls_json)
+            active_idx = (live_active_idx or 0) if live_state else 0
+            active_url = all_urls[active_idx] if all_urls and active_idx < len(all_urls) else url_stream
+        except (ValueError, IndexError, TypeError):
+            all_urls = [url_stream]
+            active_idx = 0
+            active_url = url_stream
+
+    d = {
+        'id':          id_,
+        'title':       titulo,
+        'type':        _TYPE_MAP.get(tipo, tipo),
+        'streamUrl':   active_url,
+        'source':      fuente,
+        'server':      servidor,
+        'image':       imagen or '',
+        'description': descripcion or '',
+        'year':        año,
+        'genres':      [g.strip() for g in genero.split(',')] if genero else [],
+        'groupTitle':  group_title,
+        'season':      temporada,
+        'episode':     episodio,
+        'active':      activo,
+        'addedAt':     fecha.isoformat() if fecha else None,
+        'lastCheck':   verif.isoformat() if verif else None,
+    }
+    if tipo == 'live':
+        d['liveUrls'] = all_urls or [url_stream]
+        d['activeUrlIndex'] = active_idx
+    # Propiedades DRM / Avanzadas
+    for key, value in zip(_OPTIONAL_KEYS, values[_N_BASE:]):
+        if value:
+            d[key] = value
+    return d
+
+
+def json_response(data, status: int = 200):
+    """Respuesta JSON; con orjson serializa varias veces más rápido los listados."""
+    if orjson is None:
+        resp = current_app.json.response(data)
+        resp.status_code = status
+        return resp
+    return current_app.response_class(orjson.dumps(data), status=status,
+                                      mimetype='application/json')
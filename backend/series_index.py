@@ -0,0 +1,247 @@
+"""
+Series agrupadas materializadas (tabla `series`).
+
+/api/series-agrupadas cargaba todos los episodios del catálogo como
+objetos ORM, les pasaba las regex de título base, agrupaba y ordenaba en
+Python y solo entonces cortaba la página. Aquí se mantiene una fila por
+serie con lo que la tarjeta necesita:
+
+  Contenido.serie_key   título base del episodio (key_for), calculado al
+                        insertar; NULL si la fila no es un episodio
+  Serie                 agregado de los episodios ACTIVOS de cada clave:
+                        primer id, imagen, año, géneros, nº de temporadas
+                        y episodios, último añadido
+
+Se refresca por claves (refresh) donde cambia el conjunto de episodios
+activos: imports M3U/RSS, scan VOD (desactiva caídos), borrado o
+reimportación de listas y deduplicado. El purge de caídos no lo toca: borra
+filas inactivas, que ya salieron del agregado al desactivarse. Cualquier
+otro camino (ediciones sueltas, cambios de tipo) lo corrige reconcile(),
+que corre una vez al día (scheduler).
+"""
+import logging
+import re
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_BATCH = 5000   # filas por vuelta del recálculo de claves (keyset por id)
+
+_EP_PATTERNS = [
+    r'\s+[Ss]\d{1,3}\s*[Ee]\d{1,3}.*$',           # S01E01, S01.E01, S01-E01
+    r'\s+\d{1,2}[xX]\d{1,3}.*$',                   # 1x01, 2x10
+    r'\s+[-–]\s*[Ss]eason\s*\d+.*$',                # - Season 1
+    r'\s+[-–]\s*[Tt]emporada\s*\d+.*$',             # - Temporada 1
+    r'\s+[Tt]\d+\s*[Ee]\d+.*$',                     # T1E01
+    r'\s+[-–:]\s*[Cc]ap[íi]tulo\s*\d+.*$',         # - Capitulo 1
+    r'\s+[-–:]\s*[Ee]p(?:isodio|isode)?\.?\s*\d+.*$',   # Episodio / Episode 1
+    # Limpieza del marcador de temporada suelto (formato IPTV: "Título S01 Título")
+    # Se aplica DESPUÉS de quitar el patrón SnnEmm para eliminar " S01 resto"
+    r'\s+[Ss]\d{1,2}\b.*$',                         # S01 ... al final
+    r'\s+[-–:]\s*\d+$',                              # número suelto al final
+]
+_EP_RES = [re.compile(p, re.IGNORECASE) for p in _EP_PATTERNS]
+
+
+def base_title(title: str) -> str:
+    """
+    Elimina info de temporada/episodio del título para agrupar series.
+    Maneja el formato IPTV habitual: "{título} S01 {título} - S01E52"
+    """
+    result = (title or '').strip()
+    for rx in _EP_RES:
+        new = rx.sub('', result).strip(' -–:')
+        if new:
+            result = new
+    return result or (title or '').strip()
+
+
+def is_episode(tipo: str, temporada) -> bool:
+    """
+    tipo='serie', o 'live'/'pelicula' con temporada (series mal clasificadas
+    por el parser antiguo o importadas antes del tipos_override).
+    """
+    return tipo == 'serie' or (tipo in ('live', 'pelicula') and temporada is not None)
+
+
+def key_for(titulo: str, tipo: str, temporada) -> str | None:
+    """Valor de Contenido.serie_key para una fila (None si no es episodio)."""
+    if not is_episode(tipo, temporada):
+        return None
+    return base_title(titulo)[:300] or None
+
+
+def episode_filter():
+    """El mismo criterio que is_episode(), como filtro SQL."""
+    from models import Contenido
+    from sqlalchemy import or_, and_
+    return or_(
+        Contenido.tipo == 'serie',
+        and_(Contenido.tipo.in_(('live', 'pelicula')), Contenido.temporada.isnot(None)),
+    )
+
+
+# ── Claves afectadas ───────────────────────────────────────────
+
+def keys_for_ids(ids) -> set:
+    """serie_key de esos contenidos (para refrescarlas tras borrarlos/desactivarlos)."""
+    from models import db, Contenido
+    ids = list(ids)
+    keys = set()
+    for i in range(0, len(ids), 900):
+        keys.update(r[0] for r in db.session.query(Contenido.serie_key).filter(
+            Contenido.id.in_(ids[i:i + 900]), Contenido.serie_key.isnot(None)).distinct())
+    return keys
+
+
+def keys_for_lista(lista_id: int) -> set:
+    from models import db, Contenido
+    return {r[0] for r in db.session.query(Contenido.serie_key).filter(
+        Contenido.lista_id == lista_id, Contenido.serie_key.isnot(None)).distinct()}
+
+
+# ── Recalcular el agregado ─────────────────────────────────────
+
+def refresh(keys) -> int:
+    """
+    Recalcula las filas de `series` de esas claves a partir de sus episodios
+    activos (orden de id, como el agrupado original: el primer episodio da
+    id, grupo y fuente). Las claves sin episodios activos se borran.
+    Llamar dentro de app_context; hace commit por trozo. Devuelve las
+    series escritas.
+    """
+    from models import db, Contenido, Serie
+
+    keys = sorted({k for k in keys if k})
+    written = 0
+    for i in range(0, len(keys), 900):
+        chunk = keys[i:i + 900]
+        groups: dict = {}
+        rows = (
+            db.session.query(
+                Contenido.id, Contenido.serie_key, Contenido.imagen, Contenido.año,
+                Contenido.genero, Contenido.group_title, Contenido.fuente,
+                Contenido.temporada, Contenido.fecha_agregado,
+            )
+            .filter(Contenido.serie_key.in_(chunk), Contenido.activo == True,
+                    episode_filter())
+            .order_by(Contenido.id)
+        )
+        for ep in rows:
+            g = groups.get(ep.serie_key)
+            if g is None:
+                g = groups[ep.serie_key] = {
+                    'first_id': ep.id, 'imagen': '', 'año': None, 'genero': None,
+                    'group_title': ep.group_title or '', 'fuente': ep.fuente,
+                    'seasons': set(), 'episodios': 0, 'added_at': None,
+                }
+            g['episodios'] += 1
+            if ep.temporada:
+                g['seasons'].add(ep.temporada)
+            if ep.imagen and not g['imagen']:
+                g['imagen'] = ep.imagen
+            if ep.año and not g['año']:
+                g['año'] = ep.año
+            if ep.genero and not g['genero'] and ep.genero.strip(' ,'):
+                g['genero'] = ep.genero
+            if ep.fecha_agregado and (not g['added_at'] or ep.fecha_agregado > g['added_at']):
+                g['added_at'] = ep.fecha_agregado
+
+        existing = {s.serie_key: s for s in Serie.query.filter(Serie.serie_key.in_(chunk))}
+        now = datetime.utcnow()
+        for key in chunk:
+            g, s = groups.get(key), existing.get(key)
+            if g is None:
+                if s is not None:
+                    db.session.delete(s)
+                continue
+            if s is None:
+                s = Serie(serie_key=key)
+                db.session.add(s)
+            s.titulo       = key
+            s.titulo_orden = key.lower()
+            s.first_id     = g['first_id']
+            s.imagen       = g['imagen']
+            s.año          = g['año']
+            s.genero       = (g['genero'] or '')[:300] or None
+            s.group_title  = g['group_title'][:300]
+            s.fuente       = g['fuente']
+            s.temporadas   = len(g['seasons']) or 1
+            s.episodios    = g['episodios']
+            s.added_at     = g['added_at']
+            s.updated_at   = now
+            written += 1
+        db.session.commit()
+    return written
+
+
+def refresh_safe(keys):
+    """refresh() que nunca rompe al llamante (import, scan…): reconcile lo arregla."""
+    from models import db
+    try:
+        refresh(keys)
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[Series] No se pudo refrescar el agregado: {e}')
+
+
+def reconcile() -> dict:
+    """
+    Recalcula serie_key de todo el catálogo (keyset por id, solo escribe
+    las que cambian) y rehace todas las filas de `series`. Llamar dentro
+    de app_context.
+    """
+    from models import db, Contenido, Serie
+    from sqlalchemy import update
+
+    fixed = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Contenido.id, Contenido.titulo, Contenido.tipo,
+                             Contenido.temporada, Contenido.serie_key)
+            .filter(Contenido.id > last_id)
+            .order_by(Contenido.id)
+            .limit(_BATCH)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        changes = []
+        for r in rows:
+            key = key_for(r.titulo, r.tipo, r.temporada)
+            if key != r.serie_key:
+                changes.append({'id': r.id, 'serie_key': key})
+        if changes:
+            db.session.execute(update(Contenido), changes)
+            db.session.commit()
+            fixed += len(changes)
+
+    keys = {r[0] for r in db.session.query(Contenido.serie_key)
+            .filter(Contenido.serie_key.isnot(None), Contenido.activo == True).distinct()}
+    keys.update(r[0] for r in db.session.query(Serie.serie_key))
+    written = refresh(keys)
+    import catalog_cache
+    catalog_cache.bump('series reconcile')
+    result = {'keys_fixed': fixed, 'series': written, 'removed': len(keys) - written}
+    logger.info(f'[Series] Reconciliado: {result}')
+    return result
+
+
+def install():
+    """
+    Primera vez (tabla series vacía con episodios en el catálogo): rellena
+    serie_key y el agregado. Llamar dentro de app_context tras _migrate_db().
+    """
+    from models import db, Contenido, Serie
+    if Serie.query.first() is not None:
+        return
+    if db.session.query(Contenido.id).filter(episode_filter()).first() is None:
+        return
+    logger.info('[Series] Creando el agregado de series del catálogo…')
+    try:
+        reconcile()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[Series] No se pudo crear el agregado: {e}')
@@ -0,0 +1,292 @@
+"""
+Tareas en background: scans, imports, purge y backups.
+
+Dos modos según BACKGROUND_WORKER:
+  0 → enqueue() ejecuta la tarea en un hilo del propio proceso web
+      (comportamiento de siempre; gunicorn debe ir con --workers 1)
+  1 → enqueue() solo inserta una fila en background_tasks y worker.py,
+      en su propio proceso, la reclama y la ejecuta. El web puede
+      escalar a varios workers de gunicorn sin duplicar trabajo.
+
+Los archivos M3U subidos se guardan en UPLOAD_DIR (no en memoria) para
+que el worker —u otro proceso de gunicorn— pueda leerlos.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+_UPLOAD_MAX_AGE = 24 * 3600    # uploads huérfanos (preview sin importar) se borran al día
+
+
+# ── Handlers ───────────────────────────────────────────────────
+# tipo → función(app, **args). Imports diferidos: routes_admin importa este módulo.
+
+def _task_scan_vod(app, run_id: int):
+    from scheduler import _run_vod_scan
+    _run_vod_scan(app, run_id)
+
+
+def _task_scan_live(app):
+    from link_checker import scan_live_channels, purge_live_scan_reports
+    result = scan_live_channels(app)
+    logger.info(f'[Tasks] Scan live: {result}')
+    purge_live_scan_reports(app, days=app.config.get('LIVE_REPORT_DAYS', 7))
+
+
+def _task_scan_curado(app):
+    from link_checker import scan_curated_channels
+    result = scan_curated_channels(app)
+    logger.info(f'[Tasks] Scan canales curados: {result}')
+
+
+def _task_import_lista(app, lista_id: int):
+    from routes_admin import _import_lista
+    _import_lista(app, lista_id)
+
+
+def _task_import_upload(app, lista_id: int, upload_id: str):
+    from routes_admin import _import_from_bytes
+    raw_bytes = read_upload(app, upload_id)
+    if raw_bytes is None:
+        raise RuntimeError(f'Archivo subido {upload_id} no encontrado')
+    _import_from_bytes(app, lista_id, raw_bytes)
+    # Se borra al terminar: si el worker muere a mitad, requeue_orphans la
+    # reencola y el reintento necesita el archivo
+    discard_upload(app, upload_id)
+
+
+def _task_import_rss(app, fuente_id: int):
+    from rss_importer import _do_import
+    _do_import(app, fuente_id)
+
+
+def _task_purge(app, days: int = 7):
+    from link_checker import purge_dead_links
+    result = purge_dead_links(app, days=days)
+    logger.info(f'[Tasks] Purge: {result}')
+
+
+def _task_backup(app, send_telegram: bool = False):
+    from backup import create_backup, send_backup_telegram
+    path = create_backup(app)
+    logger.info(f'[Tasks] Backup: {path.name}')
+    if send_telegram:
+        ok, msg = send_backup_telegram(app, path)
+        if not ok:
+            raise RuntimeError(msg)     # la tarea queda 'failed' con el motivo
+
+
+HANDLERS = {
+    'scan_vod':      _task_scan_vod,
+    'scan_live':     _task_scan_live,
+    'scan_curado':   _task_scan_curado,
+    'import_lista':  _task_import_lista,
+    'import_upload': _task_import_upload,
+    'import_rss':    _task_import_rss,
+    'purge':         _task_purge,
+    'backup':        _task_backup,
+}
+
+
+# ── Cola ───────────────────────────────────────────────────────
+
+def worker_mode(app) -> bool:
+    return bool(app.config.get('BACKGROUND_WORKER', 0))
+
+
+def enqueue(app, tipo: str, **args):
+    """
+    Programa la tarea `tipo`. En modo worker devuelve el id de la
+    BackgroundTask; en modo hilo lanza el hilo y devuelve None.
+    """
+    if tipo not in HANDLERS:
+        raise ValueError(f'Tipo de tarea desconocido: {tipo}')
+
+    if not worker_mode(app):
+        threading.Thread(target=_call_quiet, args=(app, tipo, args), daemon=True).start()
+        return None
+
+    from models import db, BackgroundTask
+    with app.app_context():
+        task = BackgroundTask(tipo=tipo, args_json=json.dumps(args))
+        db.session.add(task)
+        db.session.commit()
+        logger.info(f'[Tasks] Encolada {tipo} #{task.id} {args}')
+        return task.id
+
+
+def _call(app, tipo: str, args: dict):
+    try:
+        HANDLERS[tipo](app, **args)
+    except Exception as e:
+        logger.exception(f'[Tasks] Error en {tipo} {args}: {e}')
+        raise
+
+
+def _call_quiet(app, tipo: str, args: dict):
+    try:
+        _call(app, tipo, args)
+    except Exception:
+        pass    # ya registrado en _call
+
+
+def worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_next(app, worker: str = None):
+    """
+    Reclama la tarea pendiente más antigua. Devuelve (id, tipo, args) o None.
+    El UPDATE … WHERE estado='pending' es atómico: si otro worker la coge
+    antes, rowcount es 0 y se prueba con la siguiente.
+    """
+    from models import db, BackgroundTask
+    worker = worker or worker_id()
+    with app.app_context():
+        candidates = (
+            db.session.query(BackgroundTask.id)
+            .filter(BackgroundTask.estado == 'pending')
+            .order_by(BackgroundTask.id)
+            .limit(5).all()
+        )
+        for (task_id,) in candidates:
+            claimed = BackgroundTask.query.filter(
+                BackgroundTask.id == task_id,
+                BackgroundTask.estado == 'pending',
+            ).update({
+                'estado':     'running',
+                'worker':     worker,
+                'started_at': datetime.utcnow(),
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                task = BackgroundTask.query.get(task_id)
+                return task.id, task.tipo, task.args
+        return None
+
+
+def run_task(app, task_id: int, tipo: str, args: dict):
+    """Ejecuta una tarea ya reclamada y guarda el resultado en su fila."""
+    from models import db, BackgroundTask
+    t0 = time.monotonic()
+    error = None
+    try:
+        _call(app, tipo, args)
+    except Exception as e:
+        error = str(e)[:1000] or type(e).__name__
+
+    with app.app_context():
+        BackgroundTask.query.filter_by(id=task_id).update({
+            'estado':      'failed' if error else 'done',
+            'error':       error,
+            'finished_at': datetime.utcnow(),
+        }, synchronize_session=False)
+        db.session.commit()
+    logger.info(f'[Tasks] {tipo} #{task_id} {"falló" if error else "terminada"} '
+                f'en {time.monotonic() - t0:.1f}s')
+
+
+def requeue_orphans(app, worker: str = None) -> int:
+    """
+    Devuelve a 'pending' las tareas que quedaron 'running' en este host
+    (el worker murió a mitad). Los scans VOD no hace falta: sus ScanRun
+    se reanudan con resume_scan_runs().
+    """
+    from sqlalchemy import case
+    from models import db, BackgroundTask
+    host = (worker or worker_id()).split(':')[0]
+    with app.app_context():
+        n = BackgroundTask.query.filter(
+            BackgroundTask.estado == 'running',
+            BackgroundTask.worker.like(f'{host}:%'),
+        ).update({
+            'estado': case((BackgroundTask.tipo == 'scan_vod', 'done'), else_='pending'),
+            'worker': None,
+        }, synchronize_session=False)
+        db.session.commit()
+    if n:
+        logger.info(f'[Tasks] {n} tarea(s) interrumpida(s) vuelven a la cola')
+    return n
+
+
+def purge_finished(app, days: int = 7) -> int:
+    """Borra el historial de tareas terminadas hace más de `days` días."""
+    from models import db, BackgroundTask
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with app.app_context():
+        n = BackgroundTask.query.filter(
+            BackgroundTask.estado.in_(('done', 'failed')),
+            BackgroundTask.finished_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return n
+
+
+# ── Archivos subidos ───────────────────────────────────────────
+
+def _upload_dir(app) -> str:
+    path = app.config.get('UPLOAD_DIR') or os.path.join(app.root_path, 'instance', 'uploads')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _upload_path(app, upload_id: str):
+    # upload_id viene del formulario: solo se aceptan UUID
+    try:
+        upload_id = str(uuid.UUID(upload_id))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return os.path.join(_upload_dir(app), f'{upload_id}.m3u')
+
+
+def save_upload(app, raw_bytes: bytes) -> str:
+    """Guarda un M3U subido en UPLOAD_DIR y devuelve su id."""
+    directory = _upload_dir(app)
+    now = time.time()
+    for name in os.listdir(directory):
+        full = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(full) > _UPLOAD_MAX_AGE:
+                os.remove(full)
+        except OSError:
+            pass
+
+    upload_id = str(uuid.uuid4())
+    tmp = os.path.join(directory, f'.{upload_id}.part')
+    with open(tmp, 'wb') as f:
+        f.write(raw_bytes)
+    os.replace(tmp, _upload_path(app, upload_id))
+    return upload_id
+
+
+def read_upload(app, upload_id: str):
+    """Lee un upload. None si no existe (o el id no es válido)."""
+    path = _upload_path(app, upload_id)
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def discard_upload(app, upload_id: str):
+    path = _upload_path(app, upload_id)
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def pop_upload(app, upload_id: str):
+    """Lee y borra un upload. None si no existe (o el id no es válido)."""
+    data = read_upload(app, upload_id)
+    if data is not None:
+        discard_upload(app, upload_id)
+    return data
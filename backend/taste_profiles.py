@@ -0,0 +1,233 @@
+"""
+Perfiles de gustos por sesión y por usuario (tabla taste_profiles).
+
+Cada /api/recomendaciones releía las últimas 50 filas de WatchHistory de
+la sesión y rehacía desde cero el mapa de pesos por género. Aquí el
+perfil se mantiene incrementalmente:
+
+  clave     's:<session_key>' (anónimo) y 'u:<user_id>' (con sesión
+            iniciada, común a todos sus dispositivos)
+  weights   {genero_id: peso}: en cada reproducción los pesos se
+            multiplican por TASTE_DECAY y los géneros del contenido
+            suman 1 (lo reciente pesa más, como el 1/(i+1) de antes)
+  recent    ids vistos, el más reciente primero (máx. _RECENT)
+
+/api/watch lo actualiza (record) al registrar una reproducción nueva.
+Las lecturas pasan por una LRU en memoria acotada (TASTE_PROFILE_CACHE
+entradas) con un TTL corto (TASTE_PROFILE_TTL): otro worker de gunicorn
+puede haber escrito el perfil, así que una entrada caducada se relee por
+clave primaria. install() rellena la tabla desde WatchHistory la primera
+vez.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_RECENT = 50        # ids vistos que se recuerdan (excluidos de las recomendaciones)
+_MAX_GENRES = 40    # géneros por perfil (se descartan los de menos peso)
+_MIN_WEIGHT = 0.01  # pesos por debajo se descartan
+
+_decay = 0.85
+_ttl = 30
+_max_entries = 10000
+
+_lock = threading.Lock()
+_cache: OrderedDict = OrderedDict()   # clave → (expira, perfil)
+
+
+def key_for(session_key: str = None, user_id: int = None) -> str | None:
+    if user_id:
+        return f'u:{user_id}'
+    if session_key:
+        return f's:{session_key}'
+    return None
+
+
+def _empty() -> dict:
+    return {'weights': {}, 'recent': [], 'events': 0}
+
+
+def apply(profile: dict, contenido_id: int, genero_ids, decay: float = None) -> dict:
+    """Añade una reproducción al perfil (lo modifica y lo devuelve)."""
+    d = _decay if decay is None else decay
+    weights = {g: w * d for g, w in profile['weights'].items() if w * d >= _MIN_WEIGHT}
+    for g in dict.fromkeys(genero_ids):
+        weights[g] = weights.get(g, 0.0) + 1.0
+    if len(weights) > _MAX_GENRES:
+        weights = dict(sorted(weights.items(), key=lambda kv: kv[1], reverse=True)[:_MAX_GENRES])
+    recent = [contenido_id] + [c for c in profile['recent'] if c != contenido_id]
+    profile['weights'] = weights
+    profile['recent'] = recent[:_RECENT]
+    profile['events'] = profile.get('events', 0) + 1
+    return profile
+
+
+# ── Tabla ──────────────────────────────────────────────────────
+
+def _decode(row) -> dict:
+    return {
+        'weights': {int(g): w for g, w in json.loads(row.weights or '{}').items()},
+        'recent':  json.loads(row.recent or '[]'),
+        'events':  row.events or 0,
+    }
+
+
+def _load(key: str) -> dict | None:
+    from models import db, TasteProfile
+    row = db.session.get(TasteProfile, key)
+    return _decode(row) if row is not None else None
+
+
+def _values(p: dict) -> dict:
+    return {
+        'weights': json.dumps({str(g): round(w, 4) for g, w in p['weights'].items()}),
+        'recent':  json.dumps(p['recent']),
+        'events':  p['events'],
+    }
+
+
+def _save_rows(profiles: dict):
+    """Escribe {clave: perfil} (insert o update). No hace commit."""
+    from models import db, TasteProfile
+    now = datetime.utcnow()
+    for key, p in profiles.items():
+        row = db.session.get(TasteProfile, key)
+        if row is None:
+            row = TasteProfile(profile_key=key)
+            db.session.add(row)
+        for attr, value in _values(p).items():
+            setattr(row, attr, value)
+        row.updated_at = now
+
+
+# ── LRU ────────────────────────────────────────────────────────
+
+def _cache_get(key: str):
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit is None or hit[0] <= now:
+            return None
+        _cache.move_to_end(key)
+        return hit[1]
+
+
+def _cache_put(key: str, profile):
+    with _lock:
+        _cache[key] = (time.monotonic() + _ttl, profile)
+        _cache.move_to_end(key)
+        while len(_cache) > _max_entries:
+            _cache.popitem(last=False)
+
+
+def get(session_key: str = None, user_id: int = None) -> dict:
+    """
+    Perfil para recomendar: el del usuario si lo tiene, si no el de la
+    sesión; vacío si no hay ninguno. No lo modifiques (es el de la LRU).
+    Requiere app_context.
+    """
+    for key in (key_for(None, user_id), key_for(session_key)):
+        if not key:
+            continue
+        profile = _cache_get(key)
+        if profile is None:
+            profile = _load(key) or _empty()
+            _cache_put(key, profile)
+        if profile['events']:
+            return profile
+    return _empty()
+
+
+def record(session_key: str, user_id, contenido_id: int, genero_ids) -> None:
+    """
+    Suma una reproducción a los perfiles de la sesión y del usuario. Relee
+    de la tabla (no de la LRU) para no pisar lo que haya escrito otro
+    worker. Hace commit. Llamar dentro de app_context.
+    """
+    from models import db
+    keys = [k for k in (key_for(session_key), key_for(None, user_id)) if k]
+    profiles = {}
+    for key in keys:
+        profiles[key] = apply(_load(key) or _empty(), contenido_id, genero_ids)
+    try:
+        _save_rows(profiles)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[Taste] No se pudo guardar el perfil: {e}')
+        return
+    for key, profile in profiles.items():
+        _cache_put(key, profile)
+
+
+# ── Relleno inicial ────────────────────────────────────────────
+
+def backfill(batch: int = 5000) -> int:
+    """
+    Rehace los perfiles desde WatchHistory (reproducciones en orden, con
+    los géneros de genres_snapshot). Llamar dentro de app_context; hace
+    commit. Devuelve los perfiles escritos.
+    """
+    from models import db, WatchHistory, Genero, TasteProfile
+    import genres
+    by_clave = dict(db.session.query(Genero.clave, Genero.id))
+    profiles: dict = {}
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(WatchHistory.id, WatchHistory.session_key, WatchHistory.user_id,
+                             WatchHistory.contenido_id, WatchHistory.genres_snapshot)
+            .filter(WatchHistory.id > last_id)
+            .order_by(WatchHistory.id)
+            .limit(batch)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for r in rows:
+            gids = [by_clave[k] for k in (genres.clave(n) for n in genres.split(r.genres_snapshot))
+                    if k in by_clave]
+            for key in (key_for(r.session_key), key_for(None, r.user_id)):
+                if key:
+                    apply(profiles.setdefault(key, _empty()), r.contenido_id, gids)
+    db.session.query(TasteProfile).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    rows = [{'profile_key': k, 'updated_at': now, **_values(p)} for k, p in profiles.items()]
+    for i in range(0, len(rows), batch):
+        db.session.execute(TasteProfile.__table__.insert(), rows[i:i + batch])
+    db.session.commit()
+    with _lock:
+        _cache.clear()
+    logger.info(f'[Taste] {len(profiles)} perfiles calculados desde el historial')
+    return len(profiles)
+
+
+def install(app):
+    """
+    Configura desde app.config y, si la tabla está vacía y hay historial,
+    la rellena. Llamar tras create_all().
+    """
+    global _decay, _ttl, _max_entries
+    from models import db, WatchHistory, TasteProfile
+    _decay = app.config.get('TASTE_DECAY', 0.85)
+    _ttl = app.config.get('TASTE_PROFILE_TTL', 30)
+    _max_entries = app.config.get('TASTE_PROFILE_CACHE', 10000)
+    with _lock:
+        _cache.clear()
+    with app.app_context():
+        if db.session.query(TasteProfile.profile_key).first() is not None:
+            return
+        if db.session.query(WatchHistory.id).first() is None:
+            return
+        logger.info('[Taste] Calculando los perfiles de gustos desde el historial…')
+        try:
+            backfill()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f'[Taste] No se pudieron calcular los perfiles: {e}')
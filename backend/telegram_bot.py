@@ -121,8 +121,8 @@ def send_test(token: str, chat_id: str) -> tuple[bool, str]:
 # ─────────────────────────────────────────────
 
 def notify_scan_report(app, checked: int, alive: int, dead: int, purged: int = 0,
-                       scan_type: str = "VOD"):
-    """Reporte tras un escaneo de links."""
+                       scan_type: str = "VOD", metrics: dict = None):
+    """Reporte tras un escaneo de links (+ telemetría de scan_metrics.run_summary)."""
     if checked == 0:
         return
     pct_dead = round(dead / checked * 100, 1)
@@ -136,6 +136,17 @@ def notify_scan_report(app, checked: int, alive: int, dead: int, purged: int = 0
     ]
     if purged:
         lines.append(f"🗑️ Eliminados: <b>{purged:,}</b>")
+    if metrics and metrics.get("probes"):
+        pct = lambda v: f"{v * 100:.1f}%"
+        lines += [
+            "",
+            f"⚡ {metrics.get('probes_per_s') or 0} sondas/s · "
+            f"p50 {metrics.get('p50_ms') or '—'} ms · p95 {metrics.get('p95_ms') or '—'} ms",
+            f"⏱️ Timeouts {pct(metrics['timeout_rate'])} · HTML {pct(metrics['html_rate'])} · "
+            f"reintentos UA {pct(metrics['ua_retry_rate'])}",
+        ]
+        for h in metrics.get("worst_hosts") or []:
+            lines.append(f"   <code>{h['servidor']}</code> timeouts {pct(h['timeout_rate'])}")
     lines.append(f"\n🕐 {_now()}")
     notify_all(app, "\n".join(lines))
 
@@ -198,14 +209,16 @@ def notify_import_error(app, lista_nombre: str, error: str):
 
 def notify_daily_digest(app):
     """Resumen diario de estadísticas."""
-    from models import Contenido, User
+    from models import User
+    import catalog_counters
     with app.app_context():
-        total    = Contenido.query.filter_by(fuente='m3u').count()
-        activos  = Contenido.query.filter_by(fuente='m3u', activo=True).count()
+        counters = catalog_counters.snapshot()
+        total    = catalog_counters.count(counters, fuente='m3u')
+        activos  = catalog_counters.count(counters, fuente='m3u', activo=True)
         caidos   = total - activos
-        peliculas = Contenido.query.filter_by(fuente='m3u', tipo='pelicula', activo=True).count()
-        series_c  = Contenido.query.filter_by(fuente='m3u', tipo='serie',    activo=True).count()
-        live_c    = Contenido.query.filter_by(fuente='m3u', tipo='live',     activo=True).count()
+        peliculas = catalog_counters.count(counters, fuente='m3u', tipo='pelicula', activo=True)
+        series_c  = catalog_counters.count(counters, fuente='m3u', tipo='serie',    activo=True)
+        live_c    = catalog_counters.count(counters, fuente='m3u', tipo='live',     activo=True)
         users     = User.query.filter_by(activo=True).count()
         pct_ok    = round(activos / total * 100, 1) if total else 0
 
@@ -321,10 +334,12 @@ def _cmd_ayuda(token: str, chat_id: str):
 
 
 def _cmd_estado(app, token: str, chat_id: str):
-    from models import Contenido, User
+    from models import User
+    import catalog_counters
     with app.app_context():
-        total   = Contenido.query.filter_by(fuente='m3u').count()
-        activos = Contenido.query.filter_by(fuente='m3u', activo=True).count()
+        counters = catalog_counters.snapshot()
+        total   = catalog_counters.count(counters, fuente='m3u')
+        activos = catalog_counters.count(counters, fuente='m3u', activo=True)
         caidos  = total - activos
         users   = User.query.filter_by(activo=True).count()
         pct     = round(activos / total * 100, 1) if total else 0
@@ -369,13 +384,14 @@ def _cmd_servidores(app, token: str, chat_id: str):
 
 
 def _cmd_stats(app, token: str, chat_id: str):
-    from models import Contenido
+    import catalog_counters
     with app.app_context():
-        total     = Contenido.query.filter_by(fuente='m3u').count()
-        activos   = Contenido.query.filter_by(fuente='m3u', activo=True).count()
-        peliculas = Contenido.query.filter_by(fuente='m3u', tipo='pelicula', activo=True).count()
-        series    = Contenido.query.filter_by(fuente='m3u', tipo='serie',    activo=True).count()
-        live      = Contenido.query.filter_by(fuente='m3u', tipo='live',     activo=True).count()
+        counters  = catalog_counters.snapshot()
+        total     = catalog_counters.count(counters, fuente='m3u')
+        activos   = catalog_counters.count(counters, fuente='m3u', activo=True)
+        peliculas = catalog_counters.count(counters, fuente='m3u', tipo='pelicula', activo=True)
+        series    = catalog_counters.count(counters, fuente='m3u', tipo='serie',    activo=True)
+        live      = catalog_counters.count(counters, fuente='m3u', tipo='live',     activo=True)
         pct       = round(activos / total * 100, 1) if total else 0
 
     text = (
@@ -0,0 +1,63 @@
+"""
+Fixtures de los tests: create_app() sobre una BD SQLite temporal por test
+(nunca toca instance/) y un helper para sembrar contenidos.
+
+Desde backend/:  python -m pytest tests
+"""
+import hashlib
+
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+    from models import db
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        UPLOAD_DIR = str(tmp_path / 'uploads')
+        AUTO_SCAN = 0
+        BACKGROUND_WORKER = 0
+
+    app = create_app(TestConfig)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    """seed(n, tipo='pelicula', lista=True, **columnas) → ids creados, en orden."""
+    from models import db, Contenido, Lista
+
+    def _seed(n, tipo='pelicula', lista=True, **cols):
+        with app.app_context():
+            lista_id = None
+            if lista:
+                row = Lista(nombre='Lista test', url='http://lista.example/l.m3u')
+                db.session.add(row)
+                db.session.flush()
+                lista_id = row.id
+            items = []
+            for i in range(n):
+                url = f'http://vod.example/{tipo}/{lista_id}/{i}.mp4'
+                items.append(Contenido(
+                    titulo=f'{tipo.capitalize()} {i:03d}', tipo=tipo, url_stream=url,
+                    url_hash=hashlib.md5(f'{url}{lista_id}'.encode()).hexdigest(),
+                    fuente='m3u', servidor='vod.example', lista_id=lista_id,
+                    **{'año': 2000 + i % 20, **cols}))
+            db.session.add_all(items)
+            db.session.commit()
+            return [c.id for c in items]
+
+    return _seed
@@ -0,0 +1,65 @@
+"""Caché de respuestas (catalog_cache): claves, ETag e invalidación."""
+from datetime import datetime, timedelta
+
+import catalog_cache
+from models import db, CatalogGeneration
+
+
+def test_cursor_and_page_mode_do_not_share_entries(client, seed):
+    seed(30)
+    page = client.get('/api/contenido')
+    cursor = client.get('/api/contenido?cursor=')
+    assert page.headers['X-Cache'] == 'MISS'
+    assert cursor.headers['X-Cache'] == 'MISS'
+    assert 'pages' in page.get_json()
+    assert 'next_cursor' in cursor.get_json()
+
+    assert client.get('/api/contenido').headers['X-Cache'] == 'HIT'
+    again = client.get('/api/contenido?cursor=')
+    assert again.headers['X-Cache'] == 'HIT'
+    assert 'next_cursor' in again.get_json()
+
+
+def test_etag_depends_on_pagination_mode(client, seed):
+    seed(5)
+    page = client.get('/api/contenido')
+    cursor = client.get('/api/contenido?cursor=')
+    assert page.headers['ETag'] != cursor.headers['ETag']
+
+    same = client.get('/api/contenido', headers={'If-None-Match': page.headers['ETag']})
+    assert same.status_code == 304
+    other = client.get('/api/contenido?cursor=', headers={'If-None-Match': page.headers['ETag']})
+    assert other.status_code == 200
+    assert 'next_cursor' in other.get_json()
+
+
+def test_request_key_ignores_arg_order_and_empty_values(app):
+    with app.test_request_context('/api/contenido?tipo=pelicula&genero=&sort=recent'):
+        a = catalog_cache._request_key(False)
+    with app.test_request_context('/api/contenido?sort=recent&tipo=pelicula'):
+        b = catalog_cache._request_key(False)
+    assert a == b
+
+
+def test_bump_invalidates_cached_responses(app, client, seed):
+    seed(3)
+    client.get('/api/stats')
+    assert client.get('/api/stats').headers['X-Cache'] == 'HIT'
+    with app.app_context():
+        catalog_cache.bump('test')
+    assert client.get('/api/stats').headers['X-Cache'] == 'MISS'
+
+
+def test_bump_coalesced_once_per_window(app):
+    with app.app_context():
+        row = db.session.get(CatalogGeneration, 1)
+        row.updated_at = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+        start = catalog_cache._read_generation()
+        for _ in range(3):
+            catalog_cache.bump_coalesced('test')
+        assert catalog_cache._read_generation() == start + 1
+        # Un bump normal también abre una ventana nueva
+        catalog_cache.bump('test')
+        catalog_cache.bump_coalesced('test')
+        assert catalog_cache._read_generation() == start + 2
@@ -0,0 +1,70 @@
+"""Contadores del catálogo mantenidos por triggers (catalog_counters.py)."""
+import pytest
+
+import catalog_counters
+from models import db, Contenido
+
+
+@pytest.fixture(autouse=True)
+def _requires_triggers(app):
+    if catalog_counters._backend != 'triggers':
+        pytest.skip('sin triggers (no es SQLite)')
+
+
+def _assert_matches_group_by(app):
+    with app.app_context():
+        stored = {k: n for k, n in catalog_counters.snapshot().items() if n}
+        assert stored == catalog_counters._grouped(db)
+
+
+def test_insert_counts(app, seed):
+    seed(4, tipo='pelicula')
+    seed(2, tipo='live')
+    with app.app_context():
+        rows = catalog_counters.snapshot()
+        assert catalog_counters.count(rows, tipo='pelicula', activo=True) == 4
+        assert catalog_counters.count(rows, tipo='live') == 2
+        assert catalog_counters.count(rows, fuente='m3u') == 6
+    _assert_matches_group_by(app)
+
+
+def test_update_moves_between_keys(app, seed):
+    ids = seed(3, tipo='serie')
+    with app.app_context():
+        db.session.get(Contenido, ids[0]).activo = False
+        db.session.get(Contenido, ids[1]).tipo = 'pelicula'
+        db.session.commit()
+        rows = catalog_counters.snapshot()
+        assert catalog_counters.count(rows, tipo='serie', activo=True) == 1
+        assert catalog_counters.count(rows, tipo='serie', activo=False) == 1
+        assert catalog_counters.count(rows, tipo='pelicula') == 1
+    _assert_matches_group_by(app)
+
+
+def test_delete_and_bulk_update(app, seed):
+    ids = seed(5)
+    with app.app_context():
+        Contenido.query.filter(Contenido.id.in_(ids[:2])).delete(synchronize_session=False)
+        Contenido.query.filter(Contenido.id.in_(ids[2:4])).update(
+            {'activo': False}, synchronize_session=False)
+        db.session.commit()
+        rows = catalog_counters.snapshot()
+        assert catalog_counters.count(rows, activo=True) == 1
+        assert catalog_counters.count(rows, activo=False) == 2
+    _assert_matches_group_by(app)
+
+
+def test_lista_filter(app, seed):
+    seed(2)
+    seed(3)
+    with app.app_context():
+        assert catalog_counters.count(lista_ids=[1]) == 2
+        assert catalog_counters.count(lista_ids=[2]) == 3
+
+
+def test_reconcile_reports_no_drift(app, seed):
+    seed(6)
+    with app.app_context():
+        result = catalog_counters.reconcile()
+    assert result['drift'] == 0
+    assert result['total'] == 6
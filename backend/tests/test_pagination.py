@@ -0,0 +1,92 @@
+"""Paginación por cursor (keyset) de /api/contenido."""
+import base64
+import json
+
+import pytest
+
+# Clave de orden de cada sort sobre el dict de la API (para comprobar el orden)
+_ORDER = {
+    'recent':    (lambda it: it['addedAt'], True),
+    'year_desc': (lambda it: it['year'], True),
+    'year_asc':  (lambda it: it['year'], False),
+    'title_asc': (lambda it: it['title'], False),
+}
+
+
+def _walk(client, url, limit):
+    """Recorre todas las páginas siguiendo next_cursor: (items, total, páginas)."""
+    items, cursor, pages = [], '', 0
+    while True:
+        data = client.get(f'{url}&limit={limit}&cursor={cursor}').get_json()
+        items += data['items']
+        pages += 1
+        if not data['has_more']:
+            return items, data['total'], pages
+        cursor = data['next_cursor']
+        assert cursor
+
+
+@pytest.mark.parametrize('sort', sorted(_ORDER))
+def test_cursor_walk_covers_catalog_in_order(client, seed, sort):
+    ids = seed(25)
+    items, total, pages = _walk(client, f'/api/contenido?sort={sort}', 10)
+    walked = [it['id'] for it in items]
+    assert total == 25
+    assert pages == 3
+    assert len(walked) == len(set(walked)) == 25
+    assert set(walked) == set(ids)
+
+    key, desc = _ORDER[sort]
+    keys = [key(it) for it in items]
+    assert keys == sorted(keys, reverse=desc)
+
+
+def test_cursor_walk_with_ties(client, seed):
+    # Mismo año en todas: el orden lo decide el desempate (fecha, id)
+    seed(12, **{'año': 2015})
+    items, total, _ = _walk(client, '/api/contenido?sort=year_desc&tipo=pelicula', 5)
+    assert len({it['id'] for it in items}) == total == 12
+
+
+def test_invalid_cursor_is_rejected(client, seed):
+    seed(3)
+    assert client.get('/api/contenido?cursor=no-es-un-cursor').status_code == 400
+
+
+def _cursor(data) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('q, data', [
+    ('q=pelicula', {'s': 'relevance', 'o': 'abc'}),
+    ('q=pelicula', {'s': 'relevance', 'o': [1]}),
+    ('sort=recent', {'s': 'recent', 'v': [None, None]}),
+    ('sort=recent', {'s': 'recent', 'v': [[1], {'a': 1}]}),
+    ('sort=recent', {'s': 'recent', 'v': [True, 1]}),
+    ('sort=title_asc', {'s': 'title_asc', 'v': ['Pelicula 001']}),
+    ('sort=recent', {'s': 'recent', 'v': ['no-es-fecha', 1]}),
+    ('sort=recent', [1, 2]),
+])
+def test_malformed_cursor_is_rejected(client, seed, q, data):
+    seed(3)
+    r = client.get(f'/api/contenido?{q}&cursor={_cursor(data)}')
+    assert r.status_code == 400
+
+
+def test_cursor_from_another_sort_is_rejected(client, seed):
+    seed(15)
+    data = client.get('/api/contenido?sort=recent&limit=5&cursor=').get_json()
+    r = client.get(f'/api/contenido?sort=title_asc&limit=5&cursor={data["next_cursor"]}')
+    assert r.status_code == 400
+
+
+
+def test_fecha_agregado_is_never_null(app, seed):
+    # El keyset no compara NULL: una fila sin fecha desaparecería del cursor
+    import sqlalchemy.exc
+    from models import db, Contenido
+    ids = seed(1)
+    with app.app_context():
+        db.session.get(Contenido, ids[0]).fecha_agregado = None
+        with pytest.raises(sqlalchemy.exc.IntegrityError):
+            db.session.commit()
@@ -0,0 +1,88 @@
+"""Cola de tareas (tasks.py): reclamar, reencolar huérfanas y uploads."""
+import pytest
+
+import tasks
+from models import db, BackgroundTask
+
+
+@pytest.fixture
+def worker_app(app):
+    app.config['BACKGROUND_WORKER'] = 1
+    return app
+
+
+def _estado(app, task_id):
+    with app.app_context():
+        return db.session.get(BackgroundTask, task_id).estado
+
+
+def test_claim_next_takes_oldest_pending_once(worker_app):
+    first = tasks.enqueue(worker_app, 'scan_live')
+    second = tasks.enqueue(worker_app, 'purge', days=3)
+
+    claimed = tasks.claim_next(worker_app, 'host-a:1')
+    assert claimed == (first, 'scan_live', {})
+    claimed = tasks.claim_next(worker_app, 'host-b:1')
+    assert claimed == (second, 'purge', {'days': 3})
+    assert tasks.claim_next(worker_app, 'host-a:1') is None
+    assert _estado(worker_app, first) == 'running'
+
+
+def test_enqueue_rejects_unknown_type(worker_app):
+    with pytest.raises(ValueError):
+        tasks.enqueue(worker_app, 'no_existe')
+
+
+def test_requeue_orphans_only_touches_this_host(worker_app):
+    mine = tasks.enqueue(worker_app, 'scan_live')
+    scan = tasks.enqueue(worker_app, 'scan_vod', run_id=1)
+    other = tasks.enqueue(worker_app, 'scan_curado')
+    tasks.claim_next(worker_app, 'host-a:100')
+    tasks.claim_next(worker_app, 'host-a:100')
+    tasks.claim_next(worker_app, 'host-b:200')
+
+    # El worker de host-a reinicia con otro pid
+    assert tasks.requeue_orphans(worker_app, 'host-a:101') == 2
+    assert _estado(worker_app, mine) == 'pending'
+    assert _estado(worker_app, scan) == 'done'      # el ScanRun se reanuda por su cuenta
+    assert _estado(worker_app, other) == 'running'
+    assert tasks.claim_next(worker_app, 'host-a:101')[0] == mine
+
+
+def test_run_task_records_failure(worker_app):
+    task_id = tasks.enqueue(worker_app, 'import_upload', lista_id=1,
+                            upload_id='00000000-0000-0000-0000-000000000000')
+    tasks.run_task(worker_app, *tasks.claim_next(worker_app, 'host-a:1'))
+    with worker_app.app_context():
+        task = db.session.get(BackgroundTask, task_id)
+        assert task.estado == 'failed'
+        assert 'no encontrado' in task.error
+
+
+def test_requeued_import_upload_still_has_its_file(worker_app, seed):
+    seed(0)
+    upload_id = tasks.save_upload(worker_app, b'#EXTM3U\n')
+    tasks.enqueue(worker_app, 'import_upload', lista_id=1, upload_id=upload_id)
+    tasks.claim_next(worker_app, 'host-a:1')
+    tasks.requeue_orphans(worker_app, 'host-a:2')
+    assert tasks.read_upload(worker_app, upload_id) == b'#EXTM3U\n'
+
+
+def test_upload_ids_must_be_uuids(worker_app):
+    assert tasks.read_upload(worker_app, '../../etc/passwd') is None
+    upload_id = tasks.save_upload(worker_app, b'data')
+    assert tasks.pop_upload(worker_app, upload_id) == b'data'
+    assert tasks.read_upload(worker_app, upload_id) is None
+
+
+def test_failed_backup_send_marks_task_failed(worker_app, monkeypatch, tmp_path):
+    import backup
+    monkeypatch.setattr(backup, 'create_backup', lambda app: tmp_path / 'b.db')
+    monkeypatch.setattr(backup, 'send_backup_telegram',
+                        lambda app, path: (False, 'No se pudo enviar el backup a ningún destino.'))
+    task_id = tasks.enqueue(worker_app, 'backup', send_telegram=True)
+    tasks.run_task(worker_app, *tasks.claim_next(worker_app, 'host-a:1'))
+    with worker_app.app_context():
+        task = db.session.get(BackgroundTask, task_id)
+        assert task.estado == 'failed'
+        assert 'ningún destino' in task.error
@@ -0,0 +1,301 @@
+"""
+Tendencias por popularidad reciente (tabla trending_items).
+
+/api/trending tomaba limit*20 contenidos del último año, los barajaba y
+deduplicaba series por título base: no usaba WatchHistory. Aquí un job del
+scheduler calcula la popularidad con decaimiento temporal:
+
+  score      sesiones distintas por día × 0.5 ^ (edad / vida media),
+             sumado en la ventana (TRENDING_WINDOW_DAYS)
+  unidad     película → su fila; serie → serie_key (suma de sus
+             episodios, representada por el episodio más visto)
+  pools      por tipo ('pelicula' | 'serie') y ámbito de visibilidad
+             (owner_id 0 = global, N = listas privadas del usuario N),
+             los `pool_size` mejores de cada uno
+
+Si hay poco historial, cada pool global se completa con lo más reciente
+(score 0), como hacía el endpoint antes. La petición lee el pool (caché en
+proceso de unos segundos) y elige `limit` con un muestreo ponderado por
+score sobre los primeros puestos, así que cambia en cada carga.
+
+Recalcular no depende del scheduler (que solo corre con AUTO_SCAN=1): la
+lectura comprueba cada _CHECK_EVERY segundos la fecha del pool; vacío se
+calcula en la petición, más viejo que TRENDING_REFRESH_MINUTES se
+recalcula en un hilo. Imports, scans VOD y purges lo recalculan al
+terminar (rebuild_safe).
+"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+_TIPOS = ('pelicula', 'serie')
+_FLOOR = 0.1          # peso de muestreo mínimo (relleno sin reproducciones)
+_WINDOW_FACTOR = 3    # se muestrea entre los limit*3 primeros del pool
+_POOL_TTL = 60        # segundos que se reutiliza un pool leído de la BD
+_CHECK_EVERY = 30     # segundos entre comprobaciones de la fecha del pool
+
+_app = None
+_window_days = 30
+_half_life_hours = 72.0
+_pool_size = 300
+_refresh_minutes = 15
+
+_checked_at = 0.0     # monotonic de la última comprobación
+_building = False
+
+_lock = threading.Lock()
+_pools: dict = {}     # (owner_id, tipo) → (expira, tamaño pedido, [(contenido_id, serie_key, score)])
+
+
+# ── Cálculo (scheduler) ────────────────────────────────────────
+
+def _decay(days_ago: float, half_life_hours: float) -> float:
+    return 0.5 ** (max(days_ago, 0.0) * 24.0 / half_life_hours)
+
+
+def _scores(window_days: int, half_life_hours: float) -> dict:
+    """{contenido_id: score} desde WatchHistory, agrupado por día en SQL."""
+    from models import db, WatchHistory
+    from sqlalchemy import func
+    now = datetime.utcnow()
+    day = func.date(WatchHistory.played_at)
+    rows = (
+        db.session.query(WatchHistory.contenido_id, day,
+                         func.count(func.distinct(WatchHistory.session_key)))
+        .filter(WatchHistory.played_at >= now - timedelta(days=window_days))
+        .group_by(WatchHistory.contenido_id, day)
+        .all()
+    )
+    scores: dict = {}
+    for cid, d, sessions in rows:
+        if d is None:
+            continue
+        if isinstance(d, str):
+            d = datetime.strptime(d[:10], '%Y-%m-%d')
+        # mediodía del día como edad media de sus reproducciones
+        mid = datetime(d.year, d.month, d.day, 12)
+        days_ago = (now - mid).total_seconds() / 86400
+        scores[cid] = scores.get(cid, 0.0) + sessions * _decay(days_ago, half_life_hours)
+    return scores
+
+
+def _units(scores: dict) -> dict:
+    """
+    Agrupa los scores por unidad del pool: {(owner_id, tipo): {unidad: fila}}
+    con fila = [contenido_id, serie_key, score, mejor_score_episodio].
+    Solo contenidos activos, no live, visibles para alguien.
+    """
+    from models import db, Contenido
+    ids = list(scores)
+    pools: dict = {}
+    for i in range(0, len(ids), 900):
+        rows = (
+            db.session.query(Contenido.id, Contenido.tipo, Contenido.serie_key,
+                             Contenido.visibility_scope, Contenido.owner_id)
+            .filter(Contenido.id.in_(ids[i:i + 900]),
+                    Contenido.activo == True,
+                    Contenido.tipo != 'live',
+                    Contenido.visibility_scope.in_(('global', 'private')))
+            .all()
+        )
+        for cid, tipo, serie_key, scope, owner_id in rows:
+            owner = owner_id if scope == 'private' else 0
+            tipo = 'serie' if serie_key else tipo
+            unit = serie_key or cid
+            s = scores[cid]
+            pool = pools.setdefault((owner, tipo), {})
+            row = pool.get(unit)
+            if row is None:
+                pool[unit] = [cid, serie_key, s, s]
+            else:
+                row[2] += s
+                if s > row[3]:
+                    row[0], row[3] = cid, s
+    return pools
+
+
+def _padding(tipo: str, exclude: dict, n: int) -> list:
+    """Relleno de un pool global: lo más reciente con imagen (score 0)."""
+    from models import db, Contenido
+    import series_index
+    q = (
+        db.session.query(Contenido.id, Contenido.serie_key)
+        .filter(Contenido.activo == True,
+                Contenido.tipo != 'live',
+                Contenido.visibility_scope == 'global',
+                Contenido.imagen.isnot(None),
+                Contenido.imagen != '')
+    )
+    if tipo == 'serie':
+        q = q.filter(series_index.episode_filter())
+    else:
+        q = q.filter(Contenido.tipo == tipo, Contenido.serie_key.is_(None))
+    out = []
+    for cid, serie_key in (q.order_by(Contenido.año.desc(), Contenido.fecha_agregado.desc())
+                           .limit(n * 5)):
+        unit = serie_key or cid
+        if unit in exclude:
+            continue
+        exclude[unit] = None
+        out.append((cid, serie_key))
+        if len(out) >= n:
+            break
+    return out
+
+
+def rebuild(window_days: int = None, half_life_hours: float = None,
+            pool_size: int = None) -> dict:
+    """
+    Recalcula trending_items entera (en una transacción). Sin argumentos usa
+    la config (TRENDING_*). Llamar dentro de app_context. Devuelve un resumen.
+    """
+    from models import db, TrendingItem
+    window_days = window_days or _window_days
+    half_life_hours = half_life_hours or _half_life_hours
+    pool_size = pool_size or _pool_size
+    scores = _scores(window_days, half_life_hours)
+    pools = _units(scores)
+    for tipo in _TIPOS:
+        pools.setdefault((0, tipo), {})
+
+    now = datetime.utcnow()
+    rows = []
+    for (owner, tipo), units in pools.items():
+        ranked = sorted(units.values(), key=lambda r: r[2], reverse=True)[:pool_size]
+        for cid, serie_key, score, _ in ranked:
+            rows.append({'owner_id': owner, 'tipo': tipo, 'contenido_id': cid,
+                         'serie_key': serie_key, 'score': score, 'computed_at': now})
+        if owner == 0 and len(ranked) < pool_size:
+            seen = {r[1] or r[0]: None for r in ranked}
+            for cid, serie_key in _padding(tipo, seen, pool_size - len(ranked)):
+                rows.append({'owner_id': 0, 'tipo': tipo, 'contenido_id': cid,
+                             'serie_key': serie_key, 'score': 0.0, 'computed_at': now})
+    try:
+        db.session.query(TrendingItem).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(TrendingItem.__table__.insert(), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    with _lock:
+        _pools.clear()
+    result = {'watched': len(scores), 'pools': len(pools), 'rows': len(rows)}
+    logger.info(f'[Trending] Recalculado: {result}')
+    return result
+
+
+def rebuild_safe(motivo: str = ''):
+    """rebuild() que nunca rompe al llamante (final de imports y scans)."""
+    from models import db
+    try:
+        rebuild()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[Trending] No se pudieron recalcular las tendencias ({motivo}): {e}')
+
+
+def _rebuild_async():
+    global _building
+    try:
+        with _app.app_context():
+            rebuild_safe('caducado')
+    finally:
+        with _lock:
+            _building = False
+
+
+def _ensure_fresh():
+    """
+    Cada _CHECK_EVERY segundos: pool vacío → se calcula ya (BD nueva, primer
+    import); más viejo que TRENDING_REFRESH_MINUTES → se recalcula en un
+    hilo y mientras tanto se sirve el anterior. Requiere app_context.
+    """
+    global _checked_at, _building
+    from models import db, TrendingItem
+    from sqlalchemy import func
+    now = time.monotonic()
+    with _lock:
+        if now - _checked_at < _CHECK_EVERY:
+            return
+        _checked_at = now
+    computed_at = db.session.query(func.max(TrendingItem.computed_at)).scalar()
+    if computed_at is None:
+        rebuild_safe('vacío')
+        return
+    if datetime.utcnow() - computed_at < timedelta(minutes=_refresh_minutes) or _app is None:
+        return
+    with _lock:
+        if _building:
+            return
+        _building = True
+    threading.Thread(target=_rebuild_async, daemon=True, name='trending').start()
+
+
+def install(app):
+    """Configura desde app.config (TRENDING_*). El pool se calcula al leerlo."""
+    global _app, _window_days, _half_life_hours, _pool_size, _refresh_minutes, _checked_at
+    _app = app
+    _window_days = app.config.get('TRENDING_WINDOW_DAYS', 30)
+    _half_life_hours = app.config.get('TRENDING_HALF_LIFE_HOURS', 72)
+    _pool_size = app.config.get('TRENDING_POOL_SIZE', 300)
+    _refresh_minutes = app.config.get('TRENDING_REFRESH_MINUTES', 15)
+    _checked_at = 0.0
+    with _lock:
+        _pools.clear()
+
+
+# ── Lectura (petición) ─────────────────────────────────────────
+
+def _pool(owner_id: int, tipo: str, size: int) -> list:
+    """[(contenido_id, serie_key, score)] ordenado por score, con caché corta."""
+    key = (owner_id, tipo)
+    now = time.monotonic()
+    with _lock:
+        hit = _pools.get(key)
+        if hit and hit[0] > now and hit[1] >= size:
+            return hit[2][:size]
+    from models import db, TrendingItem
+    rows = [tuple(r) for r in (
+        db.session.query(TrendingItem.contenido_id, TrendingItem.serie_key, TrendingItem.score)
+        .filter(TrendingItem.owner_id == owner_id, TrendingItem.tipo == tipo)
+        .order_by(TrendingItem.score.desc(), TrendingItem.id)
+        .limit(size)
+    )]
+    with _lock:
+        _pools[key] = (now + _POOL_TTL, size, rows)
+    return rows
+
+
+def sample(limit: int, tipo: str = None, user_id: int = None) -> list:
+    """
+    Ids de contenidos para /api/trending: muestreo ponderado por score
+    (claves u^(1/w)) entre los limit*3 primeros del pool, una tarjeta por
+    serie. Con usuario se mezclan su pool privado y el global.
+    """
+    _ensure_fresh()
+    tipos = (tipo,) if tipo in _TIPOS else _TIPOS
+    window = max(limit * _WINDOW_FACTOR, 1)
+    entries = []
+    for t in tipos:
+        entries += _pool(0, t, window)
+        if user_id:
+            entries += _pool(user_id, t, window)
+    entries.sort(key=lambda e: e[2], reverse=True)
+
+    seen, candidates = set(), []
+    for cid, serie_key, score in entries:
+        unit = serie_key or cid
+        if unit in seen:
+            continue
+        seen.add(unit)
+        candidates.append((cid, score))
+        if len(candidates) >= window:
+            break
+    keyed = [(random.random() ** (1.0 / (score + _FLOOR)), cid) for cid, score in candidates]
+    keyed.sort(reverse=True)
+    return [cid for _, cid in keyed]
@@ -0,0 +1,97 @@
+"""
+Visibilidad del catálogo desnormalizada en contenidos.
+
+_build_visible_query hacía LEFT JOIN con listas en cada consulta del
+catálogo para filtrar por (sin lista | lista global | lista privada del
+usuario); con el OR sobre otra tabla el planificador no podía usar un
+índice estrecho de contenidos. Aquí se copia el ámbito efectivo a cada fila:
+
+  Contenido.visibility_scope  'global'  sin lista (RSS) o lista global
+                              'private' lista privada
+                              'none'    privada sin dueño o visibilidad
+                                        desconocida (no la ve nadie, igual
+                                        que con el JOIN)
+  Contenido.owner_id          dueño de la lista privada (NULL si no)
+
+Se fija al importar (_do_bulk_insert) y se resincroniza por lista cuando
+cambia su visibilidad o su dueño (toggle_visibility_lista, borrado de
+usuario). install() rellena las filas sin ámbito al arrancar.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def scope_for(lista) -> tuple:
+    """(visibility_scope, owner_id) de las filas de esa lista (None = sin lista)."""
+    if lista is None or lista.visibilidad == 'global':
+        return 'global', None
+    if lista.visibilidad == 'private' and lista.owner_id:
+        return 'private', lista.owner_id
+    return 'none', None
+
+
+def visible_filter(user_id=None):
+    """Filtro SQL: filas que ve ese usuario (None = anónimo)."""
+    from models import Contenido
+    from sqlalchemy import or_, and_
+    if not user_id:
+        return Contenido.visibility_scope == 'global'
+    return or_(
+        Contenido.visibility_scope == 'global',
+        and_(Contenido.visibility_scope == 'private', Contenido.owner_id == user_id),
+    )
+
+
+def is_visible(scope, owner_id, user_id=None) -> bool:
+    """El criterio de visible_filter() para una fila ya leída."""
+    return scope == 'global' or (bool(user_id) and scope == 'private' and owner_id == user_id)
+
+
+def sync(lista_ids=None) -> int:
+    """
+    Copia el ámbito de cada lista (todas si lista_ids es None, más las filas
+    sin lista) a sus contenidos. Solo escribe las filas que cambian. Llamar
+    dentro de app_context y con la lista ya guardada; hace commit.
+    Devuelve las filas actualizadas.
+    """
+    from models import db, Contenido, Lista
+    from sqlalchemy import update, or_
+
+    def _apply(cond, scope, owner_id) -> int:
+        stale = or_(Contenido.visibility_scope.is_(None),
+                    Contenido.visibility_scope != scope,
+                    Contenido.owner_id.isnot(None) if owner_id is None
+                    else or_(Contenido.owner_id.is_(None), Contenido.owner_id != owner_id))
+        res = db.session.execute(
+            update(Contenido).where(cond, stale)
+            .values(visibility_scope=scope, owner_id=owner_id)
+            .execution_options(synchronize_session=False)
+        )
+        return res.rowcount or 0
+
+    query = Lista.query
+    if lista_ids is not None:
+        query = query.filter(Lista.id.in_(list(lista_ids)))
+    changed = 0
+    for lista in query:
+        changed += _apply(Contenido.lista_id == lista.id, *scope_for(lista))
+    if lista_ids is None:
+        changed += _apply(Contenido.lista_id.is_(None), *scope_for(None))
+    db.session.commit()
+    if changed:
+        logger.info(f'[Visibility] {changed} contenidos con ámbito actualizado')
+    return changed
+
+
+def install():
+    """Primera vez (filas sin ámbito): sincroniza todo. Llamar tras _migrate_db()."""
+    from models import db, Contenido
+    if db.session.query(Contenido.id).filter(Contenido.visibility_scope.is_(None)).first() is None:
+        return
+    logger.info('[Visibility] Calculando el ámbito de visibilidad del catálogo…')
+    try:
+        sync()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f'[Visibility] No se pudo calcular el ámbito: {e}')
@@ -0,0 +1,166 @@
+"""
+Worker de tareas en background — proceso separado del servidor web.
+
+Con BACKGROUND_WORKER=1 el proceso web (gunicorn) no arranca el scheduler
+ni ejecuta scans/imports: los encola en la tabla background_tasks. Este
+proceso ejecuta el scheduler (scan VOD, scan live, purge, backups…) y va
+reclamando las tareas encoladas, así el escaneo (40+ hilos de HTTP) no
+compite por el GIL con las peticiones de la API.
+
+Uso (desde backend/):
+  python worker.py                   # servicio: scheduler + cola de tareas
+  python worker.py run scan          # ejecuta un job una vez y sale
+  python worker.py run live-scan
+  python worker.py run purge [--days N]
+  python worker.py run backup
+  python worker.py run import --lista-id N
+
+En producción: cinecadiz-worker.service (systemd).
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+logger = logging.getLogger('worker')
+
+
+def _make_app():
+    # Este proceso ES el worker: create_app() no debe arrancar el scheduler
+    # por su cuenta (lo hace serve()) y lo que se encole aquí va a la cola.
+    os.environ['BACKGROUND_WORKER'] = '1'
+    from app import create_app
+    return create_app()
+
+
+# ── Servicio ───────────────────────────────────────────────────
+
+def serve(app, poll: float = 2.0, concurrency: int = 2):
+    """
+    Bucle principal: arranca el scheduler, reanuda lo interrumpido y
+    ejecuta hasta `concurrency` tareas de la cola a la vez.
+    """
+    from scheduler import init_scheduler, init_maintenance, resume_scan_runs, get_scheduler
+    from tasks import claim_next, run_task, requeue_orphans, worker_id
+
+    me = worker_id()
+    stop = threading.Event()
+
+    def _on_signal(signum, _frame):
+        logger.info(f'[Worker] Señal {signum} recibida — parando')
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+
+    requeue_orphans(app, me)
+    resume_scan_runs(app)
+    init_maintenance(app)
+    if app.config.get('AUTO_SCAN', 0):
+        init_scheduler(app)
+    logger.info(f'[Worker] {me} listo — concurrencia={concurrency}, '
+                f'scans automáticos={"sí" if app.config.get("AUTO_SCAN", 0) else "no (AUTO_SCAN=0)"}')
+
+    active: list[threading.Thread] = []
+    while not stop.is_set():
+        active = [t for t in active if t.is_alive()]
+        claimed = None
+        if len(active) < concurrency:
+            try:
+                claimed = claim_next(app, me)
+            except Exception as e:
+                logger.warning(f'[Worker] Error leyendo la cola: {e}')
+        if claimed:
+            task_id, tipo, args = claimed
+            logger.info(f'[Worker] Ejecutando {tipo} #{task_id} {args}')
+            t = threading.Thread(target=run_task, args=(app, task_id, tipo, args),
+                                 name=f'task-{task_id}', daemon=True)
+            t.start()
+            active.append(t)
+            continue            # puede haber más pendientes: no esperar
+        stop.wait(poll)
+
+    sched = get_scheduler()
+    if sched.running:
+        sched.shutdown(wait=False)
+    # Las tareas a medias se reencolan al arrancar (requeue_orphans) y los
+    # scans VOD continúan desde su ScanRun.
+    logger.info('[Worker] Detenido')
+
+
+# ── Ejecución puntual ──────────────────────────────────────────
+
+def run_once(app, job: str, args) -> int:
+    """Ejecuta un job en primer plano (cron, pruebas, mantenimiento)."""
+    from tasks import HANDLERS
+
+    if job == 'scan':
+        from link_checker import create_scan_run, get_running_scan
+        if get_running_scan(app) is not None:
+            logger.error('Ya hay un scan VOD en curso')
+            return 1
+        run_id = create_scan_run(
+            app, origen='auto',
+            batch_size=app.config.get('SCAN_BATCH_SIZE', 5000),
+            max_workers=app.config.get('SCAN_MAX_WORKERS', 40),
+            max_batches=200,
+        )
+        HANDLERS['scan_vod'](app, run_id=run_id)
+    elif job == 'live-scan':
+        HANDLERS['scan_live'](app)
+    elif job == 'purge':
+        HANDLERS['purge'](app, days=args.days or app.config.get('PURGE_DEAD_DAYS', 7))
+    elif job == 'backup':
+        HANDLERS['backup'](app)
+    elif job == 'import':
+        if not args.lista_id:
+            logger.error('--lista-id es obligatorio para import')
+            return 2
+        HANDLERS['import_lista'](app, lista_id=args.lista_id)
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Worker de tareas en background de CineCadiz')
+    sub = ap.add_subparsers(dest='cmd')
+
+    p_serve = sub.add_parser('serve', help='scheduler + cola de tareas (por defecto)')
+    p_serve.add_argument('--poll', type=float, default=None,
+                         help='segundos entre lecturas de la cola')
+    p_serve.add_argument('--concurrency', type=int, default=None,
+                         help='tareas de la cola en paralelo')
+
+    p_run = sub.add_parser('run', help='ejecuta un job una vez')
+    p_run.add_argument('job', choices=('scan', 'live-scan', 'purge', 'backup', 'import'))
+    p_run.add_argument('--days', type=int, default=None, help='purge: días inactivo')
+    p_run.add_argument('--lista-id', type=int, default=None, help='import: id de la lista')
+
+    args = ap.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+    )
+
+    if args.cmd != 'run' and os.environ.get('BACKGROUND_WORKER', '0') != '1':
+        # Con BACKGROUND_WORKER=0 el proceso web ya ejecuta el scheduler:
+        # arrancar también el worker duplicaría scans y backups.
+        logger.error('[Worker] BACKGROUND_WORKER=1 no está activado en el entorno — no se arranca')
+        sys.exit(3)
+
+    app = _make_app()
+    if args.cmd == 'run':
+        sys.exit(run_once(app, args.job, args))
+
+    serve(
+        app,
+        poll=getattr(args, 'poll', None) or app.config.get('WORKER_POLL_SECONDS', 2),
+        concurrency=getattr(args, 'concurrency', None) or app.config.get('WORKER_CONCURRENCY', 2),
+    )
+
+
+if __name__ == '__main__':
+    main()
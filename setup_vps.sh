@@ -70,6 +70,16 @@ else
     systemctl status cinecadiz.service --no-pager
 fi
 
+# Worker separado (solo si .env activa BACKGROUND_WORKER=1)
+WORKER_SERVICE_FILE="/etc/systemd/system/cinecadiz-worker.service"
+if grep -qE '^BACKGROUND_WORKER=1' "${BACKEND_DIR}/.env"; then
+    cp "${APP_DIR}/cinecadiz-worker.service" "${WORKER_SERVICE_FILE}"
+    systemctl daemon-reload
+    systemctl enable cinecadiz-worker.service
+    systemctl restart cinecadiz-worker.service
+    echo "      ✅ Worker en background instalado (cinecadiz-worker)."
+fi
+
 # ── 6. Resumen ───────────────────────────────────────────────────
 echo ""
 echo "════════════════════════════════════════"